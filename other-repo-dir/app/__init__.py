@@ -3,14 +3,20 @@ Document Chatbot Package
 A chatbot system that answers questions from uploaded document collections.
 """
 
+import importlib
+
 __version__ = "1.0.0"
 __author__ = "Your Name"
 
-from .document_processor import DocumentProcessor
-from .vector_store import VectorStore
-from .retriever import Retriever
-from .generator import AnswerGenerator
-from .chatbot import DocumentChatbot
+# Public classes are imported on first use, so light modules such as
+# app.config and app.daemon can be used without loading the ML stack.
+_EXPORTS = {
+    "DocumentProcessor": ".document_processor",
+    "VectorStore": ".vector_store",
+    "Retriever": ".retriever",
+    "AnswerGenerator": ".generator",
+    "DocumentChatbot": ".chatbot"
+}
 
 __all__ = [
     "DocumentProcessor",
@@ -19,3 +25,11 @@ __all__ = [
     "AnswerGenerator",
     "DocumentChatbot"
 ]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
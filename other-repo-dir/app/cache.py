@@ -0,0 +1,164 @@
+"""
+In-process caches: a generic LRU and the answer cache for DocumentChatbot.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from .storage import load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+INDEX_GENERATION_FILE_NAME = "index_generation.json"
+ANSWER_CACHE_FILE_NAME = "answer_cache.json"
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for use in cache keys (trim and collapse whitespace)."""
+    return " ".join(text.split())
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with a fixed capacity."""
+    
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a value and mark it as recently used; None if missing."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+    
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Entries from least to most recently used."""
+        with self._lock:
+            return list(self._data.items())
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size and hit-rate statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class AnswerCache:
+    """Caches full answers keyed on normalized question, k and index generation.
+    
+    The index generation is a counter stored in the persist directory and bumped
+    whenever the knowledge base changes, so answers computed against an older
+    index are never served, even if another process changed it.
+    """
+    
+    def __init__(self, persist_directory: str, capacity: int = 256, persist: bool = False):
+        self.generation_path = Path(persist_directory) / INDEX_GENERATION_FILE_NAME
+        self.cache_path = Path(persist_directory) / ANSWER_CACHE_FILE_NAME
+        self.persist = persist
+        self._cache = LRUCache(capacity)
+        self._generation = 0
+        self._generation_stamp: Optional[Tuple[int, int]] = None
+        self._generation_lock = threading.Lock()
+        
+        if self.persist:
+            data = load_json(self.cache_path, default={})
+            if data.get("generation") == self.generation():
+                for key, value in data.get("entries", []):
+                    self._cache.put(tuple(key), value)
+                logger.info(f"Loaded {len(self._cache)} cached answers")
+    
+    def generation(self) -> int:
+        """Current index generation, re-read from disk only when the file has changed."""
+        stamp = self._generation_file_stamp()
+        with self._generation_lock:
+            if stamp != self._generation_stamp:
+                self._generation = self._read_generation() if stamp is not None else 0
+                self._generation_stamp = stamp
+            return self._generation
+    
+    def _read_generation(self) -> int:
+        return load_json(self.generation_path, default={}).get("generation", 0)
+    
+    def _generation_file_stamp(self) -> Optional[Tuple[int, int]]:
+        """mtime and inode of the generation file (save_json replaces it on every write)."""
+        try:
+            stat = self.generation_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_ino
+    
+    def bump_generation(self) -> int:
+        """Mark the index as changed, invalidating every cached answer."""
+        generation = self._read_generation() + 1
+        save_json(self.generation_path, {"generation": generation})
+        with self._generation_lock:
+            self._generation = generation
+            self._generation_stamp = self._generation_file_stamp()
+        self._cache.clear()
+        if self.persist:
+            self._save(generation)
+        return generation
+    
+    def get(self, question: str, k: int, generation: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Look up a cached answer for ``generation`` (default: the current one)."""
+        if generation is None:
+            generation = self.generation()
+        return self._cache.get((normalize_text(question), k, generation))
+    
+    def put(self, question: str, k: int, result: Dict[str, Any], generation: Optional[int] = None) -> None:
+        """Cache an answer computed against index ``generation`` (default: the current one).
+        
+        Pass the generation read before retrieval: if the index changed while
+        the answer was being computed, the answer is stale and is not cached.
+        """
+        current = self.generation()
+        if generation is None:
+            generation = current
+        elif generation != current:
+            return
+        self._cache.put((normalize_text(question), k, generation), result)
+        if self.persist:
+            self._save(generation)
+    
+    def _save(self, generation: int) -> None:
+        entries = [[list(key), value] for key, value in self._cache.items() if key[2] == generation]
+        save_json(self.cache_path, {"generation": generation, "entries": entries})
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get size and hit-rate statistics."""
+        stats = self._cache.get_stats()
+        stats.update({"generation": self.generation(), "persist": self.persist})
+        return stats
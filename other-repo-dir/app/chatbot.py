@@ -2,15 +2,21 @@
 Main chatbot class that orchestrates document processing, retrieval, and generation.
 """
 
+import json
 import logging
-from typing import Dict, Any, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple, Callable
 from pathlib import Path
 import time
 
-from .document_processor import DocumentProcessor
+from .document_processor import DocumentProcessor, DocumentChunk
 from .vector_store import VectorStore
-from .retriever import Retriever
+from .retriever import Retriever, RetrievalResult
 from .generator import AnswerGenerator
+from .manifest import IngestionManifest
+from .cache import AnswerCache
+from .model_registry import model_registry
+from .metrics import collect_timings, record_stage, stage_metrics, stage_timer
 from .config import get_config
 
 logger = logging.getLogger(__name__)
@@ -24,14 +30,22 @@ class DocumentChatbot:
         # Initialize components
         self.document_processor = DocumentProcessor(
             chunk_size=self.config["vector_store"]["chunk_size"],
-            chunk_overlap=self.config["vector_store"]["chunk_overlap"]
+            chunk_overlap=self.config["vector_store"]["chunk_overlap"],
+            num_workers=self.config["performance"].get("ingestion_workers", 1)
         )
         
         self.vector_store = VectorStore(
             persist_directory=self.config["vector_store"]["persist_directory"],
-            collection_name=self.config["vector_store"]["collection_name"]
+            collection_name=self.config["vector_store"]["collection_name"],
+            performance_config=self.config["performance"],
+            lexical_index=self.config["vector_store"].get("lexical_index", True),
+            distance_space=self.config["vector_store"].get("distance_space"),
+            hnsw_config=self.config["vector_store"].get("hnsw"),
+            backend=self.config["vector_store"].get("backend")
         )
         
+        self.manifest = IngestionManifest.for_persist_directory(self.vector_store.persist_directory)
+        
         self.retriever = Retriever(
             vector_store=self.vector_store,
             config=self.config["retrieval"]
@@ -42,116 +56,464 @@ class DocumentChatbot:
             config=self.config["llm"]
         )
         
+        self.answer_cache = AnswerCache(
+            persist_directory=self.vector_store.persist_directory,
+            capacity=self.config["performance"].get("answer_cache_size", 256),
+            persist=self.config["performance"].get("answer_cache_persist", False)
+        )
+        
         logger.info("DocumentChatbot initialized successfully")
     
-    def ingest_documents(self, folder_path: str) -> Dict[str, Any]:
-        """Ingest documents from a folder."""
+    def close(self) -> None:
+        """Release shared models and close caches held by this chatbot."""
+        self.vector_store.close()
+        self.generator.close()
+    
+    def ingest_documents(
+        self,
+        folder_path: str,
+        num_workers: Optional[int] = None,
+        incremental: Optional[bool] = None,
+        progress_callback: Optional[Callable[[Dict[str, int]], None]] = None
+    ) -> Dict[str, Any]:
+        """Ingest documents from a folder.
+        
+        Chunks are streamed file by file into the vector store and written in
+        bounded batches, so memory stays flat and progress is persisted as it goes.
+        In incremental mode, files recorded in the ingestion manifest as unchanged
+        are skipped, and chunks of files deleted from the folder are dropped.
+        ``progress_callback`` receives files_total, files_done and chunks_embedded
+        counts as work completes. Successful results report the seconds spent in
+        each pipeline stage under ``stats["stage_timings"]``.
+        """
+        with collect_timings() as timings:
+            with stage_timer("ingest"):
+                result = self._ingest_documents(folder_path, num_workers, incremental, progress_callback)
+        if result["success"]:
+            result["stats"]["stage_timings"] = dict(timings)
+        return result
+    
+    def _ingest_documents(
+        self,
+        folder_path: str,
+        num_workers: Optional[int],
+        incremental: Optional[bool],
+        progress_callback: Optional[Callable[[Dict[str, int]], None]]
+    ) -> Dict[str, Any]:
         start_time = time.time()
+        if incremental is None:
+            incremental = self.config["vector_store"].get("incremental_ingest", True)
         
         try:
             # Process documents
             logger.info(f"Processing documents from: {folder_path}")
-            chunks = self.document_processor.process_folder(folder_path)
+            file_paths = self.document_processor.list_supported_files(folder_path)
+            
+            files_removed, removed_chunks = self._remove_deleted_files(folder_path)
+            
+            if incremental:
+                pending_files = [p for p in file_paths if self.manifest.needs_ingest(p)]
+            else:
+                pending_files = file_paths
+            files_skipped = len(file_paths) - len(pending_files)
+            
+            progress = {"files_total": len(pending_files), "files_done": 0, "chunks_embedded": 0}
+            
+            def report_progress(**updates: int) -> None:
+                progress.update(updates)
+                if progress_callback:
+                    progress_callback(dict(progress))
+            
+            report_progress()
+            counters = {"files_processed": 0, "files_updated": 0}
+            chunk_stream = self._stream_chunks(
+                pending_files, num_workers, counters,
+                on_file_done=lambda: report_progress(files_done=counters["files_processed"])
+            )
+            
+            # Add to vector store
+            new_chunks = self.vector_store.add_documents_stream(
+                chunk_stream,
+                flush_size=self.config["performance"].get("ingest_flush_size"),
+                on_flush=lambda total: report_progress(chunks_embedded=total),
+                upsert=True
+            )
+            self.manifest.save()
+            if new_chunks or files_removed:
+                self.answer_cache.bump_generation()
             
-            if not chunks:
+            if not new_chunks and not files_skipped and not files_removed:
                 return {
                     "success": False,
                     "message": "No supported documents found in the folder",
                     "stats": {"total_chunks": 0, "processing_time": 0}
                 }
             
-            # Add to vector store
-            logger.info(f"Adding {len(chunks)} chunks to vector store")
-            self.vector_store.add_documents(chunks)
-            
             processing_time = time.time() - start_time
             
             # Get stats
             stats = self.vector_store.get_collection_stats()
             stats.update({
-                "new_chunks": len(chunks),
+                "new_chunks": new_chunks,
+                "removed_chunks": removed_chunks,
+                "files_processed": counters["files_processed"],
+                "files_updated": counters["files_updated"],
+                "files_skipped": files_skipped,
+                "files_removed": files_removed,
                 "processing_time": processing_time
             })
             
+            if pending_files or files_removed:
+                message = f"Successfully processed {new_chunks} chunks"
+            else:
+                message = "Knowledge base is already up to date"
+            
             return {
                 "success": True,
-                "message": f"Successfully processed {len(chunks)} chunks",
+                "message": message,
                 "stats": stats
             }
             
         except Exception as e:
             logger.error(f"Error ingesting documents: {e}")
+            # Drop unsaved manifest changes; they may describe chunks never written
+            self.manifest = IngestionManifest.for_persist_directory(self.vector_store.persist_directory)
+            # Some batches may have been written before the failure; keep the
+            # lexical index and source catalog on disk in step with them
+            try:
+                self.vector_store.flush()
+            except Exception as flush_error:
+                logger.error(f"Error saving indexes after failed ingest: {flush_error}")
+            self.answer_cache.bump_generation()
             return {
                 "success": False,
                 "message": f"Error processing documents: {str(e)}",
                 "stats": {"total_chunks": 0, "processing_time": 0}
             }
     
+    def _stream_chunks(
+        self,
+        file_paths: List[Path],
+        num_workers: Optional[int],
+        counters: Dict[str, int],
+        on_file_done: Optional[Callable[[], None]] = None
+    ) -> Iterator[DocumentChunk]:
+        """Yield chunks file by file, replacing any previously ingested chunks."""
+        processed_files = self.document_processor.iter_processed_files(file_paths, num_workers=num_workers)
+        for file_path, file_chunks in processed_files:
+            chunk_ids = [chunk.chunk_id for chunk in file_chunks]
+            
+            # Chunk ids are content-derived and written with upsert, so only
+            # chunks from an earlier version of this file that are gone now
+            # need deleting; unchanged chunks keep their ids.
+            previous = self.manifest.get(file_path)
+            if previous:
+                new_ids = set(chunk_ids)
+                stale_ids = [chunk_id for chunk_id in previous.chunk_ids if chunk_id not in new_ids]
+                self.vector_store.delete_chunks(stale_ids, persist=False)
+            
+            self.manifest.record(file_path, chunk_ids)
+            counters["files_processed"] += 1
+            if previous:
+                counters["files_updated"] += 1
+            yield from file_chunks
+            if on_file_done:
+                on_file_done()
+    
+    def _remove_deleted_files(self, folder_path: str) -> Tuple[int, int]:
+        """Drop chunks of manifest files under a folder that no longer exist."""
+        removed_chunks = 0
+        missing = self.manifest.missing_files(folder_path)
+        for key in missing:
+            entry = self.manifest.remove(key)
+            self.vector_store.delete_chunks(entry.chunk_ids, persist=False)
+            removed_chunks += len(entry.chunk_ids)
+            logger.info(f"Removed deleted file from knowledge base: {key}")
+        return len(missing), removed_chunks
+    
     def ask_question(self, question: str, k: Optional[int] = None) -> Dict[str, Any]:
-        """Ask a question and get an answer."""
+        """Ask a question and get an answer.
+        
+        Answers are cached until the knowledge base next changes.
+        """
+        result = {}
+        for event in self.ask_question_stream(question, k=k):
+            if event["type"] == "done":
+                result = {key: value for key, value in event.items() if key != "type"}
+        return result
+    
+    def ask_question_stream(self, question: str, k: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Ask a question and stream the answer as it is generated.
+        
+        Yields ``{"type": "token", "text": ...}`` events followed by one
+        ``{"type": "done", ...}`` event holding the same fields as
+        ``ask_question`` plus ``time_to_first_token`` and ``timings``, the
+        seconds spent in each pipeline stage. Cached answers are replayed as a
+        single token event.
+        """
         start_time = time.time()
+        k = k or self.retriever.k
         
+        with collect_timings() as timings:
+            # Read once: answers are cached under the generation they were retrieved from
+            generation = self.answer_cache.generation()
+            cached = self.answer_cache.get(question, k, generation)
+            if cached is not None:
+                result = dict(cached)
+                elapsed = time.time() - start_time
+                record_stage("ask", elapsed)
+                result.update({
+                    "cached": True,
+                    "total_time": elapsed,
+                    "time_to_first_token": elapsed,
+                    "timings": dict(timings)
+                })
+                yield {"type": "token", "text": result["answer"]}
+                yield {"type": "done", **result}
+                return
+            
+            for event in self._answer_question_stream(question, k, start_time):
+                if event["type"] == "done":
+                    if "error" not in event:
+                        self.answer_cache.put(
+                            question, k, {key: value for key, value in event.items() if key != "type"}, generation
+                        )
+                    record_stage("ask", time.time() - start_time)
+                    event = {**event, "timings": dict(timings)}
+                yield event
+    
+    def _answer_question_stream(self, question: str, k: int, start_time: float) -> Iterator[Dict[str, Any]]:
+        """Retrieve context and stream a generated answer (uncached)."""
+        streamed = False
         try:
             # Retrieve relevant documents
-            retrieval_results = self.retriever.retrieve(question, k=k)
+            with stage_timer("retrieval"):
+                retrieval_results = self.retriever.retrieve(question, k=k)
             
-            # Check if we have sufficient results
-            if not retrieval_results:
-                return {
-                    "answer": "I don't know. I couldn't find any relevant information in the documents.",
-                    "confidence": 0.0,
-                    "citations": [],
-                    "sources": [],
-                    "retrieval_results": [],
-                    "total_time": time.time() - start_time
-                }
-            
-            # Check retrieval confidence
-            if not self.retriever.check_retrieval_confidence(retrieval_results):
-                return {
-                    "answer": "I don't know. The available information doesn't seem directly relevant to your question.",
-                    "confidence": 0.0,
-                    "citations": [],
-                    "sources": [],
-                    "retrieval_results": [],
-                    "total_time": time.time() - start_time
-                }
-            
-            # Generate answer
-            generation_result = self.generator.generate_answer(question, retrieval_results)
-            
-            # Combine results
-            total_time = time.time() - start_time
-            
-            return {
-                "answer": generation_result["answer"],
-                "confidence": generation_result["confidence"],
-                "citations": generation_result["citations"],
-                "sources": generation_result["sources"],
-                "retrieval_results": [
-                    {
-                        "content": r.content[:200] + "..." if len(r.content) > 200 else r.content,
-                        "source": Path(r.source).name,
-                        "page": r.page_number,
-                        "score": round(r.similarity_score, 3)
-                    }
-                    for r in retrieval_results[:3]
-                ],
-                "total_time": total_time,
-                "generation_time": generation_result["generation_time"]
-            }
+            for event in self._answer_from_results(question, retrieval_results, start_time):
+                streamed = streamed or event["type"] == "token"
+                yield event
             
         except Exception as e:
             logger.error(f"Error answering question: {e}")
-            return {
-                "answer": "I apologize, but I encountered an error while processing your question.",
+            result = self._error_result(e, start_time)
+            if not streamed:
+                yield {"type": "token", "text": result["answer"]}
+            yield {"type": "done", **result}
+    
+    def _answer_from_results(
+        self,
+        question: str,
+        retrieval_results: List[RetrievalResult],
+        start_time: float
+    ) -> Iterator[Dict[str, Any]]:
+        """Stream an answer generated from already retrieved chunks."""
+        # Check if we have sufficient results
+        if not retrieval_results:
+            answer = "I don't know. I couldn't find any relevant information in the documents."
+        # Check retrieval confidence
+        elif not self.retriever.check_retrieval_confidence(retrieval_results):
+            answer = "I don't know. The available information doesn't seem directly relevant to your question."
+        else:
+            answer = None
+        
+        if answer is not None:
+            total_time = time.time() - start_time
+            yield {"type": "token", "text": answer}
+            yield {
+                "type": "done",
+                "answer": answer,
                 "confidence": 0.0,
                 "citations": [],
                 "sources": [],
                 "retrieval_results": [],
-                "total_time": time.time() - start_time,
-                "error": str(e)
+                "total_time": total_time,
+                "time_to_first_token": total_time
+            }
+            return
+        
+        # Generate answer
+        time_to_first_token = None
+        generation_result = {}
+        for event in self.generator.generate_answer_stream(question, retrieval_results):
+            if event["type"] == "done":
+                generation_result = event
+                continue
+            if time_to_first_token is None:
+                time_to_first_token = time.time() - start_time
+            yield event
+        
+        # Combine results
+        total_time = time.time() - start_time
+        
+        yield {
+            "type": "done",
+            "answer": generation_result["answer"],
+            "confidence": generation_result["confidence"],
+            "citations": generation_result["citations"],
+            "sources": generation_result["sources"],
+            "retrieval_results": [
+                {
+                    "content": r.content[:200] + "..." if len(r.content) > 200 else r.content,
+                    "source": Path(r.source).name,
+                    "page": r.page_number,
+                    "score": round(r.similarity_score, 3)
+                }
+                for r in retrieval_results[:3]
+            ],
+            "total_time": total_time,
+            "generation_time": generation_result["generation_time"],
+            "time_to_first_token": time_to_first_token if time_to_first_token is not None else total_time,
+            **{
+                key: generation_result[key]
+                for key in ("prompt_tokens", "prompt_tokens_reused")
+                if key in generation_result
             }
+        }
+    
+    def _error_result(self, error: Exception, start_time: float) -> Dict[str, Any]:
+        """Result returned when answering a question fails."""
+        return {
+            "answer": "I apologize, but I encountered an error while processing your question.",
+            "confidence": 0.0,
+            "citations": [],
+            "sources": [],
+            "retrieval_results": [],
+            "total_time": time.time() - start_time,
+            "error": str(error)
+        }
+    
+    def ask_batch(
+        self,
+        questions: Iterable[Dict[str, Any]],
+        k: Optional[int] = None,
+        num_workers: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Answer many questions, yielding one result per question in input order.
+        
+        Each question is a dict with ``question`` and optional ``id`` and ``k``.
+        Questions are retrieved ``batch_size`` at a time (one embedding pass and
+        one multi-vector Chroma query per batch) while the previous batch is
+        generated on a pool of ``num_workers`` threads. With ``num_workers=0``
+        answers are generated on the calling thread as results are consumed, so
+        the batch uses no threads beyond the caller's (the API server does this
+        to stay within its bounded query pool). Results carry the ``id``, the
+        answer fields and per-item ``timings``.
+        """
+        k = k or self.retriever.k
+        if num_workers is None:
+            num_workers = self.config["performance"].get("batch_qa_workers", 4)
+        batch_size = batch_size or self.config["performance"].get("batch_qa_size", 32)
+        
+        executor = ThreadPoolExecutor(max_workers=num_workers) if num_workers > 0 else None
+        submit = executor.submit if executor else _DeferredCall
+        try:
+            pending: List[Future] = []
+            batch: List[Dict[str, Any]] = []
+            
+            for item in questions:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    submitted = self._submit_batch(submit, batch, k)
+                    # Retrieval of this batch overlapped generation of the previous one
+                    for future in pending:
+                        yield future.result()
+                    pending, batch = submitted, []
+            
+            if batch:
+                pending.extend(self._submit_batch(submit, batch, k))
+            for future in pending:
+                yield future.result()
+        finally:
+            if executor:
+                executor.shutdown()
+    
+    def _submit_batch(self, submit: Callable[..., Future], batch: List[Dict[str, Any]], k: int) -> List[Future]:
+        """Retrieve a batch of questions together and queue their generation."""
+        start_time = time.time()
+        items = [(item, item.get("k") or k) for item in batch]
+        
+        # Cached answers skip retrieval entirely
+        generation = self.answer_cache.generation()
+        cached = [self.answer_cache.get(item["question"], item_k, generation) for item, item_k in items]
+        to_retrieve = [i for i, result in enumerate(cached) if result is None]
+        
+        retrieved: Dict[int, Any] = {}
+        if to_retrieve:
+            max_k = max(items[i][1] for i in to_retrieve)
+            try:
+                batch_results = self.retriever.retrieve_batch(
+                    [items[i][0]["question"] for i in to_retrieve], k=max_k
+                )
+                for i, results in zip(to_retrieve, batch_results):
+                    retrieved[i] = results[:items[i][1]]
+            except Exception as e:
+                logger.error(f"Error retrieving question batch: {e}")
+                retrieved = {i: e for i in to_retrieve}
+        
+        # Each item is charged an equal share of the batched retrieval
+        retrieval_time = (time.time() - start_time) / max(len(to_retrieve), 1)
+        
+        futures = []
+        for i, (item, item_k) in enumerate(items):
+            if cached[i] is not None:
+                result = dict(cached[i], cached=True)
+                futures.append(submit(self._batch_result, item, result, 0.0, start_time))
+            else:
+                futures.append(submit(
+                    self._answer_batch_item, item, item_k, retrieved[i], retrieval_time, start_time, generation
+                ))
+        return futures
+    
+    def _answer_batch_item(
+        self,
+        item: Dict[str, Any],
+        k: int,
+        retrieval_results: Any,
+        retrieval_time: float,
+        batch_start: float,
+        generation: int
+    ) -> Dict[str, Any]:
+        """Generate the answer for one batch item (runs on a worker thread)."""
+        start_time = time.time()
+        try:
+            if isinstance(retrieval_results, Exception):
+                raise retrieval_results
+            
+            result = {}
+            for event in self._answer_from_results(item["question"], retrieval_results, start_time):
+                if event["type"] == "done":
+                    result = {key: value for key, value in event.items() if key != "type"}
+            self.answer_cache.put(item["question"], k, result, generation)
+        except Exception as e:
+            logger.error(f"Error answering question: {e}")
+            result = self._error_result(e, start_time)
+        
+        return self._batch_result(item, result, retrieval_time, batch_start)
+    
+    def _batch_result(
+        self,
+        item: Dict[str, Any],
+        result: Dict[str, Any],
+        retrieval_time: float,
+        batch_start: float
+    ) -> Dict[str, Any]:
+        """Shape a batch output record with per-item timings."""
+        result = dict(result)
+        generation_time = result.pop("generation_time", 0.0)
+        result.pop("total_time", None)
+        result.pop("time_to_first_token", None)
+        return {
+            "id": item.get("id"),
+            "question": item["question"],
+            **result,
+            "timings": {
+                "retrieval_time": retrieval_time,
+                "generation_time": generation_time,
+                "total_time": time.time() - batch_start
+            }
+        }
     
     def get_stats(self) -> Dict[str, Any]:
         """Get system statistics."""
@@ -159,6 +521,13 @@ class DocumentChatbot:
         
         return {
             "vector_store": vector_stats,
+            "caches": {
+                "query_embedding": self.vector_store.query_cache.get_stats(),
+                "answer": self.answer_cache.get_stats()
+            },
+            "models": model_registry.get_stats(),
+            "prompt_eval": self.generator.get_stats(),
+            "stages": stage_metrics.snapshot(),
             "config": {
                 "chunk_size": self.config["vector_store"]["chunk_size"],
                 "chunk_overlap": self.config["vector_store"]["chunk_overlap"],
@@ -171,6 +540,9 @@ class DocumentChatbot:
         """Reset the knowledge base (delete all documents)."""
         try:
             self.vector_store.reset_collection()
+            self.manifest.clear()
+            self.manifest.save()
+            self.answer_cache.bump_generation()
             return {
                 "success": True,
                 "message": "Knowledge base reset successfully"
@@ -182,6 +554,31 @@ class DocumentChatbot:
                 "message": f"Error resetting knowledge base: {str(e)}"
             }
     
+    def rebuild_index(
+        self,
+        distance_space: Optional[str] = None,
+        hnsw_config: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Rebuild the vector index with new distance/HNSW settings, without re-embedding."""
+        start_time = time.time()
+        try:
+            stats = self.vector_store.rebuild_collection(distance_space, hnsw_config)
+            # Scores (and so cached answers' confidence) depend on the distance space
+            self.answer_cache.bump_generation()
+            stats["processing_time"] = time.time() - start_time
+            return {
+                "success": True,
+                "message": f"Rebuilt index with {stats['chunks']} chunks",
+                "stats": stats
+            }
+        except Exception as e:
+            logger.error(f"Error rebuilding index: {e}")
+            return {
+                "success": False,
+                "message": f"Error rebuilding index: {str(e)}",
+                "stats": {}
+            }
+    
     def search_documents(self, query: str, k: int = 10) -> List[Dict[str, Any]]:
         """Search documents without generating an answer."""
         try:
@@ -202,13 +599,54 @@ class DocumentChatbot:
             logger.error(f"Error searching documents: {e}")
             return []
     
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """Every ingested file with its chunk count, page count and ingestion time."""
+        return self.vector_store.list_sources()
+    
     def get_available_sources(self) -> List[str]:
         """Get list of available document sources."""
         try:
-            # Search for any document to get source list
-            dummy_results = self.retriever.retrieve("dummy", k=100)
-            sources = self.retriever.get_unique_sources(dummy_results)
-            return sources
+            return sorted({entry["file_name"] for entry in self.list_sources()})
         except Exception as e:
             logger.error(f"Error getting available sources: {e}")
             return []
+
+
+def parse_question_lines(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Parse JSONL questions for DocumentChatbot.ask_batch.
+    
+    Each non-blank line is either a JSON object with a ``question`` (and
+    optional ``id`` and ``k``) or a bare JSON string. Items without an id get
+    their line number.
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {line_number}: invalid JSON ({e})")
+        
+        if isinstance(record, str):
+            record = {"question": record}
+        if not isinstance(record, dict) or not str(record.get("question", "")).strip():
+            raise ValueError(f"Line {line_number}: expected an object with a non-empty 'question'")
+        
+        record.setdefault("id", line_number)
+        yield record
+
+
+class _DeferredCall:
+    """Stand-in for a Future that runs its call on the thread asking for the result."""
+    
+    def __init__(self, fn: Callable[..., Any], *args):
+        self._fn = fn
+        self._args = args
+        self._done = False
+        self._result = None
+    
+    def result(self) -> Any:
+        if not self._done:
+            self._result = self._fn(*self._args)
+            self._done = True
+        return self._result
@@ -21,14 +21,32 @@ VECTOR_STORE_CONFIG = {
     "persist_directory": str(CHROMA_DB_DIR),
     "collection_name": "documents",
     "chunk_size": 1000,
-    "chunk_overlap": 200
+    "chunk_overlap": 200,
+    "incremental_ingest": True,  # Skip files unchanged since the last ingest (see ingest_manifest.json)
+    "lexical_index": True,  # Maintain a BM25 index (bm25_index.npz) for hybrid retrieval
+    # "chroma" (HNSW index) or "numpy" (exact search over a memory-mapped matrix in
+    # numpy_store/, fastest up to a few hundred thousand chunks). After a switch, the
+    # collection of the previously used backend is copied in on the first start.
+    "backend": "chroma",
+    # Distance for new collections: "l2", "cosine" or "ip". Scores are 1/(1+d) for l2 and
+    # 1-d (cosine similarity / inner product) otherwise. Existing collections keep their
+    # space until rebuilt with `python main.py reindex`.
+    "distance_space": "l2",
+    "hnsw": {
+        "construction_ef": 100,  # Candidates considered while building (higher = better graph, slower ingest)
+        "search_ef": 100,  # Candidates considered per query (higher = better recall, slower search)
+        "M": 16  # Links per node (higher = better recall, more memory); fixed at build time
+    }
 }
 
 # Retrieval configuration
 RETRIEVAL_CONFIG = {
     "k": 5,  # Number of chunks to retrieve
     "confidence_threshold": 0.3,  # Minimum similarity score
-    "max_tokens_per_chunk": 500
+    "max_tokens_per_chunk": 500,
+    "mode": "vector",  # "vector" or "hybrid" (BM25 + vector with reciprocal rank fusion)
+    "hybrid_candidates": 20,  # Candidates taken from each ranker before fusion
+    "rrf_k": 60  # Reciprocal rank fusion constant
 }
 
 # LLM configuration
@@ -38,7 +56,8 @@ LLM_CONFIG = {
     "temperature": 0.1,
     "n_ctx": 2048,
     "n_batch": 512,
-    "n_gpu_layers": 0  # Adjust based on GPU
+    "n_gpu_layers": 0,  # Adjust based on GPU
+    "prompt_cache_bytes": 2 << 30  # llama.cpp state cache for reused prompt prefixes (0 disables)
 }
 
 # Supported file types
@@ -59,8 +78,32 @@ CITATION_CONFIG = {
 # Performance settings
 PERFORMANCE_CONFIG = {
     "max_latency_seconds": 3.0,
-    "batch_size": 32,
-    "cache_embeddings": True
+    "batch_size": 32,  # Texts per embedding forward pass
+    "max_write_batch": 5000,  # Max chunks per Chroma write (also capped by Chroma's own limit)
+    "cache_embeddings": True,  # Persist embeddings in <chroma_db>/embedding_cache.sqlite3
+    "embedding_cache_max_entries": 100000,
+    "query_cache_size": 1024,  # In-memory LRU of query embeddings (0 disables)
+    "answer_cache_size": 256,  # Cached ask_question results (0 disables)
+    "answer_cache_persist": False,  # Keep cached answers in <chroma_db>/answer_cache.json
+    "ingestion_workers": 1,  # Processes for file extraction/chunking (0 = one per CPU)
+    "ingest_flush_size": 256,  # Chunks buffered before each embed + insert during ingestion
+    "batch_qa_workers": 4,  # Generation threads for ask_batch / ask-batch
+    "batch_qa_size": 32  # Questions retrieved per embedding pass and Chroma query in ask_batch
+}
+
+# API server settings (fastapi_app.py)
+SERVER_CONFIG = {
+    "query_workers": 4,  # Threads serving /ask and /search
+    "ingest_workers": 1,  # Threads serving /ingest, /upload and /reset
+    "max_queue_depth": 32,  # Requests allowed to wait per pool before returning 503
+    "query_batch_wait_ms": 5,  # Window for coalescing concurrent query embeddings (0 disables)
+    "query_batch_max_size": 32
+}
+
+# CLI daemon settings (python main.py serve)
+DAEMON_CONFIG = {
+    "socket_path": os.environ.get("DOC_CHATBOT_SOCKET", str(BASE_DIR / "chatbot.sock")),
+    "connect_timeout": 0.5  # Seconds to wait when probing for a running daemon
 }
 
 def get_config() -> Dict[str, Any]:
@@ -75,5 +118,7 @@ def get_config() -> Dict[str, Any]:
         "llm": LLM_CONFIG,
         "citation": CITATION_CONFIG,
         "performance": PERFORMANCE_CONFIG,
+        "server": SERVER_CONFIG,
+        "daemon": DAEMON_CONFIG,
         "supported_extensions": SUPPORTED_EXTENSIONS
     }
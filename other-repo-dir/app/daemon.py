@@ -0,0 +1,229 @@
+"""
+Long-running chatbot daemon for the CLI.
+
+``python main.py serve`` keeps one DocumentChatbot (embedding model, LLM,
+Chroma client and caches) loaded and serves CLI commands over a local Unix
+socket, so scripted use does not pay the startup cost on every call.
+
+Protocol: the client sends one JSON request per connection,
+``{"command": ..., "args": {...}}``, followed by a newline. The daemon replies
+with newline-delimited JSON messages; the last one has type ``result`` or
+``error``. ``ask`` streams ``token`` messages and ``ingest`` streams
+``progress`` messages before their result.
+
+This module deliberately imports nothing heavy so that clients stay fast.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def unix_sockets_supported() -> bool:
+    """Whether this platform provides Unix domain sockets."""
+    return hasattr(socket, "AF_UNIX")
+
+
+class DaemonError(RuntimeError):
+    """Raised when the daemon reports an error or drops the connection."""
+
+
+class ChatbotDaemon:
+    """Serves chatbot commands from a single, shared DocumentChatbot."""
+    
+    def __init__(self, chatbot: Any, socket_path: str, model_path: Optional[str] = None):
+        self.chatbot = chatbot
+        self.socket_path = socket_path
+        self.model_path = str(Path(model_path).resolve()) if model_path else None
+        self._ingest_lock = threading.Lock()  # one ingestion, reset or reindex at a time
+        self._server = None
+        self.commands: Dict[str, Callable[..., Any]] = {
+            "ping": self._ping,
+            "ask": self._ask,
+            "stats": self._stats,
+            "sources": self._sources,
+            "ingest": self._ingest,
+            "reset": self._reset,
+            "reindex": self._reindex,
+            "shutdown": self._shutdown
+        }
+    
+    def serve_forever(self) -> None:
+        """Listen on the socket until shut down."""
+        if not unix_sockets_supported():
+            raise RuntimeError("Unix domain sockets are not supported on this platform")
+        
+        self._remove_stale_socket()
+        daemon = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon._handle(self.rfile, self.wfile)
+        
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"Daemon listening on {self.socket_path}")
+        
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            logger.info("Daemon stopped")
+    
+    def shutdown(self) -> None:
+        """Stop serving (safe to call from a request handler)."""
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+    
+    def _remove_stale_socket(self) -> None:
+        """Remove a socket file left by a daemon that is no longer running."""
+        if not os.path.exists(self.socket_path):
+            return
+        if DaemonClient(self.socket_path).ping() is not None:
+            raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+        os.unlink(self.socket_path)
+    
+    def _handle(self, rfile, wfile) -> None:
+        """Serve one request: read the command, stream messages, send the result."""
+        def send(message: Dict[str, Any]) -> None:
+            wfile.write((json.dumps(message, default=str) + "\n").encode("utf-8"))
+            wfile.flush()
+        
+        try:
+            request = json.loads(rfile.readline() or b"{}")
+            command = request.get("command")
+            handler = self.commands.get(command)
+            if handler is None:
+                send({"type": "error", "message": f"Unknown command: {command}"})
+                return
+            
+            result = handler(send, **request.get("args", {}))
+            send({"type": "result", "result": result})
+        
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected")
+        except Exception as e:
+            logger.error(f"Error handling daemon request: {e}")
+            try:
+                send({"type": "error", "message": str(e)})
+            except OSError:
+                pass
+    
+    def _ping(self, send) -> Dict[str, Any]:
+        return {"pid": os.getpid(), "model_path": self.model_path}
+    
+    def _ask(self, send, question: str, k: Optional[int] = None) -> Dict[str, Any]:
+        result = {}
+        for event in self.chatbot.ask_question_stream(question, k=k):
+            if event["type"] == "done":
+                result = {key: value for key, value in event.items() if key != "type"}
+            else:
+                send(event)
+        return result
+    
+    def _stats(self, send) -> Dict[str, Any]:
+        return self.chatbot.get_stats()
+    
+    def _sources(self, send) -> Any:
+        return self.chatbot.get_available_sources()
+    
+    def _ingest(
+        self,
+        send,
+        folder_path: str,
+        num_workers: Optional[int] = None,
+        incremental: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        def report_progress(progress: Dict[str, int]) -> None:
+            try:
+                send({"type": "progress", **progress})
+            except OSError:
+                pass  # keep ingesting even if the client went away
+        
+        with self._ingest_lock:
+            return self.chatbot.ingest_documents(
+                folder_path,
+                num_workers=num_workers,
+                incremental=incremental,
+                progress_callback=report_progress
+            )
+    
+    def _reset(self, send) -> Dict[str, Any]:
+        with self._ingest_lock:
+            return self.chatbot.reset_knowledge_base()
+    
+    def _reindex(
+        self,
+        send,
+        distance_space: Optional[str] = None,
+        hnsw_config: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        with self._ingest_lock:
+            return self.chatbot.rebuild_index(distance_space, hnsw_config)
+    
+    def _shutdown(self, send) -> Dict[str, Any]:
+        self.shutdown()
+        return {"stopping": True}
+
+
+class DaemonClient:
+    """Sends commands to a running ChatbotDaemon."""
+    
+    def __init__(self, socket_path: str, connect_timeout: float = 0.5):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self.info: Dict[str, Any] = {}
+    
+    def request(self, command: str, on_message: Optional[Callable[[Dict[str, Any]], None]] = None, **args) -> Any:
+        """Run a command and return its result.
+        
+        Intermediate messages (tokens, progress) are passed to ``on_message``.
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(self.socket_path)
+            sock.settimeout(None)  # commands such as ingest can take a long time
+            
+            sock.sendall((json.dumps({"command": command, "args": args}) + "\n").encode("utf-8"))
+            
+            with sock.makefile("rb") as reader:
+                for line in reader:
+                    message = json.loads(line)
+                    if message["type"] == "result":
+                        return message["result"]
+                    if message["type"] == "error":
+                        raise DaemonError(message["message"])
+                    if on_message is not None:
+                        on_message(message)
+        
+        raise DaemonError("Daemon closed the connection without a result")
+    
+    def ping(self) -> Optional[Dict[str, Any]]:
+        """Daemon info (pid, model path), or None if it is not reachable."""
+        try:
+            return self.request("ping")
+        except (OSError, ValueError, DaemonError):
+            return None
+
+
+def connect_to_daemon(socket_path: str, connect_timeout: float = 0.5) -> Optional[DaemonClient]:
+    """Return a client for a running daemon, or None if none is listening."""
+    if not unix_sockets_supported() or not os.path.exists(socket_path):
+        return None
+    
+    client = DaemonClient(socket_path, connect_timeout)
+    info = client.ping()
+    if info is None:
+        return None
+    client.info = info
+    return client
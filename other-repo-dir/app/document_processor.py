@@ -3,25 +3,19 @@ Document processing module for handling various file formats.
 """
 
 import os
+import hashlib
 import logging
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
 from dataclasses import dataclass
 
-# Try importing PDF libraries with fallbacks
-try:
-    import PyPDF2
-except ImportError:
-    try:
-        import pypdf as PyPDF2
-    except ImportError:
-        raise ImportError("Neither PyPDF2 nor pypdf could be imported. Please install one of them.")
-
-import pdfplumber
-from docx import Document
-import markdown
+# Extractor libraries (pdfplumber, PyPDF2/pypdf, python-docx, markdown) are
+# imported inside the extractor methods so importing this module stays cheap.
 
 from .config import SUPPORTED_EXTENSIONS
+from .metrics import collect_timings, record_stage, stage_timer
 
 logger = logging.getLogger(__name__)
 
@@ -38,27 +32,95 @@ class DocumentChunk:
 class DocumentProcessor:
     """Processes documents and extracts text content with metadata."""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, num_workers: int = 1):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.num_workers = num_workers
     
-    def process_folder(self, folder_path: str) -> List[DocumentChunk]:
+    def process_folder(self, folder_path: str, num_workers: Optional[int] = None) -> List[DocumentChunk]:
         """Process all supported documents in a folder."""
+        file_paths = self.list_supported_files(folder_path)
+        
+        chunks = []
+        for _, file_chunks in self.iter_processed_files(file_paths, num_workers=num_workers):
+            chunks.extend(file_chunks)
+        
+        return chunks
+    
+    def list_supported_files(self, folder_path: str) -> List[Path]:
+        """List supported files in a folder, sorted so ingestion order is stable."""
         folder_path = Path(folder_path)
         if not folder_path.exists():
             raise FileNotFoundError(f"Folder not found: {folder_path}")
         
-        chunks = []
-        for file_path in folder_path.rglob("*"):
-            if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
+        return sorted(
+            file_path for file_path in folder_path.rglob("*")
+            if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+        )
+    
+    def iter_processed_files(
+        self,
+        file_paths: Iterable[Path],
+        num_workers: Optional[int] = None
+    ) -> Iterator[Tuple[Path, List[DocumentChunk]]]:
+        """Yield (file_path, chunks) per file, in input order.
+        
+        With more than one worker, extraction and chunking run in a process pool.
+        Files that fail are logged and skipped, as in sequential mode.
+        """
+        num_workers = self._resolve_num_workers(num_workers)
+        
+        if num_workers <= 1:
+            for file_path in file_paths:
                 try:
                     file_chunks = self.process_file(str(file_path))
-                    chunks.extend(file_chunks)
-                    logger.info(f"Processed {file_path.name}: {len(file_chunks)} chunks")
                 except Exception as e:
                     logger.error(f"Error processing {file_path}: {e}")
+                    continue
+                logger.info(f"Processed {Path(file_path).name}: {len(file_chunks)} chunks")
+                yield Path(file_path), file_chunks
+            return
         
-        return chunks
+        # Keep a bounded window of in-flight files so results can be yielded
+        # in order without holding the whole folder in memory.
+        file_paths = iter(file_paths)
+        max_in_flight = num_workers * 2
+        
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            pending = deque()
+            
+            def submit_next() -> None:
+                file_path = next(file_paths, None)
+                if file_path is not None:
+                    future = executor.submit(
+                        _process_file_in_worker, self.chunk_size, self.chunk_overlap, str(file_path)
+                    )
+                    pending.append((Path(file_path), future))
+            
+            for _ in range(max_in_flight):
+                submit_next()
+            
+            while pending:
+                file_path, future = pending.popleft()
+                submit_next()
+                try:
+                    file_chunks, timings = future.result()
+                except Exception as e:
+                    logger.error(f"Error processing {file_path}: {e}")
+                    continue
+                # Stage timings from the worker process land in this process's metrics
+                for stage, seconds in timings.items():
+                    record_stage(stage, seconds)
+                logger.info(f"Processed {file_path.name}: {len(file_chunks)} chunks")
+                yield file_path, file_chunks
+    
+    def _resolve_num_workers(self, num_workers: Optional[int]) -> int:
+        """Resolve the worker count; 0 means one worker per CPU."""
+        if num_workers is None:
+            num_workers = self.num_workers
+        if num_workers == 0:
+            num_workers = os.cpu_count() or 1
+        return max(1, num_workers)
     
     def process_file(self, file_path: str) -> List[DocumentChunk]:
         """Process a single file and return chunks."""
@@ -69,19 +131,21 @@ class DocumentProcessor:
             raise ValueError(f"Unsupported file type: {extension}")
         
         # Extract text based on file type
-        if extension == ".pdf":
-            text_content = self._extract_pdf_text(file_path)
-        elif extension == ".txt":
-            text_content = self._extract_text_file(file_path)
-        elif extension == ".md":
-            text_content = self._extract_markdown_file(file_path)
-        elif extension == ".docx":
-            text_content = self._extract_docx_file(file_path)
-        else:
-            raise ValueError(f"Handler not implemented for {extension}")
+        with stage_timer("extract"):
+            if extension == ".pdf":
+                text_content = self._extract_pdf_text(file_path)
+            elif extension == ".txt":
+                text_content = self._extract_text_file(file_path)
+            elif extension == ".md":
+                text_content = self._extract_markdown_file(file_path)
+            elif extension == ".docx":
+                text_content = self._extract_docx_file(file_path)
+            else:
+                raise ValueError(f"Handler not implemented for {extension}")
         
         # Create chunks
-        chunks = self._create_chunks(text_content, str(file_path))
+        with stage_timer("chunk"):
+            chunks = self._create_chunks(text_content, str(file_path))
         return chunks
     
     def _extract_pdf_text(self, file_path: Path) -> List[Dict[str, Any]]:
@@ -90,6 +154,8 @@ class DocumentProcessor:
         
         try:
             # Use pdfplumber for better text extraction
+            import pdfplumber
+            
             with pdfplumber.open(file_path) as pdf:
                 for page_num, page in enumerate(pdf.pages, 1):
                     text = page.extract_text()
@@ -103,6 +169,7 @@ class DocumentProcessor:
             logger.warning(f"pdfplumber failed for {file_path}, trying PyPDF2: {e}")
             # Fallback to PyPDF2
             try:
+                PyPDF2 = _import_pypdf()
                 with open(file_path, 'rb') as file:
                     pdf_reader = PyPDF2.PdfReader(file)
                     for page_num, page in enumerate(pdf_reader.pages, 1):
@@ -144,6 +211,8 @@ class DocumentProcessor:
         with open(file_path, 'r', encoding='utf-8') as file:
             md_content = file.read()
             # Convert markdown to plain text
+            import markdown
+            
             html = markdown.markdown(md_content)
             # Simple HTML tag removal (could use BeautifulSoup for better handling)
             import re
@@ -157,6 +226,8 @@ class DocumentProcessor:
     
     def _extract_docx_file(self, file_path: Path) -> List[Dict[str, Any]]:
         """Extract text from Word document."""
+        from docx import Document
+        
         doc = Document(file_path)
         paragraphs = []
         
@@ -174,6 +245,7 @@ class DocumentProcessor:
     def _create_chunks(self, pages_content: List[Dict[str, Any]], source: str) -> List[DocumentChunk]:
         """Create text chunks from extracted content."""
         chunks = []
+        occurrences: Counter = Counter()  # Repeats of identical text on a page
         
         for page_content in pages_content:
             text = page_content["text"]
@@ -187,6 +259,8 @@ class DocumentProcessor:
                 chunk_text = " ".join(chunk_words)
                 
                 if len(chunk_text.strip()) > 50:  # Skip very small chunks
+                    occurrence = occurrences[page_num, chunk_text]
+                    occurrences[page_num, chunk_text] += 1
                     chunk = DocumentChunk(
                         content=chunk_text,
                         source=source,
@@ -198,8 +272,50 @@ class DocumentProcessor:
                             "chunk_size": len(chunk_text),
                             "word_count": len(chunk_words)
                         },
-                        chunk_id=f"{Path(source).stem}_page_{page_num}_chunk_{len(chunks)}"
+                        chunk_id=make_chunk_id(source, page_num, chunk_text, occurrence)
                     )
                     chunks.append(chunk)
         
         return chunks
+
+
+def make_chunk_id(source: str, page_number: int, content: str, occurrence: int = 0) -> str:
+    """Collision-free chunk id derived from the file path, page and content.
+    
+    Files with the same name in different folders get different ids. The
+    chunk's position is not part of the id, so unchanged chunks keep their ids
+    when text elsewhere in the file is added or removed; ``occurrence`` numbers
+    repeats of identical text on the same page.
+    """
+    digest = hashlib.sha256()
+    for part in (str(Path(source).resolve()), str(page_number), content, str(occurrence)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+def _import_pypdf():
+    """Import PyPDF2, falling back to its successor pypdf."""
+    try:
+        import PyPDF2
+    except ImportError:
+        try:
+            import pypdf as PyPDF2
+        except ImportError:
+            raise ImportError("Neither PyPDF2 nor pypdf could be imported. Please install one of them.")
+    return PyPDF2
+
+
+def _process_file_in_worker(
+    chunk_size: int,
+    chunk_overlap: int,
+    file_path: str
+) -> Tuple[List[DocumentChunk], Dict[str, float]]:
+    """Process a single file inside a worker process.
+    
+    Returns the chunks and the stage timings, which the parent process records.
+    """
+    processor = DocumentProcessor(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    with collect_timings() as timings:
+        chunks = processor.process_file(file_path)
+    return chunks, timings
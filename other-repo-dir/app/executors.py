@@ -0,0 +1,83 @@
+"""
+Bounded worker pools for running blocking chatbot calls off the event loop.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when a pool's queue is full and no more work can be accepted."""
+
+
+class BoundedExecutor:
+    """Thread pool with a bounded backlog and visible queue depth.
+    
+    Threads rather than processes are used because the chatbot holds models and
+    database clients that cannot be shared across processes; the embedding and
+    LLM backends release the GIL while they compute.
+    """
+    
+    def __init__(self, name: str, max_workers: int, max_queue_depth: int = 32):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0  # Submitted and not yet finished (running + queued)
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+    
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Submit work, raising ExecutorBusyError if the backlog is full."""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue_depth:
+                self._rejected += 1
+                raise ExecutorBusyError(f"{self.name} pool is busy ({self._pending} requests pending)")
+            self._pending += 1
+        
+        try:
+            return self._executor.submit(self._run, fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking call in the pool and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+    
+    def _run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self._completed += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get worker usage and queue depth."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "max_queue_depth": self.max_queue_depth,
+                "completed": self._completed,
+                "rejected": self._rejected
+            }
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and shut the pool down."""
+        self._executor.shutdown(wait=wait)
+        logger.info(f"Shut down {self.name} pool")
@@ -3,30 +3,44 @@ Answer generation module using language models.
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 import re
+import threading
 import time
 
-try:
-    from langchain_community.llms import LlamaCpp
-    from langchain_core.callbacks.manager import CallbackManager
-    from langchain_core.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-except ImportError:
-    try:
-        from langchain.llms import LlamaCpp
-        from langchain.callbacks.manager import CallbackManager
-        from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
-    except ImportError:
-        # Fallback - will disable LLM functionality
-        LlamaCpp = None
-        CallbackManager = None
-        StreamingStdOutCallbackHandler = None
-
 from .retriever import RetrievalResult
+from .model_registry import model_registry
+from .metrics import record_stage, stage_timer
 from .config import LLM_CONFIG, CITATION_CONFIG
 
 logger = logging.getLogger(__name__)
 
+
+def _import_llamacpp_class():
+    """Import the LlamaCpp wrapper on first use; None disables LLM functionality."""
+    try:
+        from langchain_community.llms import LlamaCpp
+    except ImportError:
+        try:
+            from langchain.llms import LlamaCpp
+        except ImportError:
+            return None
+    return LlamaCpp
+
+# Static instruction block shared by every prompt. Keep request-specific text out
+# of it: any change here invalidates the cached prefix state.
+PROMPT_PREFIX = """You are a helpful assistant that answers questions based only on the provided context. 
+        
+Instructions:
+- Answer the question using only information from the context provided
+- If the context doesn't contain enough information to answer the question, say "I don't know"
+- Keep your answer concise and under 500 words
+- Be accurate and don't make up information
+- Include specific details when available
+
+Context:
+"""
+
 class AnswerGenerator:
     """Generates answers using retrieved context and language models."""
     
@@ -36,29 +50,118 @@ class AnswerGenerator:
         
         # Initialize LLM if model path is provided
         self.llm = None
+        self._llm_handle = None
+        self._llm_lock = threading.Lock()  # llama.cpp contexts are not thread-safe
+        self.prompt_stats = {"requests": 0, "prompt_tokens": 0, "prompt_tokens_reused": 0}
+        self._token_usage_warned = False
         if model_path:
             self._initialize_llm(model_path)
     
     def _initialize_llm(self, model_path: str) -> None:
-        """Initialize the language model."""
+        """Initialize the language model (shared with other generators in this process)."""
+        params = {
+            "max_tokens": self.config.get("max_tokens", 500),
+            "temperature": self.config.get("temperature", 0.1),
+            "n_ctx": self.config.get("n_ctx", 2048),
+            "n_batch": self.config.get("n_batch", 512),
+            "n_gpu_layers": self.config.get("n_gpu_layers", 0)
+        }
         try:
-            callback_manager = CallbackManager([StreamingStdOutCallbackHandler()])
+            LlamaCpp = _import_llamacpp_class()
+            if LlamaCpp is None:
+                raise ImportError("LlamaCpp is not available; install langchain-community and llama-cpp-python")
             
-            self.llm = LlamaCpp(
-                model_path=model_path,
-                max_tokens=self.config.get("max_tokens", 500),
-                temperature=self.config.get("temperature", 0.1),
-                n_ctx=self.config.get("n_ctx", 2048),
-                n_batch=self.config.get("n_batch", 512),
-                n_gpu_layers=self.config.get("n_gpu_layers", 0),
-                callback_manager=callback_manager,
-                verbose=False
+            # Tokens are consumed through ``self.llm.stream`` rather than printed
+            # to the server's stdout by a callback handler.
+            self._llm_handle = model_registry.acquire(
+                "llm",
+                str(model_path),
+                params,
+                lambda: LlamaCpp(model_path=model_path, streaming=True, verbose=False, **params)
             )
+            self.llm = self._llm_handle.model
+            # Every generator sharing this model must serialize on the same lock
+            self._llm_lock = self._llm_handle.lock
+            self._setup_prompt_cache()
             logger.info("Language model initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize language model: {e}")
             self.llm = None
     
+    def _setup_prompt_cache(self) -> None:
+        """Keep evaluated prompt states so shared prefixes are not re-processed.
+        
+        Attaches a llama.cpp RAM state cache (keyed by token prefix, so recently
+        used context blocks are restored too) and evaluates the static
+        instruction prefix once up front.
+        """
+        client = getattr(self.llm, "client", None)
+        cache_bytes = self.config.get("prompt_cache_bytes", 0)
+        if client is None or cache_bytes <= 0:
+            return
+        
+        try:
+            from llama_cpp import LlamaRAMCache
+            
+            with self._llm_lock:
+                if getattr(client, "cache", None) is not None:
+                    return  # shared model already set up by another generator
+                client.set_cache(LlamaRAMCache(capacity_bytes=cache_bytes))
+                
+                prefix_tokens = client.tokenize(PROMPT_PREFIX.encode("utf-8"))
+                client.reset()
+                client.eval(prefix_tokens)
+                client.cache[prefix_tokens] = client.save_state()
+            logger.info(f"Prompt prefix cached ({len(prefix_tokens)} tokens)")
+        except Exception as e:
+            logger.warning(f"Prompt cache disabled: {e}")
+    
+    def _prompt_token_usage(self, prompt: str) -> Optional[Dict[str, int]]:
+        """Prompt tokens for a request and how many llama.cpp can reuse.
+        
+        Mirrors llama.cpp's own choice between the tokens already in the
+        context and the longest-prefix state in the cache, using the public
+        ``Llama.input_ids``/``n_tokens`` and ``LlamaRAMCache.cache_state``
+        attributes. Must be called with the model lock held, right before
+        generation.
+        """
+        client = getattr(self.llm, "client", None)
+        if client is None or not hasattr(client, "tokenize"):
+            return None
+        
+        try:
+            tokens = list(client.tokenize(prompt.encode("utf-8")))
+            context_tokens = list(client.input_ids[:client.n_tokens])
+            reused = _common_prefix_length(context_tokens, tokens)
+            
+            # Other cache types (e.g. the disk cache) do not expose their keys
+            cache_state = getattr(getattr(client, "cache", None), "cache_state", None)
+            for key in cache_state or ():
+                reused = max(reused, _common_prefix_length(list(key), tokens))
+            
+            # llama.cpp always re-evaluates at least the last prompt token
+            reused = min(reused, max(len(tokens) - 1, 0))
+            return {"prompt_tokens": len(tokens), "prompt_tokens_reused": reused}
+        except Exception as e:
+            if not self._token_usage_warned:
+                logger.warning(f"Prompt token usage not reported; llama-cpp-python did not expose it: {e}")
+                self._token_usage_warned = True
+            return None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Cumulative prompt evaluation statistics."""
+        stats = dict(self.prompt_stats)
+        total = stats["prompt_tokens"]
+        stats["reuse_rate"] = stats["prompt_tokens_reused"] / total if total else 0.0
+        return stats
+    
+    def close(self) -> None:
+        """Release the shared language model."""
+        if self._llm_handle is not None:
+            self._llm_handle.release()
+            self._llm_handle = None
+        self.llm = None
+    
     def generate_answer(
         self, 
         query: str, 
@@ -66,37 +169,80 @@ class AnswerGenerator:
         include_citations: bool = True
     ) -> Dict[str, Any]:
         """Generate an answer based on query and retrieved context."""
+        result = {}
+        for event in self.generate_answer_stream(query, retrieval_results, include_citations):
+            if event["type"] == "done":
+                result = {key: value for key, value in event.items() if key != "type"}
+        return result
+    
+    def generate_answer_stream(
+        self,
+        query: str,
+        retrieval_results: List[RetrievalResult],
+        include_citations: bool = True
+    ) -> Iterator[Dict[str, Any]]:
+        """Generate an answer incrementally.
+        
+        Yields ``{"type": "token", "text": ...}`` events as the answer is produced,
+        followed by a single ``{"type": "done", ...}`` event carrying the full
+        answer, citations, sources and timing.
+        """
         start_time = time.time()
         
         # Check if we have sufficient context
         if not retrieval_results:
-            return {
-                "answer": "I don't know. I couldn't find relevant information in the provided documents.",
+            answer = "I don't know. I couldn't find relevant information in the provided documents."
+            yield {"type": "token", "text": answer}
+            yield {
+                "type": "done",
+                "answer": answer,
                 "confidence": 0.0,
                 "citations": [],
                 "sources": [],
-                "generation_time": time.time() - start_time
+                "generation_time": time.time() - start_time,
+                "time_to_first_token": time.time() - start_time
             }
+            return
         
         # Check confidence threshold
         avg_confidence = sum(r.similarity_score for r in retrieval_results) / len(retrieval_results)
         if avg_confidence < 0.3:  # Low confidence threshold
-            return {
-                "answer": "I don't know. The available information doesn't seem directly relevant to your question.",
+            answer = "I don't know. The available information doesn't seem directly relevant to your question."
+            yield {"type": "token", "text": answer}
+            yield {
+                "type": "done",
+                "answer": answer,
                 "confidence": avg_confidence,
                 "citations": [],
                 "sources": [],
-                "generation_time": time.time() - start_time
+                "generation_time": time.time() - start_time,
+                "time_to_first_token": time.time() - start_time
             }
+            return
         
         # Prepare context
         context = self._prepare_context(retrieval_results)
         
         # Generate answer
+        usage = {}
         if self.llm:
-            answer = self._generate_with_llm(query, context)
+            pieces = self._stream_with_llm(query, context, usage)
         else:
-            answer = self._generate_simple_answer(query, retrieval_results)
+            with stage_timer("extractive_answer"):
+                simple_answer = self._generate_simple_answer(query, retrieval_results)
+            pieces = self._stream_text(simple_answer)
+        
+        time_to_first_token = None
+        streamed = []
+        for text in pieces:
+            if time_to_first_token is None:
+                time_to_first_token = time.time() - start_time
+            streamed.append(text)
+            yield {"type": "token", "text": text}
+        
+        answer = "".join(streamed)
+        if self.llm:
+            answer = self._clean_response(answer)
         
         # Add citations if requested
         if include_citations:
@@ -110,12 +256,15 @@ class AnswerGenerator:
         
         generation_time = time.time() - start_time
         
-        return {
+        yield {
+            "type": "done",
             "answer": answer,
             "confidence": avg_confidence,
             "citations": citations,
             "sources": sources,
-            "generation_time": generation_time
+            "generation_time": generation_time,
+            "time_to_first_token": time_to_first_token if time_to_first_token is not None else generation_time,
+            **usage
         }
     
     def _prepare_context(self, retrieval_results: List[RetrievalResult]) -> str:
@@ -129,27 +278,59 @@ class AnswerGenerator:
         
         return "\n".join(context_parts)
     
-    def _generate_with_llm(self, query: str, context: str) -> str:
-        """Generate answer using the language model."""
+    def _stream_with_llm(self, query: str, context: str, usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        """Stream answer text from the language model as it is generated.
+        
+        Prompt token usage is written into ``usage`` when the model reports it.
+        Time to the first token is recorded as the ``prompt_eval`` stage and the
+        rest as ``token_generation``.
+        """
         prompt = self._create_prompt(query, context)
         
         try:
-            response = self.llm(prompt)
-            
-            # Clean up the response
-            answer = self._clean_response(response)
-            
-            # Ensure answer length limit
-            max_words = 500
-            words = answer.split()
-            if len(words) > max_words:
-                answer = " ".join(words[:max_words]) + "..."
-            
-            return answer
+            # Hold the lock for the whole generation; closing the generator early
+            # (e.g. a disconnected client) releases it.
+            with self._llm_lock:
+                token_usage = self._prompt_token_usage(prompt)
+                if token_usage is not None:
+                    self.prompt_stats["requests"] += 1
+                    self.prompt_stats["prompt_tokens"] += token_usage["prompt_tokens"]
+                    self.prompt_stats["prompt_tokens_reused"] += token_usage["prompt_tokens_reused"]
+                    if usage is not None:
+                        usage.update(token_usage)
+                
+                max_words = 500
+                words = 0
+                stream_start = time.perf_counter()
+                first_token_at = None
+                try:
+                    for text in self.llm.stream(prompt):
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            record_stage("prompt_eval", first_token_at - stream_start)
+                        piece_words = len(text.split())
+                        if words + piece_words > max_words:
+                            # Keep the words of this piece that still fit, as the
+                            # non-streaming answer keeps the first max_words words
+                            fits = re.match(r"(?:\s*\S+){%d}" % (max_words - words), text)
+                            if fits and fits.end():
+                                yield text[:fits.end()]
+                            yield "..."
+                            break
+                        words += piece_words
+                        yield text
+                finally:
+                    if first_token_at is not None:
+                        record_stage("token_generation", time.perf_counter() - first_token_at)
             
         except Exception as e:
             logger.error(f"Error generating answer with LLM: {e}")
-            return "I apologize, but I encountered an error while generating the answer."
+            yield "I apologize, but I encountered an error while generating the answer."
+    
+    def _stream_text(self, text: str) -> Iterator[str]:
+        """Split an already complete answer into word-sized stream pieces."""
+        for piece in re.findall(r'\S+\s*', text):
+            yield piece
     
     def _generate_simple_answer(self, query: str, retrieval_results: List[RetrievalResult]) -> str:
         """Generate a simple answer without LLM (fallback)."""
@@ -185,24 +366,16 @@ class AnswerGenerator:
             return f"Based on the documents, here's what I found: {content[:300]}..."
     
     def _create_prompt(self, query: str, context: str) -> str:
-        """Create a prompt for the language model."""
-        prompt = f"""You are a helpful assistant that answers questions based only on the provided context. 
+        """Create a prompt for the language model.
         
-Instructions:
-- Answer the question using only information from the context provided
-- If the context doesn't contain enough information to answer the question, say "I don't know"
-- Keep your answer concise and under 500 words
-- Be accurate and don't make up information
-- Include specific details when available
-
-Context:
-{context}
+        The instruction block is a fixed prefix so llama.cpp can reuse its
+        evaluated state; only context and question vary between requests.
+        """
+        return PROMPT_PREFIX + f"""{context}
 
 Question: {query}
 
 Answer:"""
-        
-        return prompt
     
     def _clean_response(self, response: str) -> str:
         """Clean up the model response."""
@@ -241,3 +414,13 @@ Answer:"""
             return answer + citation_text
         
         return answer
+
+
+def _common_prefix_length(a: List[int], b: List[int]) -> int:
+    """Length of the common leading run of two token sequences."""
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
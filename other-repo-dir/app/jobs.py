@@ -0,0 +1,158 @@
+"""
+Background ingestion jobs with progress tracking.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from .executors import BoundedExecutor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestionJob:
+    """State and progress of a single ingestion job."""
+    job_id: str
+    folder_path: str
+    reset: bool = False
+    status: str = "queued"  # queued, running, completed, failed
+    files_total: int = 0
+    files_done: int = 0
+    chunks_embedded: int = 0
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    
+    def update_progress(self, progress: Dict[str, int]) -> None:
+        """Progress callback for DocumentChatbot.ingest_documents."""
+        self.files_total = progress.get("files_total", self.files_total)
+        self.files_done = progress.get("files_done", self.files_done)
+        self.chunks_embedded = progress.get("chunks_embedded", self.chunks_embedded)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Job status including throughput and estimated time remaining."""
+        elapsed = 0.0
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        
+        files_per_second = self.files_done / elapsed if elapsed > 0 else 0.0
+        chunks_per_second = self.chunks_embedded / elapsed if elapsed > 0 else 0.0
+        
+        eta_seconds = None
+        if self.status == "running" and files_per_second > 0:
+            eta_seconds = max(0, self.files_total - self.files_done) / files_per_second
+        elif self.status in ("completed", "failed"):
+            eta_seconds = 0.0
+        
+        return {
+            "job_id": self.job_id,
+            "folder_path": self.folder_path,
+            "status": self.status,
+            "files_total": self.files_total,
+            "files_done": self.files_done,
+            "chunks_embedded": self.chunks_embedded,
+            "elapsed_seconds": elapsed,
+            "files_per_second": files_per_second,
+            "chunks_per_second": chunks_per_second,
+            "eta_seconds": eta_seconds,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class IngestionJobManager:
+    """Queues ingestion jobs on an executor and tracks their progress.
+    
+    Jobs run in submission order on the given executor, so with a single
+    worker only one ingestion uses the embedder at a time.
+    """
+    
+    def __init__(self, chatbot, executor: BoundedExecutor, max_finished_jobs: int = 100):
+        self.chatbot = chatbot
+        self.executor = executor
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+    
+    def submit(
+        self,
+        folder_path: str,
+        reset: bool = False,
+        cleanup: Optional[Callable[[], None]] = None
+    ) -> IngestionJob:
+        """Queue a folder for ingestion and return the job immediately.
+        
+        ``cleanup`` runs after the job finishes, whether it succeeded or not.
+        Raises ExecutorBusyError if the ingestion queue is full.
+        """
+        job = IngestionJob(job_id=uuid.uuid4().hex, folder_path=folder_path, reset=reset)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        
+        try:
+            self.executor.submit(self._run, job, cleanup)
+        except Exception:
+            with self._lock:
+                del self._jobs[job.job_id]
+            raise
+        
+        logger.info(f"Queued ingestion job {job.job_id} for {folder_path}")
+        return job
+    
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """Look up a job by id."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Status of all tracked jobs, newest first."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in sorted(jobs, key=lambda j: j.created_at, reverse=True)]
+    
+    def _run(self, job: IngestionJob, cleanup: Optional[Callable[[], None]]) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            if job.reset:
+                reset_result = self.chatbot.reset_knowledge_base()
+                if not reset_result['success']:
+                    raise RuntimeError(reset_result['message'])
+            
+            job.result = self.chatbot.ingest_documents(
+                job.folder_path, progress_callback=job.update_progress
+            )
+            if job.result['success']:
+                job.status = "completed"
+            else:
+                job.status = "failed"
+                job.error = job.result['message']
+        except Exception as e:
+            logger.error(f"Ingestion job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            if cleanup:
+                cleanup()
+            self._prune()
+    
+    def _prune(self) -> None:
+        """Forget the oldest finished jobs beyond max_finished_jobs."""
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished_at),
+                key=lambda j: j.finished_at
+            )
+            for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+                del self._jobs[job.job_id]
@@ -0,0 +1,296 @@
+"""
+BM25 lexical index kept alongside the vector store for hybrid retrieval.
+"""
+
+import heapq
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .storage import file_lock
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_FILE_NAME = "bm25_index.npz"
+
+# Words plus compound identifiers such as "ERR-4012", "v2.1" or "parse_config"
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_.:/][^\W_]+)*")
+COMPOUND_SEPARATORS = re.compile(r"[-_.:/]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase tokens; compound identifiers are indexed whole and by part."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if COMPOUND_SEPARATORS.search(token):
+            tokens.extend(part for part in COMPOUND_SEPARATORS.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring.
+    
+    On disk the postings are stored as CSR-style NumPy arrays (one offsets array
+    plus flat doc-index and term-frequency arrays). Loaded postings stay in that
+    form, and a term lookup is one dict access plus an array slice. Documents
+    added since the last save live in a small in-memory delta. Deletions are
+    tombstones that are compacted away on save. If another process saved the
+    index in the meantime, save reloads it and replays this instance's changes.
+    """
+    
+    def __init__(self, index_path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.index_path = Path(index_path) if index_path else None
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset_state()
+        
+        # Adds (doc id, term counts) and removes (doc id, None) since the last
+        # load or save; None after clear(), when save overwrites the file
+        self._pending: Optional[List[Tuple[str, Optional[Counter]]]] = []
+        self._disk_stamp: Optional[Tuple[int, int, int]] = None
+        
+        if self.index_path and self.index_path.exists():
+            self._load()
+    
+    def _reset_state(self) -> None:
+        self.doc_ids: List[Optional[str]] = []  # None marks a deleted document
+        self._doc_index: Dict[str, int] = {}
+        self._total_length = 0
+        
+        # Per-document length and liveness, grown geometrically as documents are added
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._live = np.zeros(1024, dtype=bool)
+        
+        # Base segment loaded from disk
+        self._base_terms: Dict[str, int] = {}
+        self._base_offsets = np.zeros(1, dtype=np.int64)
+        self._base_docs = np.zeros(0, dtype=np.int32)
+        self._base_tfs = np.zeros(0, dtype=np.int32)
+        
+        # Postings added since the last save: term -> {doc index: term frequency}
+        self._delta: Dict[str, Dict[int, int]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._doc_index)
+    
+    def add(self, ids: Iterable[str], texts: Iterable[str]) -> None:
+        """Index documents; an existing id is replaced."""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                term_counts = Counter(tokenize(text))
+                self._add_one(doc_id, term_counts)
+                if self._pending is not None:
+                    self._pending.append((doc_id, term_counts))
+    
+    def _add_one(self, doc_id: str, term_counts: Counter) -> None:
+        if doc_id in self._doc_index:
+            self._remove_one(doc_id)
+        
+        doc = len(self.doc_ids)
+        length = sum(term_counts.values())
+        
+        if doc >= len(self._lengths):
+            self._lengths = np.resize(self._lengths, len(self._lengths) * 2)
+            self._live = np.resize(self._live, len(self._live) * 2)
+        self._lengths[doc] = length
+        self._live[doc] = True
+        
+        self.doc_ids.append(doc_id)
+        self._doc_index[doc_id] = doc
+        self._total_length += length
+        
+        for term, count in term_counts.items():
+            self._delta.setdefault(term, {})[doc] = count
+    
+    def remove(self, ids: Iterable[str]) -> None:
+        """Remove documents by id; unknown ids are ignored."""
+        with self._lock:
+            for doc_id in ids:
+                self._remove_one(doc_id)
+                if self._pending is not None:
+                    self._pending.append((doc_id, None))
+    
+    def _remove_one(self, doc_id: str) -> None:
+        if doc_id not in self._doc_index:
+            return
+        doc = self._doc_index.pop(doc_id)
+        self.doc_ids[doc] = None
+        self._live[doc] = False
+        self._total_length -= int(self._lengths[doc])
+    
+    def clear(self) -> None:
+        """Remove every document."""
+        with self._lock:
+            self._reset_state()
+            self._pending = None
+    
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Doc indices and term frequencies for a term (tombstones included)."""
+        docs, tfs = self._base_docs[0:0], self._base_tfs[0:0]
+        row = self._base_terms.get(term)
+        if row is not None:
+            start, end = self._base_offsets[row], self._base_offsets[row + 1]
+            docs, tfs = self._base_docs[start:end], self._base_tfs[start:end]
+        
+        delta = self._delta.get(term)
+        if delta:
+            docs = np.concatenate([docs, np.fromiter(delta.keys(), dtype=np.int32, count=len(delta))])
+            tfs = np.concatenate([tfs, np.fromiter(delta.values(), dtype=np.int32, count=len(delta))])
+        return docs, tfs
+    
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return up to k (doc id, BM25 score) pairs, best first."""
+        with self._lock:
+            num_docs = len(self._doc_index)
+            if num_docs == 0:
+                return []
+            
+            avg_length = self._total_length / num_docs or 1.0
+            scores: Dict[int, float] = {}
+            
+            for term in set(tokenize(query)):
+                docs, tfs = self._postings(term)
+                if len(docs) == 0:
+                    continue
+                mask = self._live[docs]
+                docs, tfs = docs[mask], tfs[mask].astype(np.float32)
+                if len(docs) == 0:
+                    continue
+                
+                df = len(docs)
+                idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / avg_length)
+                term_scores = idf * tfs * (self.k1 + 1) / (tfs + norm)
+                
+                for doc, score in zip(docs.tolist(), term_scores.tolist()):
+                    scores[doc] = scores.get(doc, 0.0) + score
+            
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(self.doc_ids[doc], score) for doc, score in best]
+    
+    def term_coverage(self, query: str, ids: Iterable[str]) -> Dict[str, float]:
+        """Share of the query's IDF weight matched by each document, in [0, 1].
+        
+        Unlike raw BM25 scores this is on a fixed scale, so it can be compared
+        with similarity thresholds. Unknown ids are left out.
+        """
+        with self._lock:
+            num_docs = len(self._doc_index)
+            wanted = {self._doc_index[doc_id]: doc_id for doc_id in ids if doc_id in self._doc_index}
+            covered = dict.fromkeys(wanted, 0.0)
+            total = 0.0
+            
+            for term in set(tokenize(query)):
+                docs, _ = self._postings(term)
+                docs = docs[self._live[docs]] if len(docs) else docs
+                idf = math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                total += idf
+                for doc in covered.keys() & set(docs.tolist()):
+                    covered[doc] += idf
+            
+            return {doc_id: covered[doc] / total if total else 0.0 for doc, doc_id in wanted.items()}
+    
+    def save(self) -> None:
+        """Compact live postings and write them to disk."""
+        if not self.index_path:
+            return
+        
+        with self._lock, file_lock(self.index_path):
+            if self._pending is not None and self._file_stamp() not in (None, self._disk_stamp):
+                # Another process saved since we loaded; start from its index
+                pending = self._pending
+                self._load()
+                for doc_id, term_counts in pending:
+                    if term_counts is None:
+                        self._remove_one(doc_id)
+                    else:
+                        self._add_one(doc_id, term_counts)
+            
+            # Renumber live documents densely
+            remap = np.full(len(self.doc_ids), -1, dtype=np.int64)
+            live_ids = []
+            for doc, doc_id in enumerate(self.doc_ids):
+                if doc_id is not None:
+                    remap[doc] = len(live_ids)
+                    live_ids.append(doc_id)
+            live_lengths = self._lengths[:len(self.doc_ids)][self._live[:len(self.doc_ids)]]
+            
+            terms = []
+            offsets = [0]
+            doc_parts = []
+            tf_parts = []
+            for term in sorted(set(self._base_terms) | set(self._delta)):
+                docs, tfs = self._postings(term)
+                new_docs = remap[docs] if len(docs) else docs
+                mask = new_docs >= 0
+                if not mask.any():
+                    continue
+                terms.append(term)
+                doc_parts.append(new_docs[mask].astype(np.int32))
+                tf_parts.append(tfs[mask].astype(np.int32))
+                offsets.append(offsets[-1] + int(mask.sum()))
+            
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.index_path.parent, suffix=".npz")
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    np.savez_compressed(
+                        file,
+                        terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                        doc_ids=np.frombuffer("\n".join(live_ids).encode("utf-8"), dtype=np.uint8),
+                        doc_lengths=np.asarray(live_lengths, dtype=np.int32),
+                        offsets=np.asarray(offsets, dtype=np.int64),
+                        docs=np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int32),
+                        tfs=np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int32),
+                        params=np.asarray([self.k1, self.b], dtype=np.float64)
+                    )
+                os.replace(temp_path, self.index_path)
+            except BaseException:
+                Path(temp_path).unlink(missing_ok=True)
+                raise
+            
+            self._load()
+            self._pending = []
+            logger.info(f"Saved BM25 index: {len(live_ids)} documents, {len(terms)} terms")
+    
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identity of the index file on disk, or None if there is none."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+    
+    def _load(self) -> None:
+        with self._lock:
+            self._reset_state()
+            self._disk_stamp = self._file_stamp()
+            with np.load(self.index_path) as data:
+                terms_blob = data["terms"].tobytes().decode("utf-8")
+                ids_blob = data["doc_ids"].tobytes().decode("utf-8")
+                terms = terms_blob.split("\n") if terms_blob else []
+                self.doc_ids = ids_blob.split("\n") if ids_blob else []
+                lengths = data["doc_lengths"].astype(np.float32)
+                self._base_offsets = data["offsets"]
+                self._base_docs = data["docs"]
+                self._base_tfs = data["tfs"]
+            
+            capacity = max(1024, len(lengths) * 2)
+            self._lengths = np.zeros(capacity, dtype=np.float32)
+            self._lengths[:len(lengths)] = lengths
+            self._live = np.zeros(capacity, dtype=bool)
+            self._live[:len(lengths)] = True
+            
+            self._base_terms = {term: row for row, term in enumerate(terms)}
+            self._doc_index = {doc_id: doc for doc, doc_id in enumerate(self.doc_ids)}
+            self._total_length = int(lengths.sum())
@@ -0,0 +1,163 @@
+"""
+Ingestion manifest for incremental re-ingestion of document folders.
+"""
+
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from .storage import file_lock, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE_NAME = "ingest_manifest.json"
+
+
+def _is_under(path: Path, folder: Path) -> bool:
+    """Whether a path lies inside a folder (``Path.is_relative_to`` needs Python 3.9)."""
+    try:
+        path.relative_to(folder)
+        return True
+    except ValueError:
+        return False
+
+
+@dataclass
+class ManifestEntry:
+    """What was ingested for a single source file."""
+    path: str
+    size: int
+    mtime: float
+    content_hash: str
+    chunk_ids: List[str] = field(default_factory=list)
+    ingested_at: float = 0.0
+
+
+class IngestionManifest:
+    """Tracks size, mtime and content hash of every ingested file.
+    
+    Files whose size and mtime are unchanged are skipped without being read.
+    Otherwise the content hash decides whether the file really changed.
+    Saving merges this instance's changes into the manifest on disk, so
+    processes ingesting into the same persist directory keep each other's entries.
+    """
+    
+    def __init__(self, manifest_path: str):
+        self.manifest_path = Path(manifest_path)
+        self._hashes: Dict[str, str] = {}  # Hashes computed during this run
+        
+        # Changes since the last load or save, replayed onto the file on save
+        self._changed: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._cleared = False
+        
+        self.entries: Dict[str, ManifestEntry] = self._load_entries()
+    
+    @classmethod
+    def for_persist_directory(cls, persist_directory: str) -> "IngestionManifest":
+        """Open the manifest stored alongside a Chroma persist directory."""
+        return cls(str(Path(persist_directory) / MANIFEST_FILE_NAME))
+    
+    @staticmethod
+    def key_for(file_path: Path) -> str:
+        """Manifest key for a file (its resolved absolute path)."""
+        return str(Path(file_path).resolve())
+    
+    def get(self, file_path: Path) -> Optional[ManifestEntry]:
+        """Get the manifest entry for a file, if it was ingested before."""
+        return self.entries.get(self.key_for(file_path))
+    
+    def needs_ingest(self, file_path: Path) -> bool:
+        """Check whether a file is new or has changed since it was ingested."""
+        entry = self.get(file_path)
+        if entry is None:
+            return True
+        
+        stat = Path(file_path).stat()
+        if stat.st_size == entry.size and stat.st_mtime == entry.mtime:
+            return False
+        
+        if self._content_hash(file_path) == entry.content_hash:
+            # Touched but identical; remember the new mtime so we skip hashing next time
+            entry.size = stat.st_size
+            entry.mtime = stat.st_mtime
+            self._changed.add(entry.path)
+            return False
+        
+        return True
+    
+    def record(self, file_path: Path, chunk_ids: List[str]) -> None:
+        """Record a file as ingested with the given chunk ids."""
+        stat = Path(file_path).stat()
+        key = self.key_for(file_path)
+        self.entries[key] = ManifestEntry(
+            path=key,
+            size=stat.st_size,
+            mtime=stat.st_mtime,
+            content_hash=self._content_hash(file_path),
+            chunk_ids=list(chunk_ids),
+            ingested_at=time.time()
+        )
+        self._changed.add(key)
+        self._removed.discard(key)
+    
+    def remove(self, key: str) -> Optional[ManifestEntry]:
+        """Remove an entry by manifest key."""
+        self._changed.discard(key)
+        self._removed.add(key)
+        return self.entries.pop(key, None)
+    
+    def missing_files(self, folder_path: str) -> List[str]:
+        """Keys of entries under a folder whose files no longer exist."""
+        folder = Path(folder_path).resolve()
+        return [
+            key for key in self.entries
+            if _is_under(Path(key), folder) and not Path(key).exists()
+        ]
+    
+    def clear(self) -> None:
+        """Forget all ingested files."""
+        self.entries.clear()
+        self._hashes.clear()
+        self._changed.clear()
+        self._removed.clear()
+        self._cleared = True
+    
+    def save(self) -> None:
+        """Merge this instance's changes into the manifest on disk."""
+        with file_lock(self.manifest_path):
+            entries = {} if self._cleared else self._load_entries()
+            for key in self._removed:
+                entries.pop(key, None)
+            for key in self._changed:
+                entries[key] = self.entries[key]
+            
+            save_json(self.manifest_path, {
+                "version": 1,
+                "files": {key: asdict(entry) for key, entry in entries.items()}
+            })
+        
+        self.entries = entries
+        self._changed.clear()
+        self._removed.clear()
+        self._cleared = False
+        logger.info(f"Saved ingestion manifest with {len(self.entries)} files")
+    
+    def _load_entries(self) -> Dict[str, ManifestEntry]:
+        data = load_json(self.manifest_path, default={})
+        return {path: ManifestEntry(**entry) for path, entry in data.get("files", {}).items()}
+    
+    def _content_hash(self, file_path: Path) -> str:
+        """SHA-256 of the file contents, computed at most once per run."""
+        stat = Path(file_path).stat()
+        cache_key = f"{self.key_for(file_path)}:{stat.st_size}:{stat.st_mtime}"
+        if cache_key not in self._hashes:
+            digest = hashlib.sha256()
+            with open(file_path, 'rb') as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+            self._hashes[cache_key] = digest.hexdigest()
+        return self._hashes[cache_key]
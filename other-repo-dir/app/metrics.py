@@ -0,0 +1,160 @@
+"""
+Stage-level latency metrics.
+
+Every pipeline stage (query embedding, vector query, prompt evaluation, text
+extraction, ...) is timed with ``stage_timer``. Timings feed process-wide
+histograms, rendered in Prometheus text format for ``/metrics``, and, inside a
+``collect_timings`` block, a per-request breakdown.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_METRIC_NAME = "doc_chatbot_stage_seconds"
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations for one stage."""
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value: float) -> None:
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.bucket_counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+    
+    def cumulative_counts(self) -> List[int]:
+        """Observations at or below each bucket bound."""
+        counts = []
+        total = 0
+        for count in self.bucket_counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class StageMetrics:
+    """Thread-safe histograms keyed by stage name."""
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+    
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Count, total and mean seconds per stage."""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "total_seconds": h.sum,
+                    "mean_seconds": h.sum / h.count if h.count else 0.0
+                }
+                for stage, h in sorted(self._histograms.items())
+            }
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+    
+    def render_prometheus(
+        self,
+        gauges: Optional[Dict[str, Tuple[str, float]]] = None,
+        counters: Optional[Dict[str, Tuple[str, float]]] = None
+    ) -> str:
+        """Render the stage histograms (and optional gauges and counters) in Prometheus text format.
+        
+        ``gauges`` and ``counters`` map metric names to (help text, value).
+        Counter names should end in ``_total``.
+        """
+        lines = [
+            f"# HELP {STAGE_METRIC_NAME} Time spent in each pipeline stage.",
+            f"# TYPE {STAGE_METRIC_NAME} histogram"
+        ]
+        with self._lock:
+            for stage, h in sorted(self._histograms.items()):
+                for upper, count in zip(h.buckets, h.cumulative_counts()):
+                    lines.append(f'{STAGE_METRIC_NAME}_bucket{{stage="{stage}",le="{upper:g}"}} {count}')
+                lines.append(f'{STAGE_METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{STAGE_METRIC_NAME}_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{STAGE_METRIC_NAME}_count{{stage="{stage}"}} {h.count}')
+        
+        for metric_type, metrics in (("gauge", gauges), ("counter", counters)):
+            for name, (help_text, value) in sorted((metrics or {}).items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.append(f"{name} {value:g}")
+        
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide stage metrics
+stage_metrics = StageMetrics()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration in the histograms and the current request breakdown."""
+    stage_metrics.observe(stage, seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+
+def add_request_timings(timings: Dict[str, float]) -> None:
+    """Add stage durations recorded elsewhere to the current request breakdown.
+    
+    Used for stages run on a worker thread on the request's behalf (e.g. a
+    batched query); their histograms were already observed there.
+    """
+    current = _request_timings.get()
+    if current is not None:
+        for stage, seconds in timings.items():
+            current[stage] = current.get(stage, 0.0) + seconds
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one observation of ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """Collect a per-request {stage: seconds} breakdown for the enclosed block.
+    
+    Safe to use inside generators: the previous collector is restored on exit
+    rather than reset by token.
+    """
+    previous = _request_timings.get()
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.set(previous)
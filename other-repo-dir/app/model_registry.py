@@ -0,0 +1,142 @@
+"""
+Process-wide registry of loaded models (embedder and LLM).
+
+Each (kind, name, params) combination is loaded once per process and shared by
+every chatbot instance that asks for it. Holders get a ModelHandle and must
+release it; a model is unloaded when its last handle is released, or
+explicitly with ``unload``.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, str, str]
+
+
+class _Entry:
+    """A loaded model and its bookkeeping."""
+    
+    def __init__(self, model: Any):
+        self.model = model
+        self.lock = threading.Lock()  # serializes callers of non-thread-safe models
+        self.refcount = 0
+        self.loaded_at = time.time()
+
+
+class ModelHandle:
+    """A reference to a shared model; call ``release`` when done with it."""
+    
+    def __init__(self, registry: "ModelRegistry", key: ModelKey, entry: _Entry):
+        self.key = key
+        self.model = entry.model
+        self.lock = entry.lock
+        self.released = False
+        self._registry = registry
+        self._entry = entry
+    
+    def release(self) -> None:
+        """Drop this reference (idempotent)."""
+        self._registry.release(self)
+
+
+class ModelRegistry:
+    """Thread-safe, reference-counted cache of loaded models."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[ModelKey, _Entry] = {}
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+    
+    @staticmethod
+    def make_key(kind: str, name: str, params: Optional[Dict[str, Any]] = None) -> ModelKey:
+        """Key identifying a model by kind, name/path and load parameters."""
+        return (kind, name, json.dumps(params or {}, sort_keys=True, default=str))
+    
+    def acquire(
+        self,
+        kind: str,
+        name: str,
+        params: Optional[Dict[str, Any]],
+        loader: Callable[[], Any]
+    ) -> ModelHandle:
+        """Get a handle to a model, calling ``loader`` only if it is not loaded yet."""
+        key = self.make_key(kind, name, params)
+        
+        # Load outside the registry lock so other models stay available meanwhile;
+        # concurrent requests for the same model wait on its load lock instead.
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refcount += 1
+                    return ModelHandle(self, key, entry)
+            
+            logger.info(f"Loading {kind} model: {name}")
+            start_time = time.time()
+            entry = _Entry(loader())
+            logger.info(f"Loaded {kind} model {name} in {time.time() - start_time:.2f}s")
+            
+            with self._lock:
+                entry.refcount = 1
+                self._entries[key] = entry
+            return ModelHandle(self, key, entry)
+    
+    def release(self, handle: ModelHandle) -> None:
+        """Release a handle, unloading the model when no references remain."""
+        with self._lock:
+            if handle.released:
+                return
+            handle.released = True
+            
+            entry = self._entries.get(handle.key)
+            if entry is not handle._entry:
+                return  # already force-unloaded
+            
+            entry.refcount -= 1
+            if entry.refcount <= 0:
+                del self._entries[handle.key]
+                logger.info(f"Unloaded {handle.key[0]} model: {handle.key[1]}")
+    
+    def unload(self, kind: Optional[str] = None, name: Optional[str] = None) -> int:
+        """Explicitly unload matching models, even if still referenced.
+        
+        Returns the number of models unloaded. Current holders keep working with
+        their reference until they release it; new acquires load a fresh copy.
+        """
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if (kind is None or key[0] == kind) and (name is None or key[1] == name)
+            ]
+            for key in keys:
+                del self._entries[key]
+        
+        for key in keys:
+            logger.info(f"Unloaded {key[0]} model: {key[1]}")
+        return len(keys)
+    
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Loaded models with their reference counts."""
+        with self._lock:
+            return [
+                {
+                    "kind": key[0],
+                    "name": key[1],
+                    "params": json.loads(key[2]),
+                    "refcount": entry.refcount,
+                    "loaded_at": entry.loaded_at
+                }
+                for key, entry in self._entries.items()
+            ]
+
+
+# The process-wide registry shared by all chatbot instances
+model_registry = ModelRegistry()
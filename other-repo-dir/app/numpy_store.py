@@ -0,0 +1,422 @@
+"""
+Exact-search vector backend: a memory-mapped float32 matrix plus a SQLite sidecar.
+
+For small and medium collections (up to a few hundred thousand chunks), one
+matrix multiplication and ``argpartition`` per batch of queries is faster than
+an HNSW index and always finds the true nearest neighbours.
+
+NumpyClient and NumpyCollection implement the subset of Chroma's client and
+collection API that VectorStore uses, so either backend can sit behind it.
+Each collection lives in ``<persist_directory>/numpy_store/<name>/``:
+
+- ``embeddings.f32``: row-major float32 matrix, grown by doubling
+- ``chunks.sqlite3``: row number, id, text and metadata of every chunk, plus
+  the collection metadata (including the ``hnsw:space`` distance space)
+
+The sidecar is the source of truth for which row holds which chunk. Writes
+allocate rows inside a SQLite write transaction, and every operation reloads
+the in-memory row maps when another connection has committed, so several
+processes can share a collection.
+"""
+
+import json
+import logging
+import re
+import shutil
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+NUMPY_STORE_DIR_NAME = "numpy_store"
+MATRIX_FILE_NAME = "embeddings.f32"
+SIDECAR_FILE_NAME = "chunks.sqlite3"
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+
+# Upper bound on query x row distance entries computed at once
+_MAX_DISTANCE_BLOCK = 1 << 24
+
+_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+_KEY_PATTERN = re.compile(r"^\w+$")
+
+
+class NumpyCollection:
+    """A collection of chunks searched exactly with NumPy."""
+    
+    def __init__(self, directory: Path, metadata: Optional[Dict[str, Any]] = None, initial_capacity: int = 1024):
+        self.directory = Path(directory)
+        self.name = self.directory.name
+        self.initial_capacity = initial_capacity
+        self._lock = threading.RLock()
+        self._open(metadata)
+    
+    def _open(self, metadata: Optional[Dict[str, Any]] = None) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.directory / SIDECAR_FILE_NAME), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS chunks_source ON chunks ({_json_field('source')})")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        if metadata is not None:
+            self._set_info("metadata", metadata)
+        self._conn.commit()
+        
+        self.metadata: Dict[str, Any] = self._get_info("metadata", {})
+        self.dimension: Optional[int] = None
+        self._matrix = None
+        self._capacity = 0
+        self._valid = np.zeros(0, dtype=bool)
+        self._sq_norms = np.zeros(0, dtype=np.float32)
+        self._data_version: Optional[int] = None
+        with self._transaction():
+            pass
+    
+    @contextmanager
+    def _transaction(self, write: bool = False) -> Iterator[None]:
+        """Run the enclosed block in a SQLite transaction on current row maps.
+        
+        A write transaction holds the database write lock, so rows allocated in
+        it cannot be taken by another process at the same time. Must be called
+        with ``self._lock`` held.
+        """
+        self._conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            # data_version changes only when another connection commits
+            if self._conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+                self._load_rows()
+            yield
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            self._data_version = None  # in-memory state may be ahead of the database
+            raise
+    
+    def _load_rows(self) -> None:
+        """Read row bookkeeping from the sidecar and map the matrix to match."""
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self.dimension = self._get_info("dimension")
+        self._num_rows: int = self._get_info("num_rows", 0)  # high-water mark of used rows
+        
+        # Row bookkeeping; deleted rows are reused by later writes
+        self._ids: List[Optional[str]] = [None] * self._num_rows
+        self._row_of: Dict[str, int] = {}
+        for row, chunk_id in self._conn.execute("SELECT row, id FROM chunks"):
+            self._ids[row] = chunk_id
+            self._row_of[chunk_id] = row
+        self._free_rows = [row for row, chunk_id in enumerate(self._ids) if chunk_id is None]
+        
+        if self.dimension is not None:
+            capacity = max(self._capacity, self.initial_capacity)
+            while capacity < self._num_rows:
+                capacity *= 2
+            if capacity != self._capacity:
+                self._map_matrix(capacity)
+            self._valid[:] = False
+            self._valid[:self._num_rows] = [chunk_id is not None for chunk_id in self._ids]
+            matrix = self._matrix[:self._num_rows]
+            self._sq_norms[:self._num_rows] = np.einsum("ij,ij->i", matrix, matrix)
+    
+    def _get_info(self, key: str, default: Any = None) -> Any:
+        row = self._conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+    
+    def _set_info(self, key: str, value: Any) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+    
+    def _map_matrix(self, capacity: int) -> None:
+        """(Re)map the embedding file with room for ``capacity`` rows."""
+        path = self.directory / MATRIX_FILE_NAME
+        size = capacity * self.dimension * 4
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        
+        if self._matrix is not None:
+            self._matrix.flush()
+        self._matrix = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+        self._valid = np.concatenate([self._valid, np.zeros(capacity - self._capacity, dtype=bool)])
+        self._sq_norms = np.concatenate([self._sq_norms, np.zeros(capacity - self._capacity, dtype=np.float32)])
+        self._capacity = capacity
+    
+    @property
+    def space(self) -> str:
+        return self.metadata.get("hnsw:space", "l2")
+    
+    def count(self) -> int:
+        with self._lock, self._transaction():
+            return len(self._row_of)
+    
+    def add(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        """Add chunks; ids that already exist are skipped, as Chroma does."""
+        with self._lock, self._transaction(write=True):
+            keep = [i for i, chunk_id in enumerate(ids) if chunk_id not in self._row_of]
+            if len(keep) < len(ids):
+                logger.warning(f"Skipped {len(ids) - len(keep)} chunks whose ids already exist")
+            self._write(ids, documents, metadatas, embeddings, keep)
+    
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None) -> None:
+        """Add chunks, overwriting any stored chunks with the same ids."""
+        with self._lock, self._transaction(write=True):
+            self._write(ids, documents, metadatas, embeddings, range(len(ids)))
+    
+    def _write(self, ids, documents, metadatas, embeddings, positions) -> None:
+        positions = list(positions)
+        if not positions:
+            return
+        if embeddings is None:
+            raise ValueError("NumPy collections need precomputed embeddings")
+        
+        vectors = np.asarray(embeddings, dtype=np.float32)[positions]
+        if self.dimension is None:
+            self.dimension = int(vectors.shape[1])
+            self._set_info("dimension", self.dimension)
+            self._map_matrix(self.initial_capacity)
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match collection dimension {self.dimension}")
+        
+        rows = []
+        for i in positions:
+            row = self._row_of.get(ids[i])
+            if row is None:
+                row = self._free_rows.pop() if self._free_rows else self._next_row()
+            rows.append(row)
+        
+        self._matrix[rows] = vectors
+        self._matrix.flush()
+        self._sq_norms[rows] = np.einsum("ij,ij->i", vectors, vectors)
+        self._valid[rows] = True
+        for i, row in zip(positions, rows):
+            self._ids[row] = ids[i]
+            self._row_of[ids[i]] = row
+        
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    row,
+                    ids[i],
+                    documents[i] if documents is not None else None,
+                    json.dumps(metadatas[i]) if metadatas is not None else None
+                )
+                for i, row in zip(positions, rows)
+            ]
+        )
+        self._set_info("num_rows", self._num_rows)
+    
+    def _next_row(self) -> int:
+        row = self._num_rows
+        self._num_rows += 1
+        self._ids.append(None)
+        if self._num_rows > self._capacity:
+            self._map_matrix(self._capacity * 2)
+        return row
+    
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock, self._transaction(write=True):
+            rows = [self._row_of.pop(chunk_id) for chunk_id in ids if chunk_id in self._row_of]
+            if not rows:
+                return
+            
+            self._valid[rows] = False
+            for row in rows:
+                self._ids[row] = None
+            self._free_rows.extend(rows)
+            self._conn.executemany("DELETE FROM chunks WHERE row = ?", [(row,) for row in rows])
+    
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents")
+    ) -> Dict[str, Any]:
+        """Chunks by id and/or metadata equality filter, in storage order."""
+        conditions, params = [], []
+        for key, value in (where or {}).items():
+            if isinstance(value, dict) and list(value) == ["$eq"]:
+                value = value["$eq"]
+            if not _KEY_PATTERN.match(key) or isinstance(value, (dict, list)):
+                raise ValueError(f"Unsupported where filter: {where} (only metadata equality is supported)")
+            conditions.append(f"{_json_field(key)} = ?")
+            params.append(value)
+        
+        with self._lock, self._transaction():
+            if ids is not None:
+                rows = sorted(self._row_of[chunk_id] for chunk_id in dict.fromkeys(ids) if chunk_id in self._row_of)
+                records = self._fetch_rows(rows, conditions, params)
+                records = records[offset or 0:][:limit] if limit is not None else records[offset or 0:]
+            else:
+                sql = "SELECT row, id, document, metadata FROM chunks"
+                if conditions:
+                    sql += " WHERE " + " AND ".join(conditions)
+                sql += " ORDER BY row LIMIT ? OFFSET ?"
+                records = self._conn.execute(sql, params + [-1 if limit is None else limit, offset or 0]).fetchall()
+            
+            embeddings = None
+            if "embeddings" in include:
+                embeddings = np.array(self._matrix[[r[0] for r in records]]) if records else np.zeros((0, self.dimension or 0), dtype=np.float32)
+        
+        return {
+            "ids": [r[1] for r in records],
+            "documents": [r[2] for r in records] if "documents" in include else None,
+            "metadatas": [json.loads(r[3]) if r[3] else {} for r in records] if "metadatas" in include else None,
+            "embeddings": embeddings
+        }
+    
+    def _fetch_rows(self, rows: List[int], conditions: List[str] = (), params: List[Any] = ()) -> List[tuple]:
+        """(row, id, document, metadata) records for the given rows, in row order."""
+        records = []
+        for start in range(0, len(rows), _LOOKUP_BATCH):
+            batch = rows[start:start + _LOOKUP_BATCH]
+            sql = f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({','.join('?' * len(batch))})"
+            if conditions:
+                sql += " AND " + " AND ".join(conditions)
+            records.extend(self._conn.execute(sql + " ORDER BY row", list(batch) + list(params)).fetchall())
+        return records
+    
+    def query(
+        self,
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Sequence[str] = ("metadatas", "documents", "distances")
+    ) -> Dict[str, Any]:
+        """Exact k-nearest-neighbour search for a batch of queries."""
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        
+        with self._lock, self._transaction():
+            k = min(n_results, len(self._row_of))
+            if k == 0:
+                empty = [[] for _ in range(len(queries))]
+                return {"ids": empty, "documents": empty, "metadatas": empty, "distances": empty}
+            
+            all_rows, all_distances = [], []
+            block = max(1, _MAX_DISTANCE_BLOCK // self._num_rows)
+            for start in range(0, len(queries), block):
+                distances = self._distances(queries[start:start + block])
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                top_distances = np.take_along_axis(distances, top, axis=1)
+                order = np.argsort(top_distances, axis=1)
+                all_rows.extend(np.take_along_axis(top, order, axis=1).tolist())
+                all_distances.extend(np.take_along_axis(top_distances, order, axis=1).tolist())
+            
+            records = {r[0]: r for r in self._fetch_rows(sorted({row for rows in all_rows for row in rows}))}
+        
+        return {
+            "ids": [[records[row][1] for row in rows] for rows in all_rows],
+            "documents": [[records[row][2] for row in rows] for rows in all_rows] if "documents" in include else None,
+            "metadatas": [
+                [json.loads(records[row][3]) if records[row][3] else {} for row in rows] for rows in all_rows
+            ] if "metadatas" in include else None,
+            "distances": all_distances
+        }
+    
+    def _distances(self, queries: np.ndarray) -> np.ndarray:
+        """Distances from each query to every row, as Chroma defines them for the space."""
+        matrix = self._matrix[:self._num_rows]
+        products = queries @ matrix.T
+        
+        if self.space == "cosine":
+            norms = np.sqrt(self._sq_norms[:self._num_rows])
+            query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            distances = 1.0 - products / np.maximum(query_norms * norms, 1e-12)
+        elif self.space == "ip":
+            distances = 1.0 - products
+        else:  # squared L2
+            query_sq_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+            distances = np.maximum(query_sq_norms - 2.0 * products + self._sq_norms[:self._num_rows], 0.0)
+        
+        distances[:, ~self._valid[:self._num_rows]] = np.inf
+        return distances
+    
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Rename the collection and/or replace its metadata."""
+        with self._lock:
+            if metadata is not None:
+                with self._transaction(write=True):
+                    self.metadata = dict(metadata)
+                    self._set_info("metadata", self.metadata)
+            if name is not None and name != self.name:
+                _check_name(name)
+                target = self.directory.parent / name
+                if target.exists():
+                    raise ValueError(f"Collection {name} already exists")
+                self.close()
+                self.directory.rename(target)
+                self.directory = target
+                self.name = name
+                self._open()
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            self._conn.close()
+
+
+class NumpyClient:
+    """Opens, creates and deletes NumpyCollections under a persist directory."""
+    
+    def __init__(self, path: str):
+        self.root = Path(path) / NUMPY_STORE_DIR_NAME
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+    
+    def has_collection(self, name: str) -> bool:
+        return (self.root / name / SIDECAR_FILE_NAME).exists()
+    
+    def get_collection(self, name: str) -> NumpyCollection:
+        with self._lock:
+            # Collections renamed through modify() are re-keyed under their new name
+            self._collections = {c.name: c for c in self._collections.values()}
+            collection = self._collections.get(name)
+            if collection is not None:
+                return collection
+            if not self.has_collection(name):
+                raise ValueError(f"Collection {name} does not exist")
+            collection = self._collections[name] = NumpyCollection(self.root / name)
+            return collection
+    
+    def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> NumpyCollection:
+        _check_name(name)
+        with self._lock:
+            if self.has_collection(name):
+                raise ValueError(f"Collection {name} already exists")
+            collection = self._collections[name] = NumpyCollection(self.root / name, metadata or {})
+            return collection
+    
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            if not self.has_collection(name):
+                raise ValueError(f"Collection {name} does not exist")
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            shutil.rmtree(self.root / name)
+    
+    def close(self) -> None:
+        with self._lock:
+            for collection in self._collections.values():
+                collection.close()
+            self._collections.clear()
+
+
+def _json_field(key: str) -> str:
+    """SQL expression for a metadata field (matches the expression index on source)."""
+    return f"json_extract(metadata, '$.{key}')"
+
+
+def _check_name(name: str) -> None:
+    if not _NAME_PATTERN.match(name):
+        raise ValueError(f"Invalid collection name: {name!r}")
@@ -0,0 +1,132 @@
+"""
+Request coalescing for concurrent similarity searches.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import add_request_timings, collect_timings
+
+logger = logging.getLogger(__name__)
+
+SearchBatchFn = Callable[[List[str], int, float], List[List[Dict[str, Any]]]]
+
+
+class QueryBatcher:
+    """Collects searches that arrive within a short window and runs them together.
+    
+    Each batch costs one embedding call and one multi-vector Chroma query instead
+    of one of each per request. Results are fanned back out to the callers,
+    together with the batch's stage timings, which are added to each caller's
+    request breakdown.
+    """
+    
+    def __init__(self, search_batch_fn: SearchBatchFn, max_wait_ms: float = 5.0, max_batch_size: int = 32):
+        self.search_batch_fn = search_batch_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        
+        self.batches = 0
+        self.queries = 0
+        
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._worker, name="query-batcher", daemon=True)
+        self._thread.start()
+    
+    def search(self, query: str, k: int, confidence_threshold: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Queue a search and block until its batch has been processed.
+        
+        Raises RuntimeError once the batcher has been closed.
+        """
+        future: Future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("QueryBatcher is closed")
+            self._queue.put((query, k, confidence_threshold, future))
+        results, timings = future.result()
+        add_request_timings(timings)
+        return results
+    
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            
+            # Wait briefly for more requests to share this batch
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._process(batch)
+                    return
+                batch.append(item)
+            
+            self._process(batch)
+    
+    def _process(self, batch: List[tuple]) -> None:
+        """Run one batched search and resolve each waiting request."""
+        queries = [query for query, _, _, _ in batch]
+        max_k = max(k for _, k, _, _ in batch)
+        
+        try:
+            # Stages run on this thread, outside the callers' timing contexts
+            with collect_timings() as timings:
+                results = self.search_batch_fn(queries, max_k, None)
+        except Exception as e:
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+        
+        self.batches += 1
+        self.queries += len(batch)
+        
+        # Results are ordered by distance, so trimming to k matches a k-sized search
+        for (_, k, confidence_threshold, future), query_results in zip(batch, results):
+            future.set_result(([
+                result for result in query_results[:k]
+                if confidence_threshold is None or result["similarity_score"] >= confidence_threshold
+            ], timings))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get batch counts and average batch size."""
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_batch_size": self.max_batch_size
+        }
+    
+    def close(self) -> None:
+        """Stop the worker after draining queued requests.
+        
+        Requests that still reach the queue are failed rather than left waiting.
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+        
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[3].set_exception(RuntimeError("QueryBatcher is closed"))
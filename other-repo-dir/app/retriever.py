@@ -7,6 +7,7 @@ from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 
 from .vector_store import VectorStore
+from .metrics import stage_timer
 from .config import RETRIEVAL_CONFIG
 
 logger = logging.getLogger(__name__)
@@ -31,19 +32,63 @@ class Retriever:
         self.k = self.config.get("k", 5)
         self.confidence_threshold = self.config.get("confidence_threshold", 0.3)
         self.max_tokens_per_chunk = self.config.get("max_tokens_per_chunk", 500)
+        self.mode = self.config.get("mode", "vector")
+        self.hybrid_candidates = self.config.get("hybrid_candidates", 20)
+        self.rrf_k = self.config.get("rrf_k", 60)
     
     def retrieve(self, query: str, k: Optional[int] = None) -> List[RetrievalResult]:
         """Retrieve relevant document chunks for a query."""
         k = k or self.k
+        hybrid = self._use_hybrid()
         
-        # Perform similarity search
-        raw_results = self.vector_store.similarity_search(
-            query=query,
-            k=k,
+        if hybrid:
+            raw_results = self._hybrid_search(query, k)
+        else:
+            # Perform similarity search
+            raw_results = self.vector_store.similarity_search(
+                query=query,
+                k=k,
+                confidence_threshold=self.confidence_threshold
+            )
+        
+        with stage_timer("postprocess"):
+            results = self._to_results(raw_results, hybrid)
+        logger.info(f"Retrieved {len(results)} relevant chunks")
+        return results
+    
+    def retrieve_batch(self, queries: List[str], k: Optional[int] = None) -> List[List[RetrievalResult]]:
+        """Retrieve chunks for many queries with one embedding pass and one Chroma query."""
+        if not queries:
+            return []
+        
+        k = k or self.k
+        hybrid = self._use_hybrid()
+        candidates = max(k, self.hybrid_candidates) if hybrid else k
+        
+        vector_results = self.vector_store.similarity_search_batch(
+            queries,
+            k=candidates,
             confidence_threshold=self.confidence_threshold
         )
         
-        # Process and filter results
+        all_results = []
+        for query, raw_results in zip(queries, vector_results):
+            if hybrid:
+                keyword_results = self.vector_store.keyword_search(query, k=candidates)
+                with stage_timer("rank_fusion"):
+                    raw_results = reciprocal_rank_fusion([raw_results, keyword_results], rrf_k=self.rrf_k)[:k]
+            with stage_timer("postprocess"):
+                all_results.append(self._to_results(raw_results, hybrid))
+        
+        logger.info(f"Retrieved chunks for {len(queries)} queries in one batch")
+        return all_results
+    
+    def _use_hybrid(self) -> bool:
+        """Whether hybrid (vector + BM25) retrieval is configured and available."""
+        return self.mode == "hybrid" and self.vector_store.lexical_index is not None
+    
+    def _to_results(self, raw_results: List[Dict[str, Any]], hybrid: bool) -> List[RetrievalResult]:
+        """Deduplicate raw search hits and turn them into RetrievalResults."""
         results = []
         seen_content = set()  # Avoid duplicate content
         
@@ -70,15 +115,28 @@ class Retriever:
                 metadata=metadata,
                 citations=citations
             )
-            
             results.append(result)
         
-        # Sort by similarity score
-        results.sort(key=lambda x: x.similarity_score, reverse=True)
+        # Sort by similarity score (hybrid results keep their fused order)
+        if not hybrid:
+            results.sort(key=lambda x: x.similarity_score, reverse=True)
         
-        logger.info(f"Retrieved {len(results)} relevant chunks")
         return results
     
+    def _hybrid_search(self, query: str, k: int) -> List[Dict[str, Any]]:
+        """Fuse vector and BM25 rankings with reciprocal rank fusion."""
+        candidates = max(k, self.hybrid_candidates)
+        vector_results = self.vector_store.similarity_search(
+            query=query,
+            k=candidates,
+            confidence_threshold=self.confidence_threshold
+        )
+        keyword_results = self.vector_store.keyword_search(query, k=candidates)
+        
+        with stage_timer("rank_fusion"):
+            fused = reciprocal_rank_fusion([vector_results, keyword_results], rrf_k=self.rrf_k)
+        return fused[:k]
+    
     def _create_citations(self, metadata: Dict[str, Any]) -> List[str]:
         """Create citation strings from metadata."""
         citations = []
@@ -100,7 +158,7 @@ class Retriever:
             return False
         
         # Check if the best result meets the threshold
-        best_score = results[0].similarity_score
+        best_score = max(r.similarity_score for r in results)
         return best_score >= self.confidence_threshold
     
     def get_context_for_generation(self, results: List[RetrievalResult]) -> str:
@@ -138,3 +196,20 @@ class Retriever:
             if result.metadata.get("file_name"):
                 sources.add(result.metadata["file_name"])
         return sorted(list(sources))
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], rrf_k: int = 60) -> List[Dict[str, Any]]:
+    """Merge ranked result lists, scoring each chunk by sum(1 / (rrf_k + rank)).
+    
+    Chunks are matched by their chunk_id metadata; the fused score is added
+    to each result as fusion_score.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, 1):
+            key = result["metadata"].get("chunk_id") or result["content"]
+            if key not in fused:
+                fused[key] = dict(result, fusion_score=0.0)
+            fused[key]["fusion_score"] += 1.0 / (rrf_k + rank)
+    
+    return sorted(fused.values(), key=lambda r: r["fusion_score"], reverse=True)
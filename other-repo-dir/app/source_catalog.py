@@ -0,0 +1,151 @@
+"""
+Catalog of the source files currently stored in the vector store.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .storage import file_lock, load_json, save_json
+
+logger = logging.getLogger(__name__)
+
+SOURCE_CATALOG_FILE_NAME = "source_catalog.json"
+
+
+@dataclass
+class SourceEntry:
+    """Chunk and page counts for one source file."""
+    source: str
+    file_name: str
+    chunk_count: int = 0
+    pages: Dict[str, int] = field(default_factory=dict)  # page number -> chunks on that page
+    ingested_at: float = 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the entry."""
+        return {
+            "source": self.source,
+            "file_name": self.file_name,
+            "chunk_count": self.chunk_count,
+            "page_count": len(self.pages),
+            "ingested_at": self.ingested_at
+        }
+
+
+class SourceCatalog:
+    """Per-source chunk counts, kept in step with every collection write.
+    
+    Listing sources reads this catalog instead of querying the collection.
+    Saving replays this instance's changes onto the catalog on disk, so
+    processes writing to the same persist directory keep each other's counts.
+    """
+    
+    def __init__(self, catalog_path: str):
+        self.catalog_path = Path(catalog_path)
+        self._lock = threading.Lock()
+        
+        # Counted (+1) and uncounted (-1) chunks since the last load or save;
+        # None after clear(), when save overwrites the file
+        self._pending: Optional[List[Tuple[int, List[Dict[str, Any]], float]]] = []
+        
+        self.entries: Dict[str, SourceEntry] = self._load_entries()
+    
+    @classmethod
+    def for_persist_directory(cls, persist_directory: str) -> "SourceCatalog":
+        """Open the catalog stored alongside a Chroma persist directory."""
+        return cls(str(Path(persist_directory) / SOURCE_CATALOG_FILE_NAME))
+    
+    def exists(self) -> bool:
+        """Whether the catalog has been written to disk."""
+        return self.catalog_path.exists()
+    
+    def add(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Count newly added chunks, given their collection metadata."""
+        self._record(1, metadatas)
+    
+    def remove(self, metadatas: Iterable[Dict[str, Any]]) -> None:
+        """Uncount deleted chunks, given their collection metadata."""
+        self._record(-1, metadatas)
+    
+    def _record(self, sign: int, metadatas: Iterable[Dict[str, Any]]) -> None:
+        # Only the fields the catalog counts are kept for replaying on save
+        metadatas = [
+            {key: metadata.get(key) for key in ("source", "file_name", "page_number")}
+            for metadata in metadatas
+        ]
+        now = time.time()
+        with self._lock:
+            _apply(self.entries, sign, metadatas, now)
+            if self._pending is not None:
+                self._pending.append((sign, metadatas, now))
+    
+    def clear(self) -> None:
+        """Forget all sources."""
+        with self._lock:
+            self.entries.clear()
+            self._pending = None
+    
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """All sources, sorted by file name."""
+        with self._lock:
+            entries = [entry.to_dict() for entry in self.entries.values()]
+        return sorted(entries, key=lambda entry: (entry["file_name"], entry["source"]))
+    
+    def save(self) -> None:
+        """Merge this catalog's changes into the catalog on disk, if it changed."""
+        with self._lock:
+            if self._pending == [] and self.exists():
+                return
+            
+            with file_lock(self.catalog_path):
+                if self._pending is None:
+                    entries = self.entries
+                else:
+                    entries = self._load_entries()
+                    for sign, metadatas, timestamp in self._pending:
+                        _apply(entries, sign, metadatas, timestamp)
+                
+                save_json(self.catalog_path, {
+                    "version": 1,
+                    "sources": {source: asdict(entry) for source, entry in entries.items()}
+                })
+            self.entries = entries
+            self._pending = []
+    
+    def _load_entries(self) -> Dict[str, SourceEntry]:
+        data = load_json(self.catalog_path, default={})
+        return {source: SourceEntry(**entry) for source, entry in data.get("sources", {}).items()}
+
+
+def _apply(entries: Dict[str, SourceEntry], sign: int, metadatas: List[Dict[str, Any]], timestamp: float) -> None:
+    """Count chunks in (sign 1) or out (sign -1) of a set of catalog entries."""
+    for metadata in metadatas:
+        source = metadata.get("source") or "Unknown"
+        page = str(metadata.get("page_number") or 1)
+        entry = entries.get(source)
+        
+        if sign > 0:
+            if entry is None:
+                entry = SourceEntry(
+                    source=source,
+                    file_name=metadata.get("file_name") or Path(source).name
+                )
+                entries[source] = entry
+            entry.pages[page] = entry.pages.get(page, 0) + 1
+            entry.chunk_count += 1
+            entry.ingested_at = timestamp
+            continue
+        
+        if entry is None:
+            continue
+        if page in entry.pages:
+            entry.pages[page] -= 1
+            if entry.pages[page] <= 0:
+                del entry.pages[page]
+        entry.chunk_count -= 1
+        if entry.chunk_count <= 0:
+            del entries[source]
@@ -1,62 +1,246 @@
 """
-Vector store module for managing document embeddings using ChromaDB.
+Vector store module for managing document embeddings using ChromaDB or NumPy.
 """
 
 import logging
-from typing import List, Dict, Any, Optional
-import chromadb
-from chromadb.config import Settings
-
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings
-except ImportError:
-    try:
-        from langchain_community.embeddings import HuggingFaceEmbeddings
-    except ImportError:
-        from langchain.embeddings import HuggingFaceEmbeddings
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable, Callable
 
 import numpy as np
 
 from .document_processor import DocumentChunk
-from .config import VECTOR_STORE_CONFIG, EMBEDDING_MODEL
+from .embedding_cache import EmbeddingCache
+from .query_batcher import QueryBatcher
+from .cache import LRUCache, normalize_text
+from .lexical_index import BM25Index, LEXICAL_INDEX_FILE_NAME
+from .model_registry import model_registry
+from .source_catalog import SourceCatalog
+from .metrics import stage_timer
+from .storage import load_json, save_json
+from .config import VECTOR_STORE_CONFIG, EMBEDDING_MODEL, PERFORMANCE_CONFIG
 
 logger = logging.getLogger(__name__)
 
+DISTANCE_SPACES = ("l2", "cosine", "ip")
+
+BACKENDS = ("chroma", "numpy")
+
+COLLECTION_DESCRIPTION = "Document chunks for Q&A system"
+
+# Records which backend last wrote the collection (see VectorStore._import_collection)
+BACKEND_FILE_NAME = "vector_backend.json"
+
+# Temporary names used while rebuild_collection swaps collections
+REBUILD_SUFFIX = "_rebuild"
+OLD_SUFFIX = "_old"
+
+
+def distance_to_score(distance: float, space: str) -> float:
+    """Similarity score for a distance reported in the given space.
+    
+    Squared L2 distances map to 1 / (1 + d), in (0, 1]. Cosine and inner-product
+    distances are 1 - similarity, so the score is the cosine similarity (or the
+    inner product), which is what confidence thresholds are compared against.
+    """
+    if space == "l2":
+        return 1 / (1 + distance)
+    return 1 - distance
+
+
+def _check_distance_space(space: str) -> None:
+    if space not in DISTANCE_SPACES:
+        raise ValueError(f"Unknown distance space: {space} (expected one of {', '.join(DISTANCE_SPACES)})")
+
+
+def _distance(a: np.ndarray, b: np.ndarray, space: str) -> float:
+    """Distance between two embeddings as Chroma computes it in ``space``."""
+    if space == "cosine":
+        norms = float(np.linalg.norm(a) * np.linalg.norm(b))
+        return 1.0 - float(np.dot(a, b)) / norms if norms else 1.0
+    if space == "ip":
+        return 1.0 - float(np.dot(a, b))
+    return float(np.sum((a - b) ** 2))
+
+
+def create_client(backend: str, persist_directory: str):
+    """Storage client for a backend: Chroma (HNSW index) or NumPy (exact search)."""
+    if backend == "numpy":
+        from .numpy_store import NumpyClient
+        return NumpyClient(persist_directory)
+    if backend == "chroma":
+        import chromadb
+        from chromadb.config import Settings
+        return chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+    raise ValueError(f"Unknown vector store backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+def _copy_collection(source, target, page_size: int) -> int:
+    """Copy every chunk with its stored embedding from one collection into another."""
+    copied = 0
+    while True:
+        page = source.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=page_size,
+            offset=copied
+        )
+        if len(page["ids"]) == 0:
+            return copied
+        with stage_timer("store_write"):
+            target.add(
+                ids=page["ids"],
+                documents=page["documents"],
+                metadatas=page["metadatas"],
+                embeddings=page["embeddings"]
+            )
+        copied += len(page["ids"])
+
+
+def _import_embeddings_class():
+    """Import HuggingFaceEmbeddings on first use (pulls in langchain and torch)."""
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings
+    except ImportError:
+        try:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+        except ImportError:
+            from langchain.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings
+
+
 class VectorStore:
-    """Manages document embeddings and similarity search using ChromaDB."""
+    """Manages document embeddings and similarity search using ChromaDB or NumPy."""
     
-    def __init__(self, persist_directory: str = None, collection_name: str = "documents"):
+    def __init__(
+        self,
+        persist_directory: str = None,
+        collection_name: str = "documents",
+        performance_config: Optional[Dict[str, Any]] = None,
+        lexical_index: Optional[bool] = None,
+        distance_space: Optional[str] = None,
+        hnsw_config: Optional[Dict[str, Any]] = None,
+        backend: Optional[str] = None
+    ):
         self.persist_directory = persist_directory or VECTOR_STORE_CONFIG["persist_directory"]
         self.collection_name = collection_name
+        self.performance_config = performance_config or PERFORMANCE_CONFIG
+        self.backend = backend or VECTOR_STORE_CONFIG.get("backend", "chroma")
         
-        # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL,
-            model_kwargs={'device': 'cpu'}
-        )
+        # Index settings used when a collection is created or rebuilt
+        self.configured_space = distance_space or VECTOR_STORE_CONFIG.get("distance_space", "l2")
+        _check_distance_space(self.configured_space)
+        self.hnsw_config = dict(hnsw_config if hnsw_config is not None else VECTOR_STORE_CONFIG.get("hnsw", {}))
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=self.persist_directory,
-            settings=Settings(
-                anonymized_telemetry=False,
-                allow_reset=True
+        self.batch_size = self.performance_config.get("batch_size", 32)
+        
+        # Initialize embeddings (shared with other stores in this process)
+        model_kwargs = {'device': 'cpu'}
+        encode_kwargs = {'batch_size': self.batch_size}
+        self._embeddings_handle = model_registry.acquire(
+            "embeddings",
+            EMBEDDING_MODEL,
+            {"model_kwargs": model_kwargs, "encode_kwargs": encode_kwargs},
+            lambda: _import_embeddings_class()(
+                model_name=EMBEDDING_MODEL,
+                model_kwargs=model_kwargs,
+                encode_kwargs=encode_kwargs
             )
         )
+        self.embeddings = self._embeddings_handle.model
+        
+        # Persistent embedding cache, shared across resets and re-ingests
+        self.embedding_cache = None
+        if self.performance_config.get("cache_embeddings", False):
+            self.embedding_cache = EmbeddingCache(
+                cache_path=str(Path(self.persist_directory) / "embedding_cache.sqlite3"),
+                model_name=EMBEDDING_MODEL,
+                max_entries=self.performance_config.get("embedding_cache_max_entries", 100000)
+            )
+        
+        # Recently used query embeddings
+        self.query_cache = LRUCache(self.performance_config.get("query_cache_size", 1024))
+        
+        # Set by enable_query_batching (used by the API server)
+        self.query_batcher = None
+        
+        self.client = create_client(self.backend, self.persist_directory)
+        
+        # Bound every collection write by Chroma's own maximum batch size
+        self.max_write_batch = self.performance_config.get("max_write_batch", 5000)
+        if hasattr(self.client, "get_max_batch_size"):
+            self.max_write_batch = min(self.max_write_batch, self.client.get_max_batch_size())
         
         # Get or create collection
+        created = False
         try:
             self.collection = self.client.get_collection(name=self.collection_name)
             logger.info(f"Loaded existing collection: {self.collection_name}")
         except Exception:  # Collection doesn't exist
-            self.collection = self.client.create_collection(
-                name=self.collection_name,
-                metadata={"description": "Document chunks for Q&A system"}
+            self.collection = self._recover_interrupted_rebuild()
+            if self.collection is None:
+                self.collection = self.client.create_collection(
+                    name=self.collection_name,
+                    metadata=self._collection_metadata(self.configured_space, self.hnsw_config)
+                )
+                created = True
+                logger.info(f"Created new collection: {self.collection_name}")
+        
+        # The manifest, lexical index and source catalog describe the collection of
+        # the backend used last; after a switch, bring this backend's copy in line
+        self._backend_path = Path(self.persist_directory) / BACKEND_FILE_NAME
+        previous_backend = load_json(self._backend_path, default={}).get("backend")
+        if previous_backend is None and created and self.backend != "chroma":
+            previous_backend = "chroma"  # knowledge bases from before backends were recorded
+        if previous_backend not in (None, self.backend):
+            self._import_collection(previous_backend)
+        if previous_backend != self.backend:
+            save_json(self._backend_path, {"backend": self.backend})
+        
+        # Scores follow the space the collection was built with, not the configured one
+        self.distance_space = self.get_index_params()["space"]
+        if self.distance_space != self.configured_space:
+            logger.warning(
+                f"Collection uses {self.distance_space} distance but {self.configured_space} is configured; "
+                f"run 'python main.py reindex' to rebuild it"
             )
-            logger.info(f"Created new collection: {self.collection_name}")
+        self._apply_search_ef()
+        
+        # BM25 index maintained alongside the collection for hybrid retrieval
+        if lexical_index is None:
+            lexical_index = VECTOR_STORE_CONFIG.get("lexical_index", True)
+        self.lexical_index = None
+        self._lexical_dirty = False
+        self._lexical_needs_rebuild = False
+        if lexical_index:
+            index_path = Path(self.persist_directory) / LEXICAL_INDEX_FILE_NAME
+            self._lexical_needs_rebuild = not index_path.exists() and self.collection.count() > 0
+            self.lexical_index = BM25Index(str(index_path))
+        
+        # Per-source chunk counts for listing sources without a query
+        self.source_catalog = SourceCatalog.for_persist_directory(self.persist_directory)
+        if not self.source_catalog.exists():
+            self._rebuild_source_catalog()
     
     def add_documents(self, chunks: List[DocumentChunk]) -> None:
         """Add document chunks to the vector store."""
+        self._add_chunks(chunks)
+        self._save_indexes()
+    
+    def upsert_documents(self, chunks: List[DocumentChunk]) -> None:
+        """Add document chunks, replacing any stored chunks with the same ids."""
+        self._add_chunks(chunks, upsert=True)
+        self._save_indexes()
+    
+    def _add_chunks(self, chunks: List[DocumentChunk], upsert: bool = False) -> None:
+        """Embed and write chunks to the collection and the lexical index.
+        
+        With ``upsert`` existing ids are overwritten instead of rejected.
+        """
         if not chunks:
             logger.warning("No chunks provided to add to vector store")
             return
@@ -79,70 +263,521 @@ class VectorStore:
             metadatas.append(metadata)
             ids.append(chunk.chunk_id or f"chunk_{i}")
         
-        # Generate embeddings
+        # Embed and add in writes no larger than Chroma accepts
         logger.info(f"Generating embeddings for {len(documents)} documents...")
-        embeddings = self.embeddings.embed_documents(documents)
-        
-        # Add to collection
-        self.collection.add(
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
-        )
+        for start in range(0, len(ids), self.max_write_batch):
+            end = start + self.max_write_batch
+            embeddings = self._embed_documents(documents[start:end])
+            
+            with stage_timer("store_write"):
+                if upsert:
+                    # Uncount chunks being overwritten before counting their replacements
+                    existing = self.collection.get(ids=ids[start:end], include=["metadatas"])
+                    self.source_catalog.remove(existing["metadatas"] or [])
+                    write = self.collection.upsert
+                else:
+                    write = self.collection.add
+                
+                write(
+                    documents=documents[start:end],
+                    embeddings=embeddings,
+                    metadatas=metadatas[start:end],
+                    ids=ids[start:end]
+                )
+        
+        if self.lexical_index is not None and not self._lexical_needs_rebuild:
+            self.lexical_index.add(ids, documents)
+            self._lexical_dirty = True
+        
+        self.source_catalog.add(metadatas)
         
         logger.info(f"Added {len(chunks)} chunks to vector store")
     
+    def add_documents_stream(
+        self,
+        chunks: Iterable[DocumentChunk],
+        flush_size: Optional[int] = None,
+        on_flush: Optional[Callable[[int], None]] = None,
+        upsert: bool = False
+    ) -> int:
+        """Embed and insert chunks from an iterable in bounded batches.
+        
+        Only ``flush_size`` chunks are held in memory at a time, and each batch is
+        persisted as soon as it is written. ``on_flush`` is called with the running
+        total after every batch. Returns the number of chunks added.
+        """
+        flush_size = flush_size or self.performance_config.get("ingest_flush_size", 256)
+        
+        buffer = []
+        total_added = 0
+        
+        def flush() -> None:
+            nonlocal buffer, total_added
+            self._add_chunks(buffer, upsert=upsert)
+            total_added += len(buffer)
+            buffer = []
+            if on_flush:
+                on_flush(total_added)
+        
+        for chunk in chunks:
+            buffer.append(chunk)
+            if len(buffer) >= flush_size:
+                flush()
+        
+        if buffer:
+            flush()
+        
+        self._save_indexes()
+        return total_added
+    
+    def _embed_documents(self, texts: List[str], stage: Optional[str] = "embed_documents") -> np.ndarray:
+        """Embed texts in micro-batches into a contiguous float32 matrix.
+        
+        Cached embeddings are reused, and each distinct uncached text is embedded once.
+        The call is timed as ``stage`` unless it is None (caller times it).
+        """
+        if stage is not None:
+            with stage_timer(stage):
+                return self._embed_documents(texts, stage=None)
+        
+        cached = self.embedding_cache.get_many(texts) if self.embedding_cache else [None] * len(texts)
+        missing_texts = list(dict.fromkeys(
+            text for text, vector in zip(texts, cached) if vector is None
+        ))
+        
+        new_vectors = {}
+        for start in range(0, len(missing_texts), self.batch_size):
+            batch = missing_texts[start:start + self.batch_size]
+            vectors = np.asarray(self.embeddings.embed_documents(batch), dtype=np.float32)
+            if self.embedding_cache:
+                self.embedding_cache.put_many(batch, vectors)
+            new_vectors.update(zip(batch, vectors))
+        
+        if self.embedding_cache:
+            logger.info(f"Embedding cache: {len(texts) - len(missing_texts)} of {len(texts)} texts cached")
+        
+        rows = [
+            vector if vector is not None else new_vectors[text]
+            for text, vector in zip(texts, cached)
+        ]
+        if not rows:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(np.vstack(rows), dtype=np.float32)
+    
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries as one float32 matrix, reusing cached embeddings where available.
+        
+        Recent queries are served from the in-process LRU cache; the rest go
+        through the persistent embedding cache and the model.
+        """
+        with stage_timer("query_embedding"):
+            return self._embed_queries_untimed(queries)
+    
+    def _embed_queries_untimed(self, queries: List[str]) -> np.ndarray:
+        keys = [(EMBEDDING_MODEL, normalize_text(query)) for query in queries]
+        vectors = [self.query_cache.get(key) for key in keys]
+        
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if missing:
+            # Sentence-transformers embed queries and documents identically
+            embedded = self._embed_documents([text for _, text in missing], stage=None)
+            for key, vector in zip(missing, embedded):
+                self.query_cache.put(key, vector.copy())
+            new_vectors = dict(zip(missing, embedded))
+            vectors = [vector if vector is not None else new_vectors[key] for key, vector in zip(keys, vectors)]
+        
+        return np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+    
+    def delete_chunks(self, chunk_ids: List[str], persist: bool = True) -> None:
+        """Delete chunks by id; ids that are not in the collection are ignored.
+        
+        With ``persist=False`` the lexical index and source catalog are saved by
+        the next add instead.
+        """
+        if not chunk_ids:
+            return
+        
+        chunk_ids = list(chunk_ids)
+        for start in range(0, len(chunk_ids), self.max_write_batch):
+            batch = chunk_ids[start:start + self.max_write_batch]
+            with stage_timer("store_delete"):
+                # Only chunks that actually exist are uncounted from the catalog
+                existing = self.collection.get(ids=batch, include=["metadatas"])
+                self.collection.delete(ids=batch)
+            self.source_catalog.remove(existing["metadatas"] or [])
+        
+        if self.lexical_index is not None:
+            self.lexical_index.remove(chunk_ids)
+            self._lexical_dirty = True
+        if persist:
+            self._save_indexes()
+        
+        logger.info(f"Deleted {len(chunk_ids)} chunk ids from vector store")
+    
+    def delete_by_source(self, source: str, persist: bool = True) -> int:
+        """Delete every chunk of one source file; returns the number deleted."""
+        chunk_ids = self.collection.get(where={"source": source}, include=[])["ids"]
+        self.delete_chunks(chunk_ids, persist=persist)
+        logger.info(f"Deleted {len(chunk_ids)} chunks of source: {source}")
+        return len(chunk_ids)
+    
+    def flush(self) -> None:
+        """Write pending lexical index and source catalog changes to disk.
+        
+        Callers that stop part way through a sequence of unpersisted writes
+        (e.g. a failed ingest) call this so the side files match the collection.
+        """
+        self._save_indexes()
+    
+    def _save_indexes(self) -> None:
+        """Write the lexical index and source catalog to disk if they changed."""
+        self._save_lexical_index()
+        self.source_catalog.save()
+    
+    def _save_lexical_index(self) -> None:
+        """Write the lexical index to disk if it changed."""
+        if self.lexical_index is not None and self._lexical_dirty:
+            self.lexical_index.save()
+            self._lexical_dirty = False
+    
+    def _rebuild_lexical_index(self) -> None:
+        """Build the lexical index from the documents already in the collection."""
+        logger.info("Building lexical index from existing collection...")
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents"], limit=self.max_write_batch, offset=offset)
+            if not page["ids"]:
+                break
+            self.lexical_index.add(page["ids"], page["documents"])
+            offset += len(page["ids"])
+        
+        self._lexical_needs_rebuild = False
+        self._lexical_dirty = True
+        self._save_lexical_index()
+    
+    def _rebuild_source_catalog(self) -> None:
+        """Build the source catalog from the metadata already in the collection."""
+        logger.info("Building source catalog from existing collection...")
+        self.source_catalog.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=self.max_write_batch, offset=offset)
+            if not page["ids"]:
+                break
+            self.source_catalog.add(page["metadatas"])
+            offset += len(page["ids"])
+        
+        self.source_catalog.save()
+    
+    def list_sources(self) -> List[Dict[str, Any]]:
+        """Every stored source file with its chunk count, page count and ingestion time."""
+        return self.source_catalog.list_sources()
+    
+    def keyword_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """BM25 search over chunk text.
+        
+        Results use the same format as similarity_search. Their similarity_score
+        is the higher of the vector similarity to the query and the share of the
+        query's term weight the chunk matches, so an exact identifier match still
+        meets confidence thresholds when the embedding misses it. The BM25 score is
+        included as bm25_score.
+        """
+        if self.lexical_index is None:
+            return []
+        if self._lexical_needs_rebuild:
+            self._rebuild_lexical_index()
+        
+        with stage_timer("keyword_search"):
+            hits = self.lexical_index.search(query, k)
+            if not hits:
+                return []
+            
+            ids = [doc_id for doc_id, _ in hits]
+            coverage = self.lexical_index.term_coverage(query, ids)
+            stored = self.collection.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        by_id = {
+            doc_id: (doc, metadata, embedding)
+            for doc_id, doc, metadata, embedding in zip(
+                stored["ids"], stored["documents"], stored["metadatas"], stored["embeddings"]
+            )
+        }
+        
+        query_embedding = self._embed_queries([query])[0]
+        relevant_chunks = []
+        for doc_id, bm25_score in hits:
+            if doc_id not in by_id:
+                continue
+            doc, metadata, embedding = by_id[doc_id]
+            # Same distance and score as a vector search would report
+            distance = _distance(np.asarray(embedding, dtype=np.float32), query_embedding, self.distance_space)
+            relevant_chunks.append({
+                "content": doc,
+                "metadata": metadata,
+                "similarity_score": max(distance_to_score(distance, self.distance_space), coverage[doc_id]),
+                "distance": distance,
+                "bm25_score": bm25_score
+            })
+        
+        logger.info(f"Found {len(relevant_chunks)} keyword matches for query")
+        return relevant_chunks
+    
     def similarity_search(
         self, 
         query: str, 
         k: int = 5, 
-        confidence_threshold: float = 0.0
+        confidence_threshold: Optional[float] = None
     ) -> List[Dict[str, Any]]:
-        """Perform similarity search and return relevant chunks."""
+        """Perform similarity search and return relevant chunks.
         
-        # Generate query embedding
-        query_embedding = self.embeddings.embed_query(query)
+        Chunks scoring below ``confidence_threshold`` are dropped; None keeps all
+        k (cosine and inner-product scores can be negative).
+        """
+        if self.query_batcher is not None:
+            relevant_chunks = self.query_batcher.search(query, k, confidence_threshold)
+        else:
+            relevant_chunks = self.similarity_search_batch([query], k, confidence_threshold)[0]
+        
+        logger.info(f"Found {len(relevant_chunks)} relevant chunks for query")
+        return relevant_chunks
+    
+    def similarity_search_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        confidence_threshold: Optional[float] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Search for several queries with one embedding call and one Chroma query."""
+        if not queries:
+            return []
+        
+        # Generate query embeddings
+        query_embeddings = self._embed_queries(queries)
         
         # Search in ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=k,
-            include=["documents", "metadatas", "distances"]
-        )
+        with stage_timer("vector_query"):
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=k,
+                include=["documents", "metadatas", "distances"]
+            )
         
         # Process results
-        relevant_chunks = []
-        
-        if results["documents"] and results["documents"][0]:
-            documents = results["documents"][0]
-            metadatas = results["metadatas"][0]
-            distances = results["distances"][0]
+        all_chunks = []
+        for i in range(len(queries)):
+            relevant_chunks = []
             
-            for doc, metadata, distance in zip(documents, metadatas, distances):
-                # Convert distance to similarity score (ChromaDB uses L2 distance)
-                similarity_score = 1 / (1 + distance)
+            if results["documents"] and results["documents"][i]:
+                documents = results["documents"][i]
+                metadatas = results["metadatas"][i]
+                distances = results["distances"][i]
                 
-                if similarity_score >= confidence_threshold:
-                    relevant_chunks.append({
-                        "content": doc,
-                        "metadata": metadata,
-                        "similarity_score": similarity_score,
-                        "distance": distance
-                    })
+                for doc, metadata, distance in zip(documents, metadatas, distances):
+                    # Convert distance to a similarity score for the collection's space
+                    similarity_score = distance_to_score(distance, self.distance_space)
+                    
+                    if confidence_threshold is None or similarity_score >= confidence_threshold:
+                        relevant_chunks.append({
+                            "content": doc,
+                            "metadata": metadata,
+                            "similarity_score": similarity_score,
+                            "distance": distance
+                        })
+            
+            all_chunks.append(relevant_chunks)
         
-        logger.info(f"Found {len(relevant_chunks)} relevant chunks for query")
-        return relevant_chunks
+        return all_chunks
+    
+    def enable_query_batching(self, max_wait_ms: float = 5.0, max_batch_size: int = 32) -> None:
+        """Coalesce concurrent similarity_search calls into batched queries."""
+        if self.query_batcher is None:
+            self.query_batcher = QueryBatcher(
+                self.similarity_search_batch,
+                max_wait_ms=max_wait_ms,
+                max_batch_size=max_batch_size
+            )
+            logger.info(f"Enabled query batching ({max_wait_ms}ms window, up to {max_batch_size} queries)")
     
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the collection."""
         count = self.collection.count()
-        return {
+        stats = {
             "total_documents": count,
             "collection_name": self.collection_name,
-            "persist_directory": self.persist_directory
+            "persist_directory": self.persist_directory,
+            "backend": self.backend,
+            "index": self.get_index_params()
+        }
+        if self.embedding_cache is not None:
+            stats["embedding_cache"] = self.embedding_cache.get_stats()
+        if self.query_batcher is not None:
+            stats["query_batcher"] = self.query_batcher.get_stats()
+        return stats
+    
+    def close(self) -> None:
+        """Release the shared embedding model and close the caches."""
+        if self.query_batcher is not None:
+            self.query_batcher.close()
+            self.query_batcher = None
+        if self.embedding_cache is not None:
+            self.embedding_cache.close()
+        if self.backend == "numpy":
+            self.client.close()
+        self._embeddings_handle.release()
+    
+    def get_index_params(self) -> Dict[str, Any]:
+        """Distance space and HNSW parameters of the current collection."""
+        if self.backend == "numpy":
+            return {"space": self.collection.space, "exact": True}
+        
+        configuration = getattr(self.collection, "configuration", None) or {}
+        hnsw = configuration.get("hnsw") if isinstance(configuration, dict) else None
+        if hnsw:
+            return {
+                "space": hnsw.get("space", "l2"),
+                "construction_ef": hnsw.get("ef_construction"),
+                "search_ef": hnsw.get("ef_search"),
+                "M": hnsw.get("max_neighbors")
+            }
+        
+        # Older Chroma versions keep index settings in the collection metadata only
+        metadata = self.collection.metadata or {}
+        return {
+            "space": metadata.get("hnsw:space", "l2"),
+            "construction_ef": metadata.get("hnsw:construction_ef"),
+            "search_ef": metadata.get("hnsw:search_ef"),
+            "M": metadata.get("hnsw:M")
         }
     
+    def _collection_metadata(self, space: str, hnsw_config: Dict[str, Any]) -> Dict[str, Any]:
+        """Collection metadata carrying the index settings (Chroma's hnsw:* keys)."""
+        metadata = {"description": COLLECTION_DESCRIPTION, "hnsw:space": space}
+        if self.backend == "numpy":
+            return metadata  # exact search has no HNSW parameters
+        for key, value in hnsw_config.items():
+            if value is not None:
+                metadata[f"hnsw:{key}"] = value
+        return metadata
+    
+    def _apply_search_ef(self) -> None:
+        """Apply the configured search_ef, which unlike the other settings can change after build."""
+        search_ef = self.hnsw_config.get("search_ef")
+        if self.backend == "numpy" or search_ef is None or self.get_index_params()["search_ef"] == search_ef:
+            return
+        
+        try:
+            try:
+                self.collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+            except TypeError:  # Chroma < 1.0 has no collection configuration
+                self.collection.modify(metadata={**(self.collection.metadata or {}), "hnsw:search_ef": search_ef})
+            logger.info(f"Set search_ef to {search_ef}")
+        except Exception as e:
+            logger.warning(f"Could not set search_ef: {e}")
+    
+    def rebuild_collection(
+        self,
+        distance_space: Optional[str] = None,
+        hnsw_config: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Rebuild the collection with new index settings, reusing the stored embeddings.
+        
+        Chunks are copied page by page into a new collection, which then replaces
+        the old one; nothing is re-embedded. Chunk ids are unchanged, so the
+        lexical index and source catalog stay valid. Defaults to the configured
+        settings.
+        """
+        space = distance_space or self.configured_space
+        _check_distance_space(space)
+        hnsw_config = dict(hnsw_config if hnsw_config is not None else self.hnsw_config)
+        
+        # Keep the collection's own metadata; only the index settings change
+        metadata = {
+            key: value for key, value in (self.collection.metadata or {}).items()
+            if not key.startswith("hnsw:")
+        }
+        metadata.update(self._collection_metadata(space, hnsw_config))
+        
+        rebuild_name = f"{self.collection_name}{REBUILD_SUFFIX}"
+        old_name = f"{self.collection_name}{OLD_SUFFIX}"
+        for leftover in (rebuild_name, old_name):  # from a failed rebuild; the live collection exists
+            try:
+                self.client.delete_collection(name=leftover)
+            except Exception:
+                pass
+        rebuilt = self.client.create_collection(name=rebuild_name, metadata=metadata)
+        
+        try:
+            copied = _copy_collection(self.collection, rebuilt, self.max_write_batch)
+        except Exception:
+            self.client.delete_collection(name=rebuild_name)
+            raise
+        
+        # Move the old collection aside before renaming the new one into place, so a
+        # complete copy exists at every step (see _recover_interrupted_rebuild)
+        self.collection.modify(name=old_name)
+        rebuilt.modify(name=self.collection_name)
+        self.client.delete_collection(name=old_name)
+        self.collection = self.client.get_collection(name=self.collection_name)
+        
+        self.configured_space = space
+        self.hnsw_config = hnsw_config
+        self.distance_space = self.get_index_params()["space"]
+        logger.info(f"Rebuilt collection {self.collection_name} ({copied} chunks, {space} distance)")
+        
+        return {"chunks": copied, "index": self.get_index_params()}
+    
+    def _recover_interrupted_rebuild(self):
+        """Adopt the collection a rebuild left under a temporary name, if any.
+        
+        A rebuild that stopped during its swap leaves the new copy as
+        ``<name>_rebuild`` and/or the old one as ``<name>_old``; both are complete.
+        Returns the collection renamed back to ``<name>``, or None.
+        """
+        for suffix in (REBUILD_SUFFIX, OLD_SUFFIX):
+            name = f"{self.collection_name}{suffix}"
+            try:
+                collection = self.client.get_collection(name=name)
+            except Exception:  # No such collection
+                continue
+            collection.modify(name=self.collection_name)
+            logger.warning(f"Recovered collection {self.collection_name} from {name} left by an interrupted rebuild")
+            return self.client.get_collection(name=self.collection_name)
+        return None
+    
+    def _import_collection(self, source_backend: str) -> None:
+        """Replace this backend's collection with a copy of ``source_backend``'s.
+        
+        Nothing is re-embedded, and the source collection is left in place. Does
+        nothing if the source backend has no collection of this name.
+        """
+        if source_backend == "chroma" and not (Path(self.persist_directory) / "chroma.sqlite3").exists():
+            return  # avoid creating an empty Chroma database just to look
+        source_client = create_client(source_backend, self.persist_directory)
+        try:
+            try:
+                source = source_client.get_collection(name=self.collection_name)
+            except Exception:  # No collection to import
+                return
+            
+            space = (source.metadata or {}).get("hnsw:space", "l2")
+            configuration = getattr(source, "configuration", None)
+            if isinstance(configuration, dict) and configuration.get("hnsw"):
+                space = configuration["hnsw"].get("space", space)
+            
+            self.client.delete_collection(name=self.collection_name)
+            self.collection = self.client.create_collection(
+                name=self.collection_name,
+                metadata=self._collection_metadata(space, self.hnsw_config)
+            )
+            copied = _copy_collection(source, self.collection, self.max_write_batch)
+            logger.warning(
+                f"Knowledge base was last used with the {source_backend} backend; "
+                f"copied its {copied} chunks into the {self.backend} collection ({space} distance)"
+            )
+        finally:
+            if source_backend == "numpy":
+                source_client.close()
+    
     def delete_collection(self) -> None:
         """Delete the entire collection."""
         self.client.delete_collection(name=self.collection_name)
@@ -157,8 +792,17 @@ class VectorStore:
         
         self.collection = self.client.create_collection(
             name=self.collection_name,
-            metadata={"description": "Document chunks for Q&A system"}
+            metadata=self._collection_metadata(self.configured_space, self.hnsw_config)
         )
+        self.distance_space = self.configured_space
+        
+        if self.lexical_index is not None:
+            self.lexical_index.clear()
+            self._lexical_needs_rebuild = False
+            self._lexical_dirty = True
+        self.source_catalog.clear()
+        self._save_indexes()
+        
         logger.info(f"Reset collection: {self.collection_name}")
     
     def search_by_metadata(self, metadata_filter: Dict[str, Any], k: int = 10) -> List[Dict[str, Any]]:
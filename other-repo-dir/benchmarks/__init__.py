@@ -0,0 +1,5 @@
+"""
+Performance benchmarks for the document chatbot.
+
+Run ``python -m benchmarks.run_benchmarks --help`` from the project root.
+"""
@@ -0,0 +1,69 @@
+"""
+Helpers shared by the benchmark scripts: latency summaries and result files.
+"""
+
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+def latency_summary(seconds: Iterable[float]) -> Dict[str, float]:
+    """Count, mean and p50/p95/p99/max of a list of durations, in milliseconds."""
+    values = np.asarray(list(seconds), dtype=np.float64) * 1000.0
+    if values.size == 0:
+        return {"count": 0}
+    
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+
+def git_revision() -> Dict[str, Any]:
+    """Commit hash of the working tree and whether it has local changes."""
+    def git(*args: str) -> Optional[str]:
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    
+    commit = git("rev-parse", "HEAD")
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": commit, "dirty": bool(status) if status is not None else None}
+
+
+def run_metadata(benchmark: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Header identifying a benchmark run, so results can be compared across commits."""
+    return {
+        "benchmark": benchmark,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "parameters": parameters
+    }
+
+
+def write_results(results: Dict[str, Any], output: Optional[str]) -> None:
+    """Write results as JSON to ``output``, or to stdout if it is not given."""
+    text = json.dumps(results, indent=2, default=str)
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
@@ -0,0 +1,181 @@
+"""
+Synthetic document corpora for benchmarks.
+
+Documents are generated from a fixed vocabulary with a seeded random number
+generator, so the same parameters always produce the same corpus. Each file is
+about one topic, which gives retrieval something to discriminate on.
+"""
+
+import random
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+FORMATS = ("txt", "md", "docx", "pdf")
+
+TOPICS = {
+    "astronomy": ["telescope", "galaxy", "nebula", "orbit", "comet", "spectrum", "redshift", "exoplanet"],
+    "botany": ["photosynthesis", "chlorophyll", "pollen", "root", "xylem", "seedling", "canopy", "fern"],
+    "networking": ["packet", "router", "latency", "bandwidth", "protocol", "socket", "handshake", "firewall"],
+    "finance": ["dividend", "portfolio", "liquidity", "bond", "equity", "inflation", "ledger", "audit"],
+    "medicine": ["diagnosis", "vaccine", "antibody", "dosage", "symptom", "clinic", "therapy", "pathogen"],
+    "geology": ["sediment", "magma", "tectonic", "fossil", "erosion", "basalt", "quartz", "fault"],
+    "cooking": ["saute", "braise", "marinade", "emulsion", "dough", "simmer", "caramel", "spice"],
+    "databases": ["index", "transaction", "replica", "schema", "query", "shard", "vacuum", "cursor"]
+}
+
+FILLER = [
+    "system", "process", "method", "result", "study", "model", "change", "level", "sample", "value",
+    "effect", "source", "report", "design", "factor", "signal", "stage", "measure", "pattern", "range"
+]
+
+TEMPLATES = [
+    "The {a} affects the {b} in most {c} observations.",
+    "Researchers measured how the {a} changes when the {b} is adjusted.",
+    "A typical {a} depends on the {b} and the surrounding {c}.",
+    "Reference code {code} describes the {a} used with the {b}.",
+    "In practice the {a} is compared with the {b} before each {c} review.",
+    "Every {a} report lists the {b}, the {c} and the observed {d}."
+]
+
+LINES_PER_PDF_PAGE = 45
+PDF_LINE_WIDTH = 90
+
+
+def make_paragraph(rng: random.Random, topic: str, sentences: int = 5) -> str:
+    """One paragraph of topic-flavoured sentences."""
+    words = TOPICS[topic]
+    parts = []
+    for _ in range(sentences):
+        template = rng.choice(TEMPLATES)
+        choices = {key: rng.choice(words if rng.random() < 0.6 else FILLER) for key in "abcd"}
+        parts.append(template.format(code=f"{topic[:3].upper()}-{rng.randint(100, 999)}", **choices))
+    return " ".join(parts)
+
+
+def generate_queries(count: int, seed: int = 0) -> List[str]:
+    """Questions about the corpus topics (distinct, so query caches stay cold)."""
+    rng = random.Random(seed + 1)
+    queries = []
+    seen = set()
+    while len(queries) < count:
+        topic = rng.choice(list(TOPICS))
+        a, b = rng.sample(TOPICS[topic], 2)
+        query = f"How does the {a} relate to the {b} in {topic} ({len(queries)})?"
+        if query not in seen:
+            seen.add(query)
+            queries.append(query)
+    return queries
+
+
+def generate_corpus(
+    output_dir: str,
+    num_files: int = 40,
+    paragraphs_per_file: int = 30,
+    formats: Sequence[str] = FORMATS,
+    seed: int = 0
+) -> List[Path]:
+    """Write ``num_files`` documents, cycling through ``formats``, and return their paths."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    topics = list(TOPICS)
+    writers = {"txt": write_text, "md": write_markdown, "docx": write_docx, "pdf": write_pdf}
+    
+    paths = []
+    for i in range(num_files):
+        extension = formats[i % len(formats)]
+        if extension not in writers:
+            raise ValueError(f"Unsupported corpus format: {extension}")
+        
+        topic = topics[i % len(topics)]
+        title = f"{topic.title()} notes {i}"
+        paragraphs = [make_paragraph(rng, topic) for _ in range(paragraphs_per_file)]
+        
+        path = output_dir / f"{topic}_{i:04d}.{extension}"
+        writers[extension](path, title, paragraphs)
+        paths.append(path)
+    return paths
+
+
+def corpus_size(paths: Sequence[Path]) -> Dict[str, int]:
+    """Number of files and total bytes."""
+    return {"files": len(paths), "bytes": sum(path.stat().st_size for path in paths)}
+
+
+def write_text(path: Path, title: str, paragraphs: List[str]) -> None:
+    path.write_text(title + "\n\n" + "\n\n".join(paragraphs) + "\n", encoding="utf-8")
+
+
+def write_markdown(path: Path, title: str, paragraphs: List[str]) -> None:
+    sections = []
+    for i, paragraph in enumerate(paragraphs):
+        if i % 5 == 0:
+            sections.append(f"## Section {i // 5 + 1}")
+        sections.append(paragraph)
+    path.write_text(f"# {title}\n\n" + "\n\n".join(sections) + "\n", encoding="utf-8")
+
+
+def write_docx(path: Path, title: str, paragraphs: List[str]) -> None:
+    from docx import Document
+    
+    document = Document()
+    document.add_heading(title, level=1)
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(str(path))
+
+
+def write_pdf(path: Path, title: str, paragraphs: List[str]) -> None:
+    """Write a minimal text-only PDF (Helvetica, several pages) without extra dependencies."""
+    lines = [title, ""]
+    for paragraph in paragraphs:
+        lines.extend(_wrap(paragraph, PDF_LINE_WIDTH))
+        lines.append("")
+    pages = [lines[i:i + LINES_PER_PDF_PAGE] for i in range(0, len(lines), LINES_PER_PDF_PAGE)]
+    
+    # Object 1: catalog, 2: page tree, 3: font, then a (page, content) pair per page
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{pid} 0 R' for pid in page_ids)}] /Count {len(pages)} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    ]
+    for page_id, page_lines in zip(page_ids, pages):
+        text = "".join(f"({_pdf_escape(line)}) Tj T*\n" for line in page_lines)
+        stream = f"BT\n/F1 10 Tf\n14 TL\n50 770 Td\n{text}ET\n".encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"endstream")
+    
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    path.write_bytes(bytes(output))
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines = []
+    current = ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
@@ -0,0 +1,194 @@
+"""
+Retrieval quality vs. speed: ``similarity_search`` against exact search.
+
+Computes exact nearest neighbours with brute-force NumPy over the embeddings
+stored in the collection, then reports how well ``VectorStore.similarity_search``
+(with its current index configuration) recovers them:
+
+- recall@k: share of the exact top k that the search returns in its top k
+- MRR: mean reciprocal rank of the exact nearest neighbour in the results
+- latency of ``similarity_search`` and, for reference, of the exact search
+
+Run it after any change to the vector path (index parameters, caching,
+quantization, another backend) to see the quality/latency tradeoff::
+
+    python -m benchmarks.eval_retrieval --queries 200 --k 1,5,10
+    python -m benchmarks.eval_retrieval --synthetic 40 --output results/recall.json
+"""
+
+import copy
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import click
+import numpy as np
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import get_config
+from app.document_processor import DocumentProcessor
+from app.vector_store import VectorStore
+from benchmarks.common import latency_summary, run_metadata, write_results
+from benchmarks.corpus import generate_corpus, generate_queries
+
+
+def load_embeddings(vector_store: VectorStore, page_size: int = 5000) -> Tuple[List[str], np.ndarray]:
+    """All chunk ids and their stored embeddings, as a float32 matrix."""
+    ids: List[str] = []
+    vectors = []
+    offset = 0
+    while True:
+        page = vector_store.collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    
+    if not vectors:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    return ids, np.vstack(vectors)
+
+
+def exact_neighbours(matrix: np.ndarray, queries: np.ndarray, k: int, space: str = "l2") -> np.ndarray:
+    """Row indices of the k nearest stored vectors for each query, nearest first.
+    
+    ``space`` follows Chroma's ``hnsw:space``: l2 (squared euclidean), cosine or ip.
+    """
+    if space == "cosine":
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        distances = -queries @ matrix.T
+    elif space == "ip":
+        distances = -queries @ matrix.T
+    else:
+        distances = (
+            np.sum(queries ** 2, axis=1, keepdims=True)
+            - 2.0 * (queries @ matrix.T)
+            + np.sum(matrix ** 2, axis=1)
+        )
+    
+    k = min(k, matrix.shape[0])
+    top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distances, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def evaluate(vector_store: VectorStore, queries: List[str], ks: List[int]) -> Dict[str, Any]:
+    """Recall@k, MRR and latency of similarity_search against exact search."""
+    ids, matrix = load_embeddings(vector_store)
+    if not ids:
+        raise click.ClickException("The collection is empty; ingest documents or use --synthetic")
+    
+    space = vector_store.distance_space
+    max_k = min(max(ks), len(ids))
+    
+    # Timed first, with a cold query cache, so its latency includes query embedding
+    vector_store.query_cache.clear()
+    search_latencies = []
+    found_ids = []
+    for query in queries:
+        start = time.perf_counter()
+        results = vector_store.similarity_search(query, k=max_k)
+        search_latencies.append(time.perf_counter() - start)
+        found_ids.append([result["metadata"].get("chunk_id") for result in results])
+    
+    query_embeddings = vector_store._embed_queries(queries)
+    exact_latencies = []
+    exact_ids = []
+    for query_embedding in query_embeddings:
+        start = time.perf_counter()
+        rows = exact_neighbours(matrix, query_embedding[None, :], max_k, space)[0]
+        exact_latencies.append(time.perf_counter() - start)
+        exact_ids.append([ids[row] for row in rows])
+    
+    quality = {}
+    for k in sorted(set(min(k, max_k) for k in ks)):
+        recalls = [
+            len(set(expected[:k]) & set(found[:k])) / len(expected[:k])
+            for expected, found in zip(exact_ids, found_ids)
+        ]
+        quality[f"recall@{k}"] = round(float(np.mean(recalls)), 4)
+    
+    reciprocal_ranks = [
+        1.0 / (found.index(expected[0]) + 1) if expected[0] in found else 0.0
+        for expected, found in zip(exact_ids, found_ids)
+    ]
+    quality[f"mrr@{max_k}"] = round(float(np.mean(reciprocal_ranks)), 4)
+    
+    return {
+        "collection": {
+            "chunks": len(ids),
+            "dimension": int(matrix.shape[1]),
+            "index": vector_store.get_index_params()
+        },
+        "queries": len(queries),
+        "quality": quality,
+        # similarity_search includes embedding each query; exact search starts from the embeddings
+        "similarity_search": latency_summary(search_latencies),
+        "exact_search": latency_summary(exact_latencies)
+    }
+
+
+@click.command()
+@click.option('--persist-directory', help='Knowledge base to evaluate (default: the configured one)')
+@click.option('--synthetic', default=0, help='Evaluate on a fresh synthetic corpus of this many files instead')
+@click.option('--queries', default=200, show_default=True, help='Number of generated queries')
+@click.option('--queries-file', type=click.Path(exists=True), help='File with one query per line')
+@click.option('--k', 'ks', default='1,5,10', show_default=True, help='Comma-separated k values for recall@k')
+@click.option('--seed', default=0, show_default=True, help='Seed for the synthetic corpus and queries')
+@click.option('--output', '-o', help='Write JSON results to this file instead of stdout')
+def main(persist_directory, synthetic, queries, queries_file, ks, seed, output):
+    """Measure recall@k, MRR and latency of similarity_search against exact search."""
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        k_values = [int(k) for k in ks.split(",") if k.strip()]
+    except ValueError:
+        raise click.BadParameter(f"Expected comma-separated integers, got {ks!r}")
+    
+    if queries_file:
+        with open(queries_file, encoding="utf-8") as f:
+            query_list = [line.strip() for line in f if line.strip()]
+    else:
+        query_list = generate_queries(queries, seed)
+    
+    config = copy.deepcopy(get_config())
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if synthetic:
+            persist_directory = str(Path(temp_dir) / "chroma_db")
+        persist_directory = persist_directory or config["vector_store"]["persist_directory"]
+        
+        vector_store = VectorStore(
+            persist_directory=persist_directory,
+            collection_name=config["vector_store"]["collection_name"],
+            performance_config=config["performance"],
+            lexical_index=False
+        )
+        try:
+            if synthetic:
+                corpus_dir = str(Path(temp_dir) / "corpus")
+                generate_corpus(corpus_dir, num_files=synthetic, seed=seed)
+                processor = DocumentProcessor(
+                    chunk_size=config["vector_store"]["chunk_size"],
+                    chunk_overlap=config["vector_store"]["chunk_overlap"]
+                )
+                vector_store.add_documents(processor.process_folder(corpus_dir))
+            
+            results = evaluate(vector_store, query_list, k_values)
+        finally:
+            vector_store.close()
+    
+    parameters = {
+        "persist_directory": None if synthetic else persist_directory, "synthetic": synthetic,
+        "queries": len(query_list), "queries_file": queries_file, "k": k_values, "seed": seed
+    }
+    write_results({**run_metadata("doc-chatbot-retrieval", parameters), **results}, output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Deterministic stand-in for the llama.cpp model.
+
+Benchmarks use it to measure the pipeline around generation without a model
+file: the answer is taken from the first context block of the prompt, and
+optional delays simulate prompt evaluation and token generation speed.
+"""
+
+import re
+import time
+from typing import Any, Iterator, Optional
+
+CONTEXT_PATTERN = re.compile(r"Context 1[^\n]*:\n(.*?)(?:\n\nContext 2|\n\nQuestion:)", re.DOTALL)
+
+
+class FakeLLM:
+    """Streams a reproducible answer with the same ``stream`` interface as LlamaCpp."""
+    
+    def __init__(self, max_words: int = 40, prompt_eval_seconds: float = 0.0, tokens_per_second: float = 0.0):
+        self.max_words = max_words
+        self.prompt_eval_seconds = prompt_eval_seconds
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+    
+    def answer_for(self, prompt: str) -> str:
+        """The full answer returned for ``prompt``."""
+        match = CONTEXT_PATTERN.search(prompt)
+        words = match.group(1).split() if match else []
+        if not words:
+            return "I don't know based on the provided context."
+        return "According to the documents, " + " ".join(words[:self.max_words])
+    
+    def stream(self, prompt: str, **kwargs: Any) -> Iterator[str]:
+        self.calls += 1
+        if self.prompt_eval_seconds:
+            time.sleep(self.prompt_eval_seconds)
+        
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for piece in re.findall(r"\S+\s*", self.answer_for(prompt)):
+            if delay:
+                time.sleep(delay)
+            yield piece
+    
+    def invoke(self, prompt: str, **kwargs: Any) -> str:
+        return "".join(self.stream(prompt))
+
+
+def use_fake_llm(chatbot: Any, llm: Optional[FakeLLM] = None) -> FakeLLM:
+    """Make a DocumentChatbot generate with a FakeLLM (releasing any real model)."""
+    llm = llm or FakeLLM()
+    chatbot.generator.close()
+    chatbot.generator.llm = llm
+    return llm
@@ -0,0 +1,263 @@
+"""
+HTTP load test for fastapi_app.
+
+Drives a mix of ``/ask``, ``/search`` and ``/ingest`` traffic at rising load
+levels and reports throughput, tail latency and error rates per level:
+
+- closed loop (``--mode closed``): each level is a number of concurrent
+  clients that send requests back to back;
+- open loop (``--mode open``): each level is an arrival rate in requests per
+  second, with Poisson arrivals. Latency is measured from the scheduled send
+  time, so client-side queueing is not hidden.
+
+By default the app runs in-process (over httpx's ASGI transport) with the stub
+LLM and a synthetic corpus. With ``--url`` it targets a running server instead,
+e.g. one started with ``python -m benchmarks.serve_stub``. Ingest requests pass
+a local folder path, so the server must share this machine's filesystem::
+
+    python -m benchmarks.load_test --mode closed --levels 1,2,4,8 --duration 10
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --mode open --levels 5,10,20
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import click
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.common import latency_summary, run_metadata, write_results
+from benchmarks.corpus import generate_corpus, generate_queries
+from benchmarks.fake_llm import FakeLLM
+
+ENDPOINTS = ("ask", "search", "ingest")
+
+
+@dataclass
+class Sample:
+    """Outcome of one request."""
+    endpoint: str
+    latency: float
+    status: Optional[int]  # None when the request failed without a response
+    error: Optional[str] = None
+    
+    @property
+    def ok(self) -> bool:
+        return self.status is not None and self.status < 400
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Parse ``ask=0.7,search=0.3`` into normalized endpoint weights."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name!r} (expected one of {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("The traffic mix needs at least one positive weight")
+    return {name: weight / total for name, weight in mix.items() if weight > 0}
+
+
+class RequestFactory:
+    """Builds requests following the traffic mix."""
+    
+    def __init__(self, mix: Dict[str, float], k: int, ingest_dir: str, seed: int = 0):
+        self.mix = mix
+        self.k = k
+        self.ingest_dir = Path(ingest_dir)
+        self.rng = random.Random(seed)
+        self.seed = seed
+        # Distinct questions keep the answer cache out of the measurements until they wrap around
+        self.queries = generate_queries(5000, seed)
+        self.sent = 0
+    
+    def next_request(self) -> Tuple[str, str, str, Dict[str, Any]]:
+        """Return (endpoint, method, path, httpx request kwargs)."""
+        endpoint = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        query = self.queries[self.sent % len(self.queries)]
+        self.sent += 1
+        
+        if endpoint == "ask":
+            return endpoint, "POST", "/ask", {"json": {"question": query, "k": self.k}}
+        if endpoint == "search":
+            return endpoint, "GET", "/search", {"params": {"query": query, "k": self.k}}
+        
+        # Each ingest adds one new small document, written before the clock starts
+        folder = self.ingest_dir / f"batch_{self.sent:06d}"
+        generate_corpus(str(folder), num_files=1, paragraphs_per_file=5, formats=("txt",), seed=self.seed + self.sent)
+        return endpoint, "POST", "/ingest", {"json": {"folder_path": str(folder)}}
+
+
+async def send(client, factory: RequestFactory, scheduled: Optional[float] = None) -> Sample:
+    """Send one request; latency counts from ``scheduled`` when given."""
+    endpoint, method, path, kwargs = factory.next_request()
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+        return Sample(endpoint, time.perf_counter() - start, response.status_code)
+    except Exception as e:
+        return Sample(endpoint, time.perf_counter() - start, None, type(e).__name__)
+
+
+async def run_closed_loop(client, factory: RequestFactory, concurrency: int, duration: float) -> List[Sample]:
+    """``concurrency`` clients sending back-to-back requests for ``duration`` seconds."""
+    deadline = time.perf_counter() + duration
+    samples: List[Sample] = []
+    
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            samples.append(await send(client, factory))
+    
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples
+
+
+async def run_open_loop(client, factory: RequestFactory, rate: float, duration: float, seed: int = 0) -> List[Sample]:
+    """Poisson arrivals at ``rate`` requests per second for ``duration`` seconds."""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    next_send = start
+    tasks = []
+    
+    while True:
+        next_send += rng.expovariate(rate)
+        if next_send - start >= duration:
+            break
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(send(client, factory, scheduled=next_send)))
+    
+    return list(await asyncio.gather(*tasks))
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    """Throughput, latency percentiles and error rate of one load level."""
+    def describe(group: List[Sample]) -> Dict[str, Any]:
+        ok = [s for s in group if s.ok]
+        return {
+            "requests": len(group),
+            "errors": len(group) - len(ok),
+            "error_rate": round((len(group) - len(ok)) / len(group), 4) if group else 0.0,
+            "throughput_rps": round(len(ok) / elapsed, 2),
+            "latency": latency_summary(s.latency for s in ok)
+        }
+    
+    statuses: Dict[str, int] = {}
+    for sample in samples:
+        key = str(sample.status) if sample.status is not None else (sample.error or "error")
+        statuses[key] = statuses.get(key, 0) + 1
+    
+    return {
+        **describe(samples),
+        "elapsed_seconds": round(elapsed, 3),
+        "offered_rps": round(len(samples) / elapsed, 2),
+        "status_codes": statuses,
+        "by_endpoint": {
+            endpoint: describe([s for s in samples if s.endpoint == endpoint])
+            for endpoint in ENDPOINTS if any(s.endpoint == endpoint for s in samples)
+        }
+    }
+
+
+async def run_levels(client, factory: RequestFactory, mode: str, levels: List[float], duration: float, seed: int):
+    """Run every load level in turn and return their reports."""
+    reports = []
+    click.echo(f"{'level':>8} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}", err=True)
+    for level in levels:
+        start = time.perf_counter()
+        if mode == "closed":
+            samples = await run_closed_loop(client, factory, int(level), duration)
+        else:
+            samples = await run_open_loop(client, factory, level, duration, seed)
+        level_key = "concurrency" if mode == "closed" else "rate_rps"
+        report = {level_key: level, **summarize(samples, time.perf_counter() - start)}
+        reports.append(report)
+        
+        latency = report["latency"]
+        click.echo(
+            f"{level:>8g} {report['throughput_rps']:>8.1f} {latency.get('p50_ms', 0):>9.1f} "
+            f"{latency.get('p95_ms', 0):>9.1f} {latency.get('p99_ms', 0):>9.1f} {report['error_rate']:>8.1%}",
+            err=True
+        )
+    return reports
+
+
+async def load_test(
+    url: Optional[str],
+    work_dir: str,
+    mode: str,
+    levels: List[float],
+    duration: float,
+    mix: Dict[str, float],
+    k: int,
+    files: int,
+    llm: FakeLLM,
+    timeout: float,
+    seed: int
+) -> List[Dict[str, Any]]:
+    """Run the load test against ``url``, or against an in-process app if it is None."""
+    import httpx
+    
+    factory = RequestFactory(mix, k, str(Path(work_dir) / "ingest"), seed)
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+            return await run_levels(client, factory, mode, levels, duration, seed)
+    
+    from benchmarks.serve_stub import prepare_stub_app
+    
+    app = prepare_stub_app(work_dir, files=files, llm=llm, seed=seed)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=timeout) as client:
+            return await run_levels(client, factory, mode, levels, duration, seed)
+
+
+@click.command()
+@click.option('--url', help='Base URL of a running server (default: run the app in-process)')
+@click.option('--mode', type=click.Choice(['closed', 'open']), default='closed', show_default=True,
+              help='Closed loop (levels are concurrent clients) or open loop (levels are requests/second)')
+@click.option('--levels', default='1,2,4,8,16', show_default=True, help='Comma-separated load levels')
+@click.option('--duration', default=10.0, show_default=True, help='Seconds per load level')
+@click.option('--mix', default='ask=0.7,search=0.25,ingest=0.05', show_default=True, help='Traffic mix weights')
+@click.option('--k', default=5, show_default=True, help='Chunks retrieved per request')
+@click.option('--files', default=40, show_default=True, help='Synthetic documents ingested in-process')
+@click.option('--token-rate', default=0.0, help='In-process stub LLM tokens per second (0 = instant)')
+@click.option('--prompt-eval-ms', default=0.0, help='In-process stub prompt evaluation time per answer')
+@click.option('--timeout', default=60.0, show_default=True, help='Per-request timeout in seconds')
+@click.option('--seed', default=0, show_default=True, help='Seed for queries, mix and arrivals')
+@click.option('--output', '-o', help='Write JSON results to this file instead of stdout')
+def main(url, mode, levels, duration, mix, k, files, token_rate, prompt_eval_ms, timeout, seed, output):
+    """Load test the API at rising load levels."""
+    try:
+        weights = parse_mix(mix)
+        level_values = [float(level) for level in levels.split(",") if level.strip()]
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    
+    parameters = {
+        "url": url, "mode": mode, "levels": level_values, "duration": duration, "mix": weights,
+        "k": k, "files": files, "token_rate": token_rate, "prompt_eval_ms": prompt_eval_ms,
+        "timeout": timeout, "seed": seed
+    }
+    llm = FakeLLM(prompt_eval_seconds=prompt_eval_ms / 1000.0, tokens_per_second=token_rate)
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        reports = asyncio.run(load_test(
+            url, work_dir, mode, level_values, duration, weights, k, files, llm, timeout, seed
+        ))
+    
+    write_results({**run_metadata("doc-chatbot-load", parameters), "levels": reports}, output)
+
+
+if __name__ == '__main__':
+    main()
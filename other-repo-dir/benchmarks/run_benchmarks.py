@@ -0,0 +1,168 @@
+"""
+Reproducible benchmarks for ingestion, retrieval and answering.
+
+Generates a synthetic corpus, then measures:
+
+- ``process_folder`` throughput (extraction and chunking)
+- ``add_documents`` throughput (embedding and storage)
+- ``similarity_search`` latency percentiles
+- end-to-end ``ask_question`` latency with a deterministic fake LLM
+
+Results are written as JSON, tagged with the git commit, so runs can be
+compared across commits::
+
+    python -m benchmarks.run_benchmarks --files 40 --output results/bench.json
+"""
+
+import copy
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import click
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.chatbot import DocumentChatbot
+from app.config import get_config
+from app.document_processor import DocumentChunk
+from benchmarks.common import latency_summary, run_metadata, write_results
+from benchmarks.corpus import FORMATS, corpus_size, generate_corpus, generate_queries
+from benchmarks.fake_llm import FakeLLM, use_fake_llm
+
+
+def bench_process_folder(chatbot: DocumentChatbot, corpus_dir: str, paths: List[Path], workers: int):
+    """Extract and chunk the corpus; returns the chunks and the throughput figures."""
+    start = time.perf_counter()
+    chunks = chatbot.document_processor.process_folder(corpus_dir, num_workers=workers)
+    elapsed = time.perf_counter() - start
+    
+    size = corpus_size(paths)
+    return chunks, {
+        "seconds": round(elapsed, 4),
+        "files": size["files"],
+        "chunks": len(chunks),
+        "files_per_second": round(size["files"] / elapsed, 2),
+        "chunks_per_second": round(len(chunks) / elapsed, 2),
+        "mb_per_second": round(size["bytes"] / elapsed / 1e6, 3)
+    }
+
+
+def bench_add_documents(chatbot: DocumentChatbot, chunks: List[DocumentChunk]) -> Dict[str, Any]:
+    """Embed and store all chunks in the (empty) collection."""
+    start = time.perf_counter()
+    chatbot.vector_store.add_documents(chunks)
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 4),
+        "chunks": len(chunks),
+        "chunks_per_second": round(len(chunks) / elapsed, 2)
+    }
+
+
+def bench_similarity_search(chatbot: DocumentChatbot, queries: List[str], k: int, warmup: int) -> Dict[str, Any]:
+    """Latency of single-query similarity searches."""
+    for query in queries[:warmup]:
+        chatbot.vector_store.similarity_search(query, k=k)
+    
+    latencies = []
+    for query in queries[warmup:]:
+        start = time.perf_counter()
+        chatbot.vector_store.similarity_search(query, k=k)
+        latencies.append(time.perf_counter() - start)
+    return {"k": k, **latency_summary(latencies)}
+
+
+def bench_ask_question(chatbot: DocumentChatbot, questions: List[str], k: int) -> Dict[str, Any]:
+    """End-to-end answer latency, time to first token and mean stage timings."""
+    total_times, first_token_times = [], []
+    stage_totals: Dict[str, float] = {}
+    for question in questions:
+        start = time.perf_counter()
+        result = chatbot.ask_question(question, k=k)
+        total_times.append(time.perf_counter() - start)
+        first_token_times.append(result["time_to_first_token"])
+        for stage, seconds in result.get("timings", {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+    
+    return {
+        "k": k,
+        "total": latency_summary(total_times),
+        "time_to_first_token": latency_summary(first_token_times),
+        "mean_stage_ms": {
+            stage: round(seconds / len(questions) * 1000.0, 3)
+            for stage, seconds in sorted(stage_totals.items())
+        }
+    }
+
+
+@click.command()
+@click.option('--files', default=40, show_default=True, help='Number of documents in the corpus')
+@click.option('--paragraphs', default=30, show_default=True, help='Paragraphs per document')
+@click.option('--formats', '-f', multiple=True, type=click.Choice(FORMATS), help='File formats (default: all)')
+@click.option('--queries', default=200, show_default=True, help='Similarity searches to time')
+@click.option('--questions', default=20, show_default=True, help='Questions to answer end to end')
+@click.option('--k', default=5, show_default=True, help='Chunks retrieved per query')
+@click.option('--workers', default=1, show_default=True, help='Processes for extraction and chunking (0 = one per CPU)')
+@click.option('--warmup', default=10, show_default=True, help='Untimed searches before measuring')
+@click.option('--token-rate', default=0.0, help='Fake LLM tokens per second (0 = instant)')
+@click.option('--seed', default=0, show_default=True, help='Seed for the synthetic corpus and queries')
+@click.option('--output', '-o', help='Write JSON results to this file instead of stdout')
+def main(files, paragraphs, formats, queries, questions, k, workers, warmup, token_rate, seed, output):
+    """Run the ingestion, retrieval and answering benchmarks."""
+    logging.basicConfig(level=logging.WARNING)
+    formats = list(formats) or list(FORMATS)
+    parameters = {
+        "files": files, "paragraphs": paragraphs, "formats": formats, "queries": queries,
+        "questions": questions, "k": k, "workers": workers, "warmup": warmup,
+        "token_rate": token_rate, "seed": seed
+    }
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = str(Path(temp_dir) / "corpus")
+        paths = generate_corpus(corpus_dir, files, paragraphs, formats, seed)
+        
+        config = copy.deepcopy(get_config())
+        config["vector_store"]["persist_directory"] = str(Path(temp_dir) / "chroma_db")
+        config["performance"]["answer_cache_size"] = 0  # measure answering, not the cache
+        
+        start = time.perf_counter()
+        chatbot = DocumentChatbot(config=config)
+        startup_seconds = time.perf_counter() - start
+        use_fake_llm(chatbot, FakeLLM(tokens_per_second=token_rate))
+        
+        try:
+            chunks, process_results = bench_process_folder(chatbot, corpus_dir, paths, workers)
+            results = {
+                **run_metadata("doc-chatbot", parameters),
+                "config": {
+                    "chunk_size": config["vector_store"]["chunk_size"],
+                    "chunk_overlap": config["vector_store"]["chunk_overlap"],
+                    "embedding_model": config["embedding"]["model"],
+                    "embedding_batch_size": config["performance"]["batch_size"],
+                    "retrieval_mode": config["retrieval"].get("mode", "vector")
+                },
+                "results": {
+                    "startup_seconds": round(startup_seconds, 4),
+                    "process_folder": process_results,
+                    "add_documents": bench_add_documents(chatbot, chunks),
+                    "similarity_search": bench_similarity_search(
+                        chatbot, generate_queries(queries + warmup, seed), k, warmup
+                    ),
+                    "ask_question": bench_ask_question(
+                        chatbot, generate_queries(questions, seed + 1), k
+                    )
+                }
+            }
+        finally:
+            chatbot.close()
+    
+    write_results(results, output)
+
+
+if __name__ == '__main__':
+    main()
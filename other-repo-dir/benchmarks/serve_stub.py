@@ -0,0 +1,76 @@
+"""
+Run fastapi_app offline with a stub LLM and a throwaway knowledge base.
+
+The server answers with the deterministic FakeLLM, stores its index in a
+temporary directory and is pre-loaded with a synthetic corpus, so load tests
+need neither a model file nor the real knowledge base::
+
+    python -m benchmarks.serve_stub --port 8000 --files 40
+    python -m benchmarks.load_test --url http://127.0.0.1:8000
+"""
+
+import logging
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import click
+
+# Add the project root to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import VECTOR_STORE_CONFIG
+from benchmarks.corpus import generate_corpus
+from benchmarks.fake_llm import FakeLLM, use_fake_llm
+
+logger = logging.getLogger(__name__)
+
+
+def prepare_stub_app(work_dir: str, files: int = 40, llm: Optional[FakeLLM] = None, seed: int = 0):
+    """Return fastapi_app's app set up to use a stub LLM and a corpus under ``work_dir``.
+    
+    Must be called before the app starts: the knowledge base is redirected to
+    ``work_dir`` and a startup hook, registered after the app's own, swaps in
+    the stub LLM and ingests ``files`` synthetic documents.
+    """
+    VECTOR_STORE_CONFIG["persist_directory"] = str(Path(work_dir) / "chroma_db")
+    corpus_dir = Path(work_dir) / "corpus"
+    if files:
+        generate_corpus(str(corpus_dir), num_files=files, seed=seed)
+    
+    import fastapi_app
+    
+    @fastapi_app.app.on_event("startup")
+    async def install_stub() -> None:
+        if fastapi_app.chatbot is None:
+            return
+        use_fake_llm(fastapi_app.chatbot, llm or FakeLLM())
+        if files:
+            result = fastapi_app.chatbot.ingest_documents(str(corpus_dir))
+            logger.info(f"Stub corpus: {result['message']}")
+    
+    return fastapi_app.app
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help='Interface to bind')
+@click.option('--port', default=8000, show_default=True, help='Port to listen on')
+@click.option('--files', default=40, show_default=True, help='Synthetic documents ingested at startup (0 = none)')
+@click.option('--work-dir', help='Directory for the corpus and index (default: a temporary directory)')
+@click.option('--token-rate', default=0.0, help='Stub LLM tokens per second (0 = instant)')
+@click.option('--prompt-eval-ms', default=0.0, help='Simulated prompt evaluation time per answer')
+def main(host, port, files, work_dir, token_rate, prompt_eval_ms):
+    """Serve the API with a stub LLM for offline load testing."""
+    import uvicorn
+    
+    logging.basicConfig(level=logging.INFO)
+    llm = FakeLLM(prompt_eval_seconds=prompt_eval_ms / 1000.0, tokens_per_second=token_rate)
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        app = prepare_stub_app(work_dir or temp_dir, files=files, llm=llm)
+        uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == '__main__':
+    main()
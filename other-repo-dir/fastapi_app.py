@@ -4,21 +4,28 @@ Alternative to Streamlit with REST API endpoints.
 """
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+import asyncio
+import json
 import logging
+import threading
 from pathlib import Path
 import sys
 import tempfile
+import shutil
 import os
-from typing import List, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 
 # Add the project root to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.chatbot import DocumentChatbot
+from app.chatbot import DocumentChatbot, parse_question_lines
 from app.config import get_config
+from app.executors import BoundedExecutor, ExecutorBusyError
+from app.jobs import IngestionJobManager
+from app.metrics import stage_metrics
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -34,10 +41,16 @@ app = FastAPI(
 # Global chatbot instance
 chatbot = None
 
+# Separate worker pools so long ingestions never starve queries
+query_executor = None
+ingest_executor = None
+job_manager = None
+
 # Pydantic models for request/response
 class QuestionRequest(BaseModel):
     question: str
     k: Optional[int] = 5
+    include_timings: Optional[bool] = False
 
 class IngestionRequest(BaseModel):
     folder_path: str
@@ -49,6 +62,7 @@ class QuestionResponse(BaseModel):
     citations: List[str]
     sources: List[str]
     total_time: float
+    timings: Optional[Dict[str, float]] = None
 
 class IngestionResponse(BaseModel):
     success: bool
@@ -59,19 +73,124 @@ class IngestionResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize the chatbot on startup."""
-    global chatbot
+    global chatbot, query_executor, ingest_executor, job_manager
+    config = get_config()
+    server_config = config["server"]
+    query_executor = BoundedExecutor(
+        "query",
+        max_workers=server_config["query_workers"],
+        max_queue_depth=server_config["max_queue_depth"]
+    )
+    ingest_executor = BoundedExecutor(
+        "ingest",
+        max_workers=server_config["ingest_workers"],
+        max_queue_depth=server_config["max_queue_depth"]
+    )
+    
     try:
-        config = get_config()
         chatbot = DocumentChatbot(config=config)
+        job_manager = IngestionJobManager(chatbot, ingest_executor)
+        if server_config.get("query_batch_wait_ms", 0) > 0:
+            chatbot.vector_store.enable_query_batching(
+                max_wait_ms=server_config["query_batch_wait_ms"],
+                max_batch_size=server_config.get("query_batch_max_size", 32)
+            )
         logger.info("Chatbot initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize chatbot: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the worker pools and release the chatbot's models."""
+    for executor in (query_executor, ingest_executor):
+        if executor:
+            executor.shutdown(wait=False)
+    if chatbot:
+        chatbot.close()
+
+async def run_in_pool(executor: BoundedExecutor, fn, *args, **kwargs):
+    """Run a blocking chatbot call in a worker pool, mapping a full queue to 503."""
+    try:
+        return await executor.run(fn, *args, **kwargs)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def get_executor_stats() -> dict:
+    """Queue depth and usage of both worker pools."""
+    return {
+        executor.name: executor.get_stats()
+        for executor in (query_executor, ingest_executor) if executor
+    }
+
+def reset_and_ingest(folder_path: str, reset: bool) -> dict:
+    """Optionally reset the knowledge base, then ingest a folder."""
+    if reset:
+        reset_result = chatbot.reset_knowledge_base()
+        if not reset_result['success']:
+            raise RuntimeError(reset_result['message'])
+    
+    return chatbot.ingest_documents(folder_path)
+
+def start_event_stream(executor: BoundedExecutor, events: Iterator[dict]):
+    """Drain a blocking event generator on a pool worker into an asyncio queue.
+    
+    Raises HTTPException(503) if the pool is full, before any response is sent.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    
+    def drain():
+        try:
+            for event in events:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+                if stop.is_set():
+                    break
+        except Exception as e:
+            logger.error(f"Error streaming events: {e}")
+            loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "detail": str(e)})
+        finally:
+            events.close()
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+    
+    try:
+        executor.submit(drain)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return queue, stop
+
+async def sse_events(queue: asyncio.Queue, stop: threading.Event) -> AsyncIterator[str]:
+    """Format queued events as Server-Sent Events until the stream ends."""
+    try:
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    finally:
+        # Client went away or stream finished: stop generating
+        stop.set()
+
+async def ndjson_lines(queue: asyncio.Queue, stop: threading.Event) -> AsyncIterator[str]:
+    """Format queued records as newline-delimited JSON until the stream ends."""
+    try:
+        while True:
+            record = await queue.get()
+            if record is None:
+                break
+            yield json.dumps(record) + "\n"
+    finally:
+        stop.set()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy", "chatbot_ready": chatbot is not None}
+    return {
+        "status": "healthy",
+        "chatbot_ready": chatbot is not None,
+        "executors": get_executor_stats()
+    }
 
 # Document ingestion endpoint
 @app.post("/ingest", response_model=IngestionResponse)
@@ -84,14 +203,11 @@ async def ingest_documents(request: IngestionRequest):
         raise HTTPException(status_code=400, detail="Folder path does not exist")
     
     try:
-        if request.reset:
-            reset_result = chatbot.reset_knowledge_base()
-            if not reset_result['success']:
-                raise HTTPException(status_code=500, detail=reset_result['message'])
-        
-        result = chatbot.ingest_documents(request.folder_path)
+        result = await run_in_pool(ingest_executor, reset_and_ingest, request.folder_path, request.reset)
         return IngestionResponse(**result)
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error ingesting documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,20 +223,70 @@ async def ask_question(request: QuestionRequest):
         raise HTTPException(status_code=400, detail="Question cannot be empty")
     
     try:
-        result = chatbot.ask_question(request.question, k=request.k)
+        result = await run_in_pool(query_executor, chatbot.ask_question, request.question, k=request.k)
         
         return QuestionResponse(
             answer=result['answer'],
             confidence=result['confidence'],
             citations=result['citations'],
             sources=result['sources'],
-            total_time=result['total_time']
+            total_time=result['total_time'],
+            timings=result.get('timings') if request.include_timings else None
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error answering question: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Streaming question answering endpoint (Server-Sent Events)
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """Ask a question and stream the answer tokens as Server-Sent Events.
+    
+    Emits ``token`` events while the answer is generated and a final ``done``
+    event with citations, sources and timing.
+    """
+    if not chatbot:
+        raise HTTPException(status_code=500, detail="Chatbot not initialized")
+    
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    events = chatbot.ask_question_stream(request.question, k=request.k)
+    queue, stop = start_event_stream(query_executor, events)
+    return StreamingResponse(
+        sse_events(queue, stop),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Batch question answering endpoint
+@app.post("/ask/batch")
+async def ask_batch(file: UploadFile = File(...), k: Optional[int] = Form(None)):
+    """Answer a JSONL file of questions, streaming one JSON result per line.
+    
+    Each input line is ``{"id": ..., "question": ..., "k": ...}`` (id and k
+    optional) or a bare JSON string. Results come back in input order with
+    per-item timings.
+    """
+    if not chatbot:
+        raise HTTPException(status_code=500, detail="Chatbot not initialized")
+    
+    try:
+        content = (await file.read()).decode("utf-8")
+        questions = list(parse_question_lines(content.splitlines()))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid question file: {e}")
+    
+    if not questions:
+        raise HTTPException(status_code=400, detail="Question file is empty")
+    
+    # Generate on the query-pool worker itself rather than on a private thread pool
+    queue, stop = start_event_stream(query_executor, chatbot.ask_batch(questions, k=k, num_workers=0))
+    return StreamingResponse(ndjson_lines(queue, stop), media_type="application/x-ndjson")
+
 # Search documents endpoint
 @app.get("/search")
 async def search_documents(query: str, k: int = 10):
@@ -129,9 +295,11 @@ async def search_documents(query: str, k: int = 10):
         raise HTTPException(status_code=500, detail="Chatbot not initialized")
     
     try:
-        results = chatbot.search_documents(query, k=k)
+        results = await run_in_pool(query_executor, chatbot.search_documents, query, k=k)
         return {"results": results}
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -144,24 +312,59 @@ async def get_stats():
         raise HTTPException(status_code=500, detail="Chatbot not initialized")
     
     try:
-        stats = chatbot.get_stats()
+        stats = await run_in_pool(query_executor, chatbot.get_stats)
+        stats["executors"] = get_executor_stats()
         return stats
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Prometheus metrics endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage latency histograms, service gauges and counters in Prometheus text format."""
+    gauges, counters = {}, {}
+    for executor in (query_executor, ingest_executor):
+        if executor:
+            executor_stats = executor.get_stats()
+            gauges[f"doc_chatbot_{executor.name}_pool_running"] = (
+                f"Tasks running in the {executor.name} pool.", executor_stats["running"]
+            )
+            gauges[f"doc_chatbot_{executor.name}_pool_queued"] = (
+                f"Tasks waiting in the {executor.name} pool.", executor_stats["queued"]
+            )
+    
+    if chatbot:
+        # Read from in-memory counters only, so scrapes never wait for a worker
+        answer_cache_stats = chatbot.answer_cache.get_stats()
+        counters["doc_chatbot_answer_cache_hits_total"] = ("Answer cache hits.", answer_cache_stats["hits"])
+        counters["doc_chatbot_answer_cache_misses_total"] = ("Answer cache misses.", answer_cache_stats["misses"])
+        gauges["doc_chatbot_sources"] = ("Source files in the knowledge base.", len(chatbot.list_sources()))
+    
+    return PlainTextResponse(
+        stage_metrics.render_prometheus(gauges, counters),
+        media_type="text/plain; version=0.0.4"
+    )
+
 # Available sources endpoint
 @app.get("/sources")
 async def get_sources():
-    """Get available document sources."""
+    """Get available document sources, with per-file chunk and page counts."""
     if not chatbot:
         raise HTTPException(status_code=500, detail="Chatbot not initialized")
     
     try:
-        sources = chatbot.get_available_sources()
-        return {"sources": sources}
+        files = chatbot.list_sources()  # in-memory catalog, no need for a worker
+        return {
+            "sources": sorted({entry["file_name"] for entry in files}),
+            "files": files
+        }
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting sources: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -174,13 +377,25 @@ async def reset_knowledge_base():
         raise HTTPException(status_code=500, detail="Chatbot not initialized")
     
     try:
-        result = chatbot.reset_knowledge_base()
+        result = await run_in_pool(ingest_executor, chatbot.reset_knowledge_base)
         return result
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error resetting knowledge base: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def save_uploads(files: List[UploadFile]) -> str:
+    """Save uploaded files into a new temporary directory and return its path."""
+    temp_dir = tempfile.mkdtemp()
+    for file in files:
+        file_path = Path(temp_dir) / Path(file.filename).name
+        with open(file_path, "wb") as f:
+            content = await file.read()
+            f.write(content)
+    return temp_dir
+
 # File upload endpoint (alternative to folder path)
 @app.post("/upload")
 async def upload_files(files: List[UploadFile] = File(...), reset: bool = Form(False)):
@@ -188,34 +403,81 @@ async def upload_files(files: List[UploadFile] = File(...), reset: bool = Form(F
     if not chatbot:
         raise HTTPException(status_code=500, detail="Chatbot not initialized")
     
-    # Create temporary directory
-    temp_dir = tempfile.mkdtemp()
-    
+    temp_dir = None
     try:
         # Save uploaded files
-        for file in files:
-            file_path = Path(temp_dir) / file.filename
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
+        temp_dir = await save_uploads(files)
         
         # Ingest documents
-        if reset:
-            reset_result = chatbot.reset_knowledge_base()
-            if not reset_result['success']:
-                raise HTTPException(status_code=500, detail=reset_result['message'])
-        
-        result = chatbot.ingest_documents(temp_dir)
+        result = await run_in_pool(ingest_executor, reset_and_ingest, temp_dir, reset)
         return IngestionResponse(**result)
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading files: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
     finally:
         # Clean up temporary directory
-        import shutil
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+# Background ingestion jobs
+@app.post("/jobs/ingest", status_code=202)
+async def submit_ingestion_job(request: IngestionRequest):
+    """Queue a folder for ingestion and return a job id immediately."""
+    if not chatbot:
+        raise HTTPException(status_code=500, detail="Chatbot not initialized")
+    
+    if not Path(request.folder_path).exists():
+        raise HTTPException(status_code=400, detail="Folder path does not exist")
+    
+    try:
+        job = job_manager.submit(request.folder_path, reset=request.reset)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return job.to_dict()
+
+@app.post("/jobs/upload", status_code=202)
+async def submit_upload_job(files: List[UploadFile] = File(...), reset: bool = Form(False)):
+    """Upload files and ingest them in a background job."""
+    if not chatbot:
+        raise HTTPException(status_code=500, detail="Chatbot not initialized")
+    
+    temp_dir = await save_uploads(files)
+    try:
+        job = job_manager.submit(
+            temp_dir,
+            reset=reset,
+            cleanup=lambda: shutil.rmtree(temp_dir, ignore_errors=True)
+        )
+    except ExecutorBusyError as e:
         shutil.rmtree(temp_dir, ignore_errors=True)
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return job.to_dict()
+
+@app.get("/jobs")
+async def list_ingestion_jobs():
+    """List recent ingestion jobs."""
+    if not chatbot:
+        raise HTTPException(status_code=500, detail="Chatbot not initialized")
+    
+    return {"jobs": job_manager.list_jobs()}
+
+@app.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Get progress, throughput and ETA of an ingestion job."""
+    if not chatbot:
+        raise HTTPException(status_code=500, detail="Chatbot not initialized")
+    
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job.to_dict()
 
 # Simple HTML interface
 @app.get("/", response_class=HTMLResponse)
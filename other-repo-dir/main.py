@@ -3,7 +3,9 @@ Command-line interface for document ingestion and querying.
 """
 
 import click
+import json
 import logging
+import time
 from pathlib import Path
 import sys
 import os
@@ -11,8 +13,8 @@ import os
 # Add the project root to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.chatbot import DocumentChatbot
 from app.config import get_config
+from app.daemon import ChatbotDaemon, DaemonError, connect_to_daemon, unix_sockets_supported
 
 # Setup logging
 logging.basicConfig(
@@ -21,10 +23,28 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def load_chatbot(config, model_path=None):
+    """Create a chatbot in this process (imports the ML stack on first use)."""
+    from app.chatbot import DocumentChatbot
+    return DocumentChatbot(config=config, model_path=model_path)
+
+def get_daemon_client(ctx, model_path=None):
+    """Client for a running daemon that can serve this command, or None."""
+    if not ctx.obj['use_daemon']:
+        return None
+    
+    daemon_config = ctx.obj['config']['daemon']
+    client = connect_to_daemon(daemon_config['socket_path'], daemon_config.get('connect_timeout', 0.5))
+    if client and model_path and client.info.get('model_path') != str(Path(model_path).resolve()):
+        click.echo("⚠️  Running daemon uses a different model; running locally instead")
+        return None
+    return client
+
 @click.group()
 @click.option('--config-file', help='Path to configuration file')
+@click.option('--no-daemon', is_flag=True, help='Never use a running daemon (python main.py serve)')
 @click.pass_context
-def cli(ctx, config_file):
+def cli(ctx, config_file, no_daemon):
     """Document Chatbot CLI - A system for answering questions from document collections."""
     ctx.ensure_object(dict)
     
@@ -35,22 +55,29 @@ def cli(ctx, config_file):
         pass
     
     ctx.obj['config'] = config
+    ctx.obj['use_daemon'] = not no_daemon
 
 @cli.command()
 @click.argument('folder_path', type=click.Path(exists=True, file_okay=False, dir_okay=True))
 @click.option('--model-path', help='Path to LLM model file (optional)')
 @click.option('--reset', is_flag=True, help='Reset existing knowledge base before ingestion')
+@click.option('--workers', type=int, help='Worker processes for file parsing (0 = one per CPU)')
+@click.option('--full', is_flag=True, help='Re-ingest every file, even if unchanged since the last run')
 @click.pass_context
-def ingest(ctx, folder_path, model_path, reset):
+def ingest(ctx, folder_path, model_path, reset, workers, full):
     """Ingest documents from a folder into the knowledge base."""
     config = ctx.obj['config']
     
-    click.echo(f"🔍 Initializing chatbot...")
-    chatbot = DocumentChatbot(config=config, model_path=model_path)
+    client = get_daemon_client(ctx, model_path)
+    if client:
+        click.echo(f"🔌 Using daemon at {client.socket_path}")
+    else:
+        click.echo(f"🔍 Initializing chatbot...")
+        chatbot = load_chatbot(config, model_path)
     
     if reset:
         click.echo("🗑️  Resetting knowledge base...")
-        result = chatbot.reset_knowledge_base()
+        result = client.request('reset') if client else chatbot.reset_knowledge_base()
         if result['success']:
             click.echo("✅ Knowledge base reset successfully")
         else:
@@ -59,13 +86,26 @@ def ingest(ctx, folder_path, model_path, reset):
     
     click.echo(f"📚 Ingesting documents from: {folder_path}")
     
-    result = chatbot.ingest_documents(folder_path)
+    incremental = False if full else None
+    if client:
+        # The daemon may run from another directory
+        result = client.request(
+            'ingest',
+            folder_path=str(Path(folder_path).resolve()),
+            num_workers=workers,
+            incremental=incremental
+        )
+    else:
+        result = chatbot.ingest_documents(folder_path, num_workers=workers, incremental=incremental)
     
     if result['success']:
         stats = result['stats']
         click.echo(f"✅ {result['message']}")
         click.echo(f"📊 Statistics:")
         click.echo(f"   - New chunks: {stats.get('new_chunks', 0)}")
+        click.echo(f"   - Files processed: {stats.get('files_processed', 0)} "
+                   f"(updated: {stats.get('files_updated', 0)}, unchanged: {stats.get('files_skipped', 0)}, "
+                   f"removed: {stats.get('files_removed', 0)})")
         click.echo(f"   - Total documents: {stats.get('total_documents', 0)}")
         click.echo(f"   - Processing time: {stats.get('processing_time', 0):.2f}s")
     else:
@@ -81,13 +121,15 @@ def ask(ctx, question, model_path, k, show_sources):
     """Ask a question to the chatbot."""
     config = ctx.obj['config']
     
-    click.echo(f"🤖 Initializing chatbot...")
-    chatbot = DocumentChatbot(config=config, model_path=model_path)
+    client = get_daemon_client(ctx, model_path)
+    if not client:
+        click.echo(f"🤖 Initializing chatbot...")
+        chatbot = load_chatbot(config, model_path)
     
     click.echo(f"❓ Question: {question}")
     click.echo("🔍 Searching for relevant information...")
     
-    result = chatbot.ask_question(question, k=k)
+    result = client.request('ask', question=question, k=k) if client else chatbot.ask_question(question, k=k)
     
     click.echo("\n" + "="*60)
     click.echo("📝 ANSWER:")
@@ -108,6 +150,48 @@ def ask(ctx, question, model_path, k, show_sources):
             click.echo(f"   Content: {source['content']}")
             click.echo()
 
+@cli.command('ask-batch')
+@click.argument('questions_file', type=click.File('r', encoding='utf-8'))
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+              help='JSONL file for results (default: stdout)')
+@click.option('--model-path', help='Path to LLM model file (optional)')
+@click.option('--k', type=int, help='Number of documents to retrieve (per-line "k" overrides)')
+@click.option('--workers', type=int, help='Threads generating answers in parallel (0 = generate on the main thread)')
+@click.option('--batch-size', type=int, help='Questions embedded and retrieved together')
+@click.pass_context
+def ask_batch(ctx, questions_file, output, model_path, k, workers, batch_size):
+    """Answer a JSONL file of questions, writing one JSON result per line.
+    
+    Each input line is {"id": ..., "question": ..., "k": ...} (id and k
+    optional) or a bare JSON string.
+    """
+    from app.chatbot import parse_question_lines
+    
+    config = ctx.obj['config']
+    
+    click.echo("🤖 Initializing chatbot...", err=True)
+    chatbot = load_chatbot(config, model_path)
+    
+    start_time = time.time()
+    answered = errors = 0
+    try:
+        results = chatbot.ask_batch(
+            parse_question_lines(questions_file), k=k, num_workers=workers, batch_size=batch_size
+        )
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            answered += 1
+            errors += 'error' in result
+    except ValueError as e:
+        click.echo(f"❌ {e}", err=True)
+        sys.exit(1)
+    
+    elapsed = time.time() - start_time
+    rate = answered / elapsed if elapsed > 0 else 0.0
+    click.echo(f"✅ Answered {answered} questions ({errors} errors) in {elapsed:.2f}s "
+               f"({rate:.1f} questions/s)", err=True)
+
 @cli.command()
 @click.option('--model-path', help='Path to LLM model file (optional)')
 @click.pass_context
@@ -116,7 +200,7 @@ def interactive(ctx, model_path):
     config = ctx.obj['config']
     
     click.echo("🤖 Initializing chatbot...")
-    chatbot = DocumentChatbot(config=config, model_path=model_path)
+    chatbot = load_chatbot(config, model_path)
     
     # Check if we have any documents
     stats = chatbot.get_stats()
@@ -158,11 +242,15 @@ def interactive(ctx, model_path):
             elif not question:
                 continue
             
-            # Get answer
-            result = chatbot.ask_question(question)
-            
+            # Stream the answer as it is generated
             click.echo(f"\n🤖 Answer:")
-            click.echo(result['answer'])
+            result = {}
+            for event in chatbot.ask_question_stream(question):
+                if event['type'] == 'token':
+                    click.echo(event['text'], nl=False)
+                elif event['type'] == 'done':
+                    result = event
+            click.echo()
             
             if result['citations']:
                 click.echo(f"\n📚 {', '.join(result['citations'])}")
@@ -182,18 +270,29 @@ def stats(ctx, model_path):
     """Show system statistics."""
     config = ctx.obj['config']
     
-    chatbot = DocumentChatbot(config=config, model_path=model_path)
-    stats = chatbot.get_stats()
+    client = get_daemon_client(ctx, model_path)
+    stats = client.request('stats') if client else load_chatbot(config, model_path).get_stats()
     
     click.echo("📊 System Statistics:")
     click.echo("=" * 40)
     click.echo(f"Total documents: {stats['vector_store']['total_documents']}")
     click.echo(f"Collection name: {stats['vector_store']['collection_name']}")
     click.echo(f"Persist directory: {stats['vector_store']['persist_directory']}")
+    index = stats['vector_store'].get('index')
+    if index and index.get('exact'):
+        click.echo(f"Index: {index['space']} distance (exact NumPy search)")
+    elif index:
+        click.echo(f"Index: {index['space']} distance (M={index['M']}, "
+                   f"construction_ef={index['construction_ef']}, search_ef={index['search_ef']})")
     click.echo(f"Chunk size: {stats['config']['chunk_size']}")
     click.echo(f"Chunk overlap: {stats['config']['chunk_overlap']}")
     click.echo(f"Retrieval k: {stats['config']['retrieval_k']}")
     click.echo(f"Confidence threshold: {stats['config']['confidence_threshold']}")
+    
+    cache_stats = stats['vector_store'].get('embedding_cache')
+    if cache_stats:
+        click.echo(f"Embedding cache: {cache_stats['entries']} entries "
+                   f"({cache_stats['hits']} hits, {cache_stats['misses']} misses)")
 
 @cli.command()
 @click.option('--model-path', help='Path to LLM model file (optional)')
@@ -208,13 +307,83 @@ def reset(ctx, model_path, confirm):
             click.echo("Operation cancelled.")
             return
     
-    chatbot = DocumentChatbot(config=config, model_path=model_path)
-    result = chatbot.reset_knowledge_base()
+    client = get_daemon_client(ctx, model_path)
+    result = client.request('reset') if client else load_chatbot(config, model_path).reset_knowledge_base()
     
     if result['success']:
         click.echo("✅ Knowledge base reset successfully")
     else:
         click.echo(f"❌ {result['message']}")
 
+@cli.command()
+@click.option('--space', type=click.Choice(['l2', 'cosine', 'ip']), help='Distance space (default: configured)')
+@click.option('--construction-ef', type=int, help='HNSW candidates considered while building')
+@click.option('--search-ef', type=int, help='HNSW candidates considered per query (the configured value is re-applied at startup)')
+@click.option('--m', 'm', type=int, help='HNSW links per node')
+@click.option('--model-path', help='Path to LLM model file (optional)')
+@click.pass_context
+def reindex(ctx, space, construction_ef, search_ef, m, model_path):
+    """Rebuild the vector index with new distance/HNSW settings (no re-embedding)."""
+    config = ctx.obj['config']
+    
+    hnsw_config = dict(config['vector_store'].get('hnsw', {}))
+    for key, value in (('construction_ef', construction_ef), ('search_ef', search_ef), ('M', m)):
+        if value is not None:
+            hnsw_config[key] = value
+    space = space or config['vector_store'].get('distance_space', 'l2')
+    
+    click.echo(f"🔧 Rebuilding index ({space} distance, {hnsw_config})...")
+    client = get_daemon_client(ctx, model_path)
+    if client:
+        result = client.request('reindex', distance_space=space, hnsw_config=hnsw_config)
+    else:
+        result = load_chatbot(config, model_path).rebuild_index(space, hnsw_config)
+    
+    if result['success']:
+        click.echo(f"✅ {result['message']} in {result['stats']['processing_time']:.2f}s")
+    else:
+        click.echo(f"❌ {result['message']}")
+
+@cli.command()
+@click.option('--model-path', help='Path to LLM model file (optional)')
+@click.pass_context
+def serve(ctx, model_path):
+    """Run a daemon that keeps models loaded for ask, stats, ingest and reset."""
+    config = ctx.obj['config']
+    socket_path = config['daemon']['socket_path']
+    
+    if not unix_sockets_supported():
+        click.echo("❌ Daemon mode needs Unix domain sockets, which this platform does not provide")
+        return
+    
+    click.echo("🤖 Initializing chatbot...")
+    chatbot = load_chatbot(config, model_path)
+    daemon = ChatbotDaemon(chatbot, socket_path, model_path=model_path)
+    
+    click.echo(f"🔌 Daemon listening on {socket_path} (Ctrl+C or 'python main.py stop' to exit)")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("\n👋 Stopping daemon")
+    except RuntimeError as e:
+        click.echo(f"❌ {e}")
+    finally:
+        chatbot.close()
+
+@cli.command()
+@click.pass_context
+def stop(ctx):
+    """Stop a running daemon."""
+    client = get_daemon_client(ctx)
+    if not client:
+        click.echo("No daemon is running")
+        return
+    
+    try:
+        client.request('shutdown')
+        click.echo(f"✅ Daemon (pid {client.info.get('pid')}) stopped")
+    except (DaemonError, OSError) as e:
+        click.echo(f"❌ Could not stop daemon: {e}")
+
 if __name__ == '__main__':
     cli()
@@ -38,6 +38,9 @@ def initialize_chatbot(model_path=None):
     """Initialize the chatbot."""
     try:
         config = get_config()
+        # Models are shared process-wide; release this session's previous references first
+        if st.session_state.chatbot is not None:
+            st.session_state.chatbot.close()
         st.session_state.chatbot = DocumentChatbot(config=config, model_path=model_path)
         st.session_state.is_initialized = True
         return True
@@ -77,11 +80,12 @@ def main():
                 st.metric("Retrieval K", stats['config']['retrieval_k'])
                 
                 # Available sources
-                sources = st.session_state.chatbot.get_available_sources()
+                sources = st.session_state.chatbot.list_sources()
                 if sources:
                     st.subheader("📚 Available Sources")
                     for source in sources[:10]:  # Show first 10
-                        st.text(f"• {source}")
+                        st.text(f"• {source['file_name']} ({source['chunk_count']} chunks, "
+                                f"{source['page_count']} pages)")
                     if len(sources) > 10:
                         st.text(f"... and {len(sources) - 10} more")
                         
@@ -178,10 +182,21 @@ def main():
                 elif not question:
                     st.error("Please enter a question")
                 else:
+                    st.markdown(f"**🙋 You:** {question}")
+                    placeholder = st.empty()
+                    streamed = ""
+                    answer = None
+                    
                     with st.spinner("Thinking..."):
-                        start_time = time.time()
-                        answer = st.session_state.chatbot.ask_question(question, k=k_value)
+                        # Render tokens as they arrive; the final event carries citations and timing
+                        for event in st.session_state.chatbot.ask_question_stream(question, k=k_value):
+                            if event["type"] == "token":
+                                streamed += event["text"]
+                                placeholder.markdown(f"**🤖 Bot:** {streamed}▌")
+                            elif event["type"] == "done":
+                                answer = {key: value for key, value in event.items() if key != "type"}
                         
+                    if answer is not None:
                         # Add to chat history
                         st.session_state.chat_history.append((question, answer))
                         
@@ -5,16 +5,73 @@ Test suite for the document chatbot system.
 import pytest
 import tempfile
 import shutil
+import os
+import json
+import subprocess
+import threading
+import time
+import numpy as np
 from pathlib import Path
 import sys
 
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.chatbot import DocumentChatbot
+from app.chatbot import DocumentChatbot, parse_question_lines
 from app.document_processor import DocumentProcessor
-from app.vector_store import VectorStore
+from app.vector_store import VectorStore, distance_to_score
+from app.manifest import IngestionManifest
+from app.embedding_cache import EmbeddingCache
+from app.numpy_store import NumpyClient
+from app.source_catalog import SourceCatalog
+from app.query_batcher import QueryBatcher
+from app.model_registry import ModelRegistry
+from app.cache import LRUCache, AnswerCache
+from app.lexical_index import BM25Index
+from app.retriever import reciprocal_rank_fusion
+from app.generator import AnswerGenerator, PROMPT_PREFIX
+from app.metrics import StageMetrics, collect_timings, record_stage, stage_timer
+from app.daemon import ChatbotDaemon, DaemonError, connect_to_daemon, unix_sockets_supported
 from app.config import get_config
+from benchmarks.corpus import FORMATS, generate_corpus, generate_queries
+from benchmarks.fake_llm import FakeLLM
+from benchmarks.load_test import Sample, parse_mix, summarize
+from benchmarks.eval_retrieval import evaluate, exact_neighbours
+
+class TestImportTime:
+    """Guard against heavy dependencies creeping back into import time."""
+    
+    HEAVY_MODULES = [
+        "chromadb", "langchain", "langchain_core", "langchain_community", "langchain_huggingface",
+        "sentence_transformers", "torch", "llama_cpp", "pdfplumber", "PyPDF2", "pypdf", "docx", "markdown"
+    ]
+    
+    def test_lightweight_imports(self):
+        """Test that importing the package and CLI loads no heavy dependencies."""
+        code = (
+            "import json, sys\n"
+            "import app, app.chatbot, main\n"
+            f"heavy = [m for m in {self.HEAVY_MODULES!r} if m in sys.modules]\n"
+            "print(json.dumps({'heavy': heavy}))\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=str(Path(__file__).parent),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        
+        assert result["heavy"] == []
+    
+    def test_lazy_package_exports(self):
+        """Test that package-level names still resolve."""
+        import app
+        
+        assert app.DocumentChatbot is DocumentChatbot
+        with pytest.raises(AttributeError):
+            app.NotAThing
 
 class TestDocumentProcessor:
     """Test the document processor."""
@@ -66,6 +123,564 @@ class TestDocumentProcessor:
         finally:
             Path(temp_file).unlink()
 
+    def test_parallel_folder_processing(self):
+        """Test that parallel processing matches sequential output order."""
+        processor = DocumentProcessor(chunk_size=20, chunk_overlap=5)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for i in range(6):
+                with open(Path(temp_dir) / f"doc_{i}.txt", 'w') as f:
+                    f.write(" ".join(f"document{i} word{j}" for j in range(60)))
+            # Unreadable as a PDF; should be logged and skipped
+            with open(Path(temp_dir) / "broken.pdf", 'w') as f:
+                f.write("not a pdf")
+            
+            sequential = processor.process_folder(temp_dir, num_workers=1)
+            parallel = processor.process_folder(temp_dir, num_workers=3)
+        
+        assert len(sequential) > 6
+        assert [c.chunk_id for c in parallel] == [c.chunk_id for c in sequential]
+        assert [c.content for c in parallel] == [c.content for c in sequential]
+    
+    def test_chunk_ids_survive_edits_elsewhere(self):
+        """Test that chunk ids do not depend on position and repeated text gets distinct ids."""
+        processor = DocumentProcessor(chunk_size=20, chunk_overlap=0)
+        page_one = " ".join(f"intro{j}" for j in range(20))
+        page_two = " ".join(f"body{j}" for j in range(20))
+        
+        before = processor._create_chunks([
+            {"text": page_one, "page": 1},
+            {"text": page_two, "page": 2}
+        ], "/docs/guide.pdf")
+        after = processor._create_chunks([
+            {"text": page_one + " " + " ".join(f"added{j}" for j in range(20)), "page": 1},
+            {"text": page_two + " " + page_two, "page": 2}
+        ], "/docs/guide.pdf")
+        
+        assert [c.chunk_id for c in after if c.page_number == 2][0] == before[1].chunk_id
+        assert len({c.chunk_id for c in after}) == len(after) == 4
+
+class TestIngestionManifest:
+    """Test change detection in the ingestion manifest."""
+    
+    def test_change_detection(self):
+        """Test that only new or modified files need ingesting."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            doc = Path(temp_dir) / "docs" / "a.txt"
+            doc.parent.mkdir()
+            doc.write_text("original content")
+            
+            manifest = IngestionManifest(str(Path(temp_dir) / "manifest.json"))
+            assert manifest.needs_ingest(doc)
+            manifest.record(doc, ["a_chunk_0"])
+            manifest.save()
+            
+            # Reloaded manifest sees the file as unchanged
+            manifest = IngestionManifest(str(Path(temp_dir) / "manifest.json"))
+            assert not manifest.needs_ingest(doc)
+            assert manifest.get(doc).chunk_ids == ["a_chunk_0"]
+            
+            # Same content with a new mtime is still unchanged
+            stat = doc.stat()
+            os.utime(doc, (stat.st_atime, stat.st_mtime + 10))
+            assert not manifest.needs_ingest(doc)
+            
+            doc.write_text("modified content")
+            assert manifest.needs_ingest(doc)
+            
+            doc.unlink()
+            assert manifest.missing_files(str(doc.parent)) == [IngestionManifest.key_for(doc)]
+    
+    def test_concurrent_saves_merge(self):
+        """Test that two manifests saving to one file keep each other's entries."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            docs = []
+            for name in ("a.txt", "b.txt", "c.txt"):
+                docs.append(Path(temp_dir) / name)
+                docs[-1].write_text(f"content of {name}")
+            manifest_path = str(Path(temp_dir) / "manifest.json")
+            
+            first = IngestionManifest(manifest_path)
+            first.record(docs[2], ["c_chunk_0"])
+            first.save()
+            
+            second = IngestionManifest(manifest_path)
+            first.record(docs[0], ["a_chunk_0"])
+            second.record(docs[1], ["b_chunk_0"])
+            second.remove(IngestionManifest.key_for(docs[2]))
+            first.save()
+            second.save()
+            
+            reloaded = IngestionManifest(manifest_path)
+            assert sorted(reloaded.entries) == sorted(IngestionManifest.key_for(doc) for doc in docs[:2])
+
+class TestSourceCatalog:
+    """Test per-source chunk and page counts."""
+    
+    def test_add_remove_and_persist(self):
+        """Test counting chunks in and out and reloading from disk."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            catalog = SourceCatalog.for_persist_directory(temp_dir)
+            catalog.add([
+                {"source": "/docs/a.pdf", "file_name": "a.pdf", "page_number": 1},
+                {"source": "/docs/a.pdf", "file_name": "a.pdf", "page_number": 2},
+                {"source": "/docs/b.txt", "file_name": "b.txt", "page_number": 1}
+            ])
+            catalog.remove([{"source": "/docs/b.txt", "page_number": 1}])
+            catalog.save()
+            
+            reloaded = SourceCatalog.for_persist_directory(temp_dir)
+            sources = reloaded.list_sources()
+            assert [s["file_name"] for s in sources] == ["a.pdf"]
+            assert sources[0]["chunk_count"] == 2
+            assert sources[0]["page_count"] == 2
+            assert sources[0]["ingested_at"] > 0
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    def test_concurrent_saves_merge(self):
+        """Test that two catalogs saving to one file keep each other's counts."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = SourceCatalog.for_persist_directory(temp_dir)
+            first.add([{"source": "/docs/a.txt", "page_number": 1}])
+            first.save()
+            
+            second = SourceCatalog.for_persist_directory(temp_dir)
+            first.add([{"source": "/docs/b.txt", "page_number": 1}])
+            second.add([{"source": "/docs/c.txt", "page_number": 1}])
+            second.remove([{"source": "/docs/a.txt", "page_number": 1}])
+            first.save()
+            second.save()
+            
+            sources = SourceCatalog.for_persist_directory(temp_dir).list_sources()
+            assert [s["file_name"] for s in sources] == ["b.txt", "c.txt"]
+            assert second.list_sources() == sources
+
+class TestEmbeddingCache:
+    """Test the persistent embedding cache."""
+    
+    def test_hits_misses_and_eviction(self):
+        """Test lookups, persistence and LRU eviction."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache_path = str(Path(temp_dir) / "cache.sqlite3")
+            cache = EmbeddingCache(cache_path, model_name="test-model", max_entries=2)
+            
+            assert cache.get_many(["a", "b"]) == [None, None]
+            cache.put_many(["a", "b"], [[1.0, 0.0], [0.0, 1.0]])
+            assert cache.get_many(["a"])[0].tolist() == [1.0, 0.0]
+            
+            # "b" is now least recently used and is evicted first
+            cache.put_many(["c"], [[0.5, 0.5]])
+            assert cache.get_many(["b"]) == [None]
+            
+            stats = cache.get_stats()
+            assert stats["entries"] == 2
+            assert stats["hits"] == 1
+            assert stats["misses"] == 3
+            cache.close()
+            
+            # Entries survive reopening, but not under a different model name
+            assert EmbeddingCache(cache_path, model_name="test-model").get_many(["c"])[0] is not None
+            assert EmbeddingCache(cache_path, model_name="other-model").get_many(["c"]) == [None]
+
+class TestLRUCache:
+    """Test the in-process LRU cache."""
+    
+    def test_eviction_and_stats(self):
+        """Test capacity-bounded eviction and hit-rate counters."""
+        cache = LRUCache(capacity=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)  # Evicts "b", the least recently used
+        
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+        
+        stats = cache.get_stats()
+        assert stats["entries"] == 2
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+
+class TestAnswerCache:
+    """Test answer caching across index generations."""
+    
+    def test_generation_invalidates_answers(self):
+        """Test that bumping the index generation hides earlier answers."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = AnswerCache(temp_dir, capacity=4, persist=True)
+            cache.put("What is  ML?", 5, {"answer": "Machine learning."})
+            
+            assert cache.get(" What is ML? ", 5)["answer"] == "Machine learning."
+            assert cache.get("What is ML?", 3) is None
+            
+            # Persisted answers are reloaded for the same generation
+            assert AnswerCache(temp_dir, persist=True).get("What is ML?", 5) is not None
+            
+            cache.bump_generation()
+            assert cache.get("What is ML?", 5) is None
+            assert AnswerCache(temp_dir, persist=True).get("What is ML?", 5) is None
+    
+    def test_answer_from_older_generation_not_cached(self):
+        """Test that an answer retrieved before an index change is not served after it."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = AnswerCache(temp_dir)
+            generation = cache.generation()
+            
+            # Another process changes the index while the answer is generated
+            assert AnswerCache(temp_dir).bump_generation() == generation + 1
+            cache.put("What is ML?", 5, {"answer": "Stale."}, generation)
+            
+            assert cache.generation() == generation + 1
+            assert cache.get("What is ML?", 5) is None
+
+class TestQueryBatcher:
+    """Test coalescing of concurrent searches."""
+    
+    def test_concurrent_searches_share_batches(self):
+        """Test that concurrent searches are batched and trimmed per request."""
+        calls = []
+        
+        def search_batch(queries, k, confidence_threshold):
+            calls.append(list(queries))
+            return [
+                [{"content": f"{q}-{i}", "similarity_score": 1.0 - i * 0.1} for i in range(k)]
+                for q in queries
+            ]
+        
+        batcher = QueryBatcher(search_batch, max_wait_ms=50, max_batch_size=8)
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(
+                    lambda i: batcher.search(f"q{i}", k=1 + i % 3, confidence_threshold=0.85),
+                    range(8)
+                ))
+        finally:
+            batcher.close()
+        
+        assert sum(len(batch) for batch in calls) == 8
+        assert len(calls) < 8
+        for i, result in enumerate(results):
+            # Trimmed to the request's own k, then filtered by its threshold
+            assert [r["content"] for r in result] == [f"q{i}-{j}" for j in range(min(1 + i % 3, 2))]
+    
+    def test_search_after_close_raises(self):
+        """Test that a closed batcher rejects searches instead of blocking."""
+        batcher = QueryBatcher(lambda queries, k, threshold: [[] for _ in queries])
+        assert batcher.search("q", k=1) == []
+        batcher.close()
+        batcher.close()
+        
+        with pytest.raises(RuntimeError):
+            batcher.search("q", k=1)
+
+class TestLexicalIndex:
+    """Test the BM25 index and rank fusion used by hybrid retrieval."""
+    
+    def test_exact_identifier_search(self):
+        """Test that identifiers are found and survive save, load and delete."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index = BM25Index(str(Path(temp_dir) / "bm25.npz"))
+            index.add(
+                ["a", "b", "c"],
+                ["Router setup guide.", "Error ERR-4012 means the uplink failed.", "Setup of the uplink."]
+            )
+            assert index.search("what is err-4012", k=1)[0][0] == "b"
+            index.save()
+            
+            loaded = BM25Index(str(Path(temp_dir) / "bm25.npz"))
+            assert len(loaded) == 3
+            assert sorted(doc_id for doc_id, _ in loaded.search("uplink", k=5)) == ["b", "c"]
+            
+            loaded.remove(["b"])
+            assert loaded.search("ERR-4012") == []
+    
+    def test_concurrent_saves_merge(self):
+        """Test that two indexes saving to one file keep each other's documents."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index_path = str(Path(temp_dir) / "bm25.npz")
+            first = BM25Index(index_path)
+            first.add(["a"], ["Router setup guide."])
+            first.save()
+            
+            second = BM25Index(index_path)
+            first.add(["b"], ["Error ERR-4012 means the uplink failed."])
+            second.add(["c"], ["Setup of the uplink."])
+            second.remove(["a"])
+            first.save()
+            second.save()
+            
+            loaded = BM25Index(index_path)
+            assert len(loaded) == 2
+            assert sorted(doc_id for doc_id, _ in loaded.search("uplink setup router", k=5)) == ["b", "c"]
+    
+    def test_reciprocal_rank_fusion(self):
+        """Test that chunks ranked well by both lists come first."""
+        def result(chunk_id):
+            return {"content": chunk_id, "metadata": {"chunk_id": chunk_id}, "similarity_score": 0.5}
+        
+        fused = reciprocal_rank_fusion([
+            [result("x"), result("y"), result("z")],
+            [result("y"), result("w")]
+        ])
+        assert [r["metadata"]["chunk_id"] for r in fused][:2] == ["y", "x"]
+        assert len(fused) == 4
+
+class TestModelRegistry:
+    """Test sharing and reference counting of loaded models."""
+    
+    def test_shared_loading_and_release(self):
+        """Test that a model is loaded once per key and unloaded after the last release."""
+        registry = ModelRegistry()
+        loads = []
+        
+        def loader():
+            loads.append(1)
+            return object()
+        
+        first = registry.acquire("llm", "model.gguf", {"n_ctx": 2048}, loader)
+        second = registry.acquire("llm", "model.gguf", {"n_ctx": 2048}, loader)
+        other = registry.acquire("llm", "model.gguf", {"n_ctx": 4096}, loader)
+        
+        assert first.model is second.model
+        assert first.lock is second.lock
+        assert other.model is not first.model
+        assert len(loads) == 2
+        
+        first.release()
+        first.release()  # idempotent
+        assert len(registry.get_stats()) == 2
+        second.release()
+        assert [m["params"] for m in registry.get_stats()] == [{"n_ctx": 4096}]
+        
+        assert registry.unload(kind="llm") == 1
+        assert registry.get_stats() == []
+        other.release()  # releasing an unloaded model is harmless
+
+class TestStageMetrics:
+    """Test stage histograms, Prometheus rendering and per-request timings."""
+    
+    def test_histograms_and_prometheus_text(self):
+        """Test that observations land in cumulative buckets and render as text."""
+        metrics = StageMetrics(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 5.0):
+            metrics.observe("vector_query", seconds)
+        
+        snapshot = metrics.snapshot()["vector_query"]
+        assert snapshot["count"] == 3
+        assert snapshot["total_seconds"] == pytest.approx(5.55)
+        
+        text = metrics.render_prometheus(
+            {"doc_chatbot_sources": ("Sources.", 2)},
+            {"doc_chatbot_answer_cache_hits_total": ("Answer cache hits.", 7)}
+        )
+        assert 'doc_chatbot_stage_seconds_bucket{stage="vector_query",le="0.1"} 1' in text
+        assert 'doc_chatbot_stage_seconds_bucket{stage="vector_query",le="1"} 2' in text
+        assert 'doc_chatbot_stage_seconds_bucket{stage="vector_query",le="+Inf"} 3' in text
+        assert 'doc_chatbot_stage_seconds_count{stage="vector_query"} 3' in text
+        assert "# TYPE doc_chatbot_sources gauge\ndoc_chatbot_sources 2\n" in text
+        assert "# TYPE doc_chatbot_answer_cache_hits_total counter\ndoc_chatbot_answer_cache_hits_total 7\n" in text
+    
+    def test_collect_timings(self):
+        """Test that stages are summed per request and nested collectors are isolated."""
+        with collect_timings() as outer:
+            record_stage("retrieval", 0.25)
+            with collect_timings() as inner:
+                with stage_timer("prompt_eval"):
+                    pass
+            record_stage("retrieval", 0.5)
+        record_stage("retrieval", 1.0)  # outside any request
+        
+        assert outer == {"retrieval": 0.75}
+        assert list(inner) == ["prompt_eval"]
+
+class TestBenchmarkSupport:
+    """Test the synthetic corpus and fake LLM used by the benchmarks."""
+    
+    def test_corpus_is_reproducible_and_processable(self):
+        """Test that every corpus format is generated deterministically and chunked."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = generate_corpus(Path(temp_dir) / "a", num_files=4, paragraphs_per_file=5, seed=3)
+            second = generate_corpus(Path(temp_dir) / "b", num_files=4, paragraphs_per_file=5, seed=3)
+            
+            assert sorted(p.suffix for p in first) == sorted(f".{ext}" for ext in FORMATS)
+            processor = DocumentProcessor()
+            for a, b in zip(first, second):
+                chunks_a = processor.process_file(str(a))
+                chunks_b = processor.process_file(str(b))
+                assert chunks_a
+                assert [c.content for c in chunks_a] == [c.content for c in chunks_b]
+        
+        queries = generate_queries(50)
+        assert len(set(queries)) == 50
+        assert queries == generate_queries(50)
+    
+    def test_fake_llm_answers_from_first_context(self):
+        """Test that the fake LLM streams a deterministic answer taken from the prompt."""
+        llm = FakeLLM(max_words=6)
+        prompt = AnswerGenerator()._create_prompt(
+            "What is a comet?", "Context 1 [a.txt]:\nA comet is an icy body.\n\nContext 2 [b.txt]:\nOther text.\n"
+        )
+        
+        assert llm.invoke(prompt) == "According to the documents, A comet is an icy body."
+        assert "".join(llm.stream(prompt)) == llm.invoke(prompt)
+    
+    def test_load_test_mix_and_summary(self):
+        """Test traffic mix parsing and per-level throughput and error reporting."""
+        assert parse_mix("ask=3,search=1") == {"ask": 0.75, "search": 0.25}
+        with pytest.raises(ValueError):
+            parse_mix("ask=1,upload=1")
+        
+        samples = [
+            Sample("ask", 0.1, 200),
+            Sample("ask", 0.3, 200),
+            Sample("search", 0.05, 503),
+            Sample("ask", 1.0, None, "ReadTimeout")
+        ]
+        report = summarize(samples, elapsed=2.0)
+        
+        assert report["requests"] == 4
+        assert report["errors"] == 2
+        assert report["throughput_rps"] == 1.0
+        assert report["status_codes"] == {"200": 2, "503": 1, "ReadTimeout": 1}
+        assert report["by_endpoint"]["ask"]["latency"]["count"] == 2
+        assert report["by_endpoint"]["search"]["error_rate"] == 1.0
+    
+    def test_exact_neighbours_and_recall(self):
+        """Test brute-force neighbours per distance space and recall against the vector store."""
+        matrix = np.array([[1.0, 0.0], [0.0, 1.0], [3.0, 0.1]], dtype=np.float32)
+        query = np.array([[2.0, 0.0]], dtype=np.float32)
+        
+        assert exact_neighbours(matrix, query, 2, "l2").tolist() == [[0, 2]]
+        assert exact_neighbours(matrix, query, 2, "ip").tolist() == [[2, 0]]
+        assert exact_neighbours(matrix, query, 3, "cosine").tolist() == [[0, 2, 1]]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            corpus = Path(temp_dir) / "corpus"
+            generate_corpus(str(corpus), num_files=4, paragraphs_per_file=10, formats=("txt",))
+            vector_store = VectorStore(persist_directory=str(Path(temp_dir) / "db"), lexical_index=False)
+            vector_store.add_documents(DocumentProcessor(chunk_size=100, chunk_overlap=0).process_folder(str(corpus)))
+            
+            report = evaluate(vector_store, generate_queries(10), [1, 5])
+            vector_store.close()
+        
+        assert report["queries"] == 10
+        assert report["quality"]["recall@5"] == 1.0  # Chroma's index is exact at this size
+        assert report["similarity_search"]["count"] == 10
+
+class TestPromptPrefixReuse:
+    """Test prompt layout and reporting of reused prompt tokens."""
+    
+    def test_reused_prompt_tokens(self):
+        """Test that prompts share a static prefix and reused tokens are counted."""
+        class FakeClient:
+            cache = None
+            input_ids = []
+            n_tokens = 0
+            
+            def tokenize(self, text):
+                return [hash(word) for word in text.decode("utf-8").split()]
+        
+        class FakeLLM:
+            client = FakeClient()
+            
+            def stream(self, prompt):
+                self.client.input_ids = self.client.tokenize(prompt.encode("utf-8"))
+                self.client.n_tokens = len(self.client.input_ids)
+                yield "Answer"
+        
+        generator = AnswerGenerator()
+        generator.llm = FakeLLM()
+        
+        first = generator._create_prompt("What is AI?", "Context 1 [a.txt, page 1]:\nAI text\n")
+        second = generator._create_prompt("What is ML?", "Context 1 [b.txt, page 2]:\nML text\n")
+        assert first.startswith(PROMPT_PREFIX) and second.startswith(PROMPT_PREFIX)
+        
+        usage = {}
+        list(generator._stream_with_llm("What is AI?", "Context 1:\nAI text\n", usage))
+        assert usage["prompt_tokens_reused"] == 0
+        
+        usage = {}
+        list(generator._stream_with_llm("What is ML?", "Context 1:\nAI text\n", usage))
+        prefix_tokens = len(FakeClient().tokenize(PROMPT_PREFIX.encode("utf-8")))
+        assert prefix_tokens < usage["prompt_tokens_reused"] < usage["prompt_tokens"]
+        assert generator.get_stats()["requests"] == 2
+        
+        # A cached prefix state counts even when the context holds other tokens
+        client = generator.llm.client
+        client.cache = type("FakeCache", (), {"cache_state": {tuple(client.input_ids): None}})()
+        client.input_ids, client.n_tokens = [], 0
+        usage = {}
+        list(generator._stream_with_llm("What is ML?", "Context 1:\nAI text\n", usage))
+        assert usage["prompt_tokens_reused"] == usage["prompt_tokens"] - 1
+
+class TestAnswerStreaming:
+    """Test streaming of model output."""
+    
+    def test_word_limit_keeps_fitting_words(self):
+        """Test that the piece crossing the word limit is trimmed, not dropped."""
+        class FakeLLM:
+            def stream(self, prompt):
+                for piece in range(3):
+                    yield "".join(f" w{piece}_{i}" for i in range(200))
+        
+        generator = AnswerGenerator()
+        generator.llm = FakeLLM()
+        
+        pieces = list(generator._stream_with_llm("What is AI?", "Context 1:\nAI text\n"))
+        assert pieces[-1] == "..."
+        words = "".join(pieces[:-1]).split()
+        assert len(words) == 500
+        assert words[-1] == "w2_99"
+
+@pytest.mark.skipif(not unix_sockets_supported(), reason="requires Unix domain sockets")
+class TestChatbotDaemon:
+    """Test the CLI daemon protocol over a Unix socket."""
+    
+    def test_commands_over_socket(self):
+        """Test that commands are served and streamed messages reach the client."""
+        class FakeChatbot:
+            def ask_question_stream(self, question, k=None):
+                yield {"type": "token", "text": "Hello "}
+                yield {"type": "token", "text": "world"}
+                yield {"type": "done", "answer": "Hello world", "k": k}
+            
+            def get_stats(self):
+                return {"vector_store": {"total_documents": 3}}
+        
+        temp_dir = tempfile.mkdtemp()
+        socket_path = os.path.join(temp_dir, "chatbot.sock")
+        daemon = ChatbotDaemon(FakeChatbot(), socket_path)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client = None
+            for _ in range(100):
+                client = connect_to_daemon(socket_path)
+                if client:
+                    break
+                time.sleep(0.05)
+            assert client is not None
+            
+            tokens = []
+            result = client.request("ask", on_message=lambda m: tokens.append(m["text"]), question="Hi?", k=2)
+            assert result == {"answer": "Hello world", "k": 2}
+            assert tokens == ["Hello ", "world"]
+            assert client.request("stats")["vector_store"]["total_documents"] == 3
+            
+            with pytest.raises(DaemonError):
+                client.request("unknown")
+            
+            client.request("shutdown")
+            thread.join(timeout=5)
+            assert not thread.is_alive()
+            assert connect_to_daemon(socket_path) is None
+        finally:
+            daemon.shutdown()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
 class TestVectorStore:
     """Test the vector store functionality."""
     
@@ -77,6 +692,199 @@ class TestVectorStore:
             
             stats = vector_store.get_collection_stats()
             assert "total_documents" in stats
+    
+    def test_upsert_and_delete_by_source(self):
+        """Test same-named files do not collide and can be refreshed independently."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for folder in ("a", "b"):
+                (Path(temp_dir) / folder).mkdir()
+                (Path(temp_dir) / folder / "intro.txt").write_text(
+                    f"Introduction from folder {folder}. " + "This chapter explains the basics. " * 5
+                )
+            
+            processor = DocumentProcessor(chunk_size=1000, chunk_overlap=200)
+            chunks_a = processor.process_file(Path(temp_dir) / "a" / "intro.txt")
+            chunks_b = processor.process_file(Path(temp_dir) / "b" / "intro.txt")
+            assert chunks_a[0].chunk_id != chunks_b[0].chunk_id
+            assert processor.process_file(Path(temp_dir) / "a" / "intro.txt")[0].chunk_id == chunks_a[0].chunk_id
+            
+            vector_store = VectorStore(persist_directory=str(Path(temp_dir) / "db"))
+            vector_store.add_documents(chunks_a + chunks_b)
+            vector_store.upsert_documents(chunks_a)  # re-ingest without duplicate-id errors
+            assert vector_store.collection.count() == len(chunks_a) + len(chunks_b)
+            assert [s["chunk_count"] for s in vector_store.list_sources()] == [len(chunks_a), len(chunks_b)]
+            
+            deleted = vector_store.delete_by_source(chunks_a[0].source)
+            assert deleted == len(chunks_a)
+            assert vector_store.collection.count() == len(chunks_b)
+            assert [s["source"] for s in vector_store.list_sources()] == [chunks_b[0].source]
+            vector_store.close()
+
+    def test_distance_space_and_rebuild(self):
+        """Test that scores follow the distance space and a rebuild keeps chunks without re-embedding."""
+        assert distance_to_score(0.0, "l2") == 1.0
+        assert distance_to_score(1.0, "l2") == 0.5
+        assert distance_to_score(0.25, "cosine") == 0.75
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            corpus = Path(temp_dir) / "corpus"
+            generate_corpus(str(corpus), num_files=3, paragraphs_per_file=10, formats=("txt",))
+            chunks = DocumentProcessor(chunk_size=100, chunk_overlap=0).process_folder(str(corpus))
+            vector_store = VectorStore(
+                persist_directory=str(Path(temp_dir) / "db"),
+                distance_space="l2",
+                hnsw_config={"construction_ef": 100, "search_ef": 50, "M": 16}
+            )
+            vector_store.add_documents(chunks)
+            assert vector_store.get_index_params() == {"space": "l2", "construction_ef": 100, "search_ef": 50, "M": 16}
+            before = [r["metadata"]["chunk_id"] for r in vector_store.similarity_search("galaxy orbit", k=3)]
+            
+            embedded = []
+            vector_store._embed_documents = lambda texts, stage=None: embedded.append(texts)
+            stats = vector_store.rebuild_collection("cosine", {"construction_ef": 200, "search_ef": 80, "M": 32})
+            
+            assert embedded == []
+            assert stats["chunks"] == len(chunks)
+            assert stats["index"] == {"space": "cosine", "construction_ef": 200, "search_ef": 80, "M": 32}
+            assert vector_store.collection.count() == len(chunks)
+            assert sum(s["chunk_count"] for s in vector_store.list_sources()) == len(chunks)
+            
+            del vector_store._embed_documents
+            results = vector_store.similarity_search("galaxy orbit", k=3)
+            assert [r["metadata"]["chunk_id"] for r in results] == before
+            assert all(r["similarity_score"] == pytest.approx(1 - r["distance"]) for r in results)
+            
+            # Negative cosine scores are kept unless a threshold is given
+            embed_queries = vector_store._embed_queries
+            vector_store._embed_queries = lambda queries: -embed_queries(queries)
+            results = vector_store.similarity_search("galaxy orbit", k=len(chunks))
+            assert len(results) == len(chunks) and min(r["similarity_score"] for r in results) < 0
+            filtered = vector_store.similarity_search("galaxy orbit", k=len(chunks), confidence_threshold=0.0)
+            assert len(filtered) < len(chunks)
+            vector_store.close()
+            
+            with pytest.raises(ValueError):
+                VectorStore(persist_directory=str(Path(temp_dir) / "db"), distance_space="manhattan")
+    
+    def test_interrupted_rebuild_recovery(self):
+        """Test that a collection left under a temporary name by a rebuild is adopted at startup."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            persist_directory = str(Path(temp_dir) / "db")
+            corpus = Path(temp_dir) / "corpus"
+            generate_corpus(str(corpus), num_files=2, paragraphs_per_file=5, formats=("txt",))
+            chunks = DocumentProcessor(chunk_size=100, chunk_overlap=0).process_folder(str(corpus))
+            vector_store = VectorStore(persist_directory=persist_directory)
+            vector_store.add_documents(chunks)
+            vector_store.rebuild_collection("cosine")
+            with pytest.raises(Exception):
+                vector_store.client.get_collection(name="documents_old")
+            
+            # Simulate a crash after the old collection was moved aside
+            vector_store.collection.modify(name="documents_old")
+            vector_store.close()
+            
+            vector_store = VectorStore(persist_directory=persist_directory)
+            assert vector_store.collection.count() == len(chunks)
+            assert vector_store.distance_space == "cosine"
+            vector_store.close()
+    
+    def test_numpy_collection(self):
+        """Test that the NumPy collection returns exact neighbours and reuses deleted rows."""
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(50, 8)).astype(np.float32)
+        queries = rng.normal(size=(4, 8)).astype(np.float32)
+        ids = [f"c{i}" for i in range(50)]
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for space in ("l2", "cosine", "ip"):
+                collection = NumpyClient(temp_dir).create_collection(f"docs_{space}", {"hnsw:space": space})
+                collection.initial_capacity = 4  # force the matrix to grow
+                collection.add(
+                    ids=ids,
+                    documents=[f"text {i}" for i in range(50)],
+                    metadatas=[{"source": f"s{i % 3}"} for i in range(50)],
+                    embeddings=vectors
+                )
+                
+                results = collection.query(query_embeddings=queries, n_results=5)
+                expected = exact_neighbours(vectors, queries, 5, space)
+                assert results["ids"] == [[ids[row] for row in rows] for rows in expected]
+                assert results["documents"][0][0] == f"text {expected[0][0]}"
+                assert all(d == sorted(d) for d in results["distances"])
+            
+            collection.delete(ids=["c0", "c1"])
+            collection.upsert(ids=["c2", "new"], documents=["changed", "new"], metadatas=[{"source": "s9"}] * 2, embeddings=vectors[:2])
+            assert collection.count() == 49
+            assert collection._num_rows == 50  # "new" took a deleted row
+            assert collection.get(ids=["c2"])["documents"] == ["changed"]
+            assert sorted(collection.get(where={"source": "s9"}, include=[])["ids"]) == ["c2", "new"]
+            assert "c0" not in collection.query(query_embeddings=vectors[:1], n_results=49)["ids"][0]
+            
+            reopened = NumpyClient(temp_dir).get_collection("docs_ip")
+            assert reopened.count() == 49
+            assert sorted(reopened.get(where={"source": {"$eq": "s9"}}, include=[])["ids"]) == ["c2", "new"]
+            np.testing.assert_array_equal(reopened.get(ids=["new"], include=["embeddings"])["embeddings"], vectors[1:2])
+    
+    def test_numpy_collection_shared_by_clients(self):
+        """Test that clients with their own connections, as in separate processes, share a collection safely."""
+        rng = np.random.default_rng(1)
+        vectors = rng.normal(size=(10, 8)).astype(np.float32)
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            first = NumpyClient(temp_dir).create_collection("docs", {"hnsw:space": "l2"})
+            second = NumpyClient(temp_dir).get_collection("docs")
+            first.initial_capacity = second.initial_capacity = 4
+            
+            first.add(ids=["a0", "a1", "a2"], documents=["a"] * 3, embeddings=vectors[:3])
+            second.add(ids=[f"b{i}" for i in range(6)], documents=["b"] * 6, embeddings=vectors[3:9])
+            assert NumpyClient(temp_dir).get_collection("docs").count() == 9
+            
+            # The first client picks up rows written past its own matrix capacity
+            assert first.count() == 9
+            assert first.query(query_embeddings=vectors[8:9], n_results=1)["ids"] == [["b5"]]
+            
+            second.delete(["a0"])
+            first.add(ids=["a3"], documents=["a"], embeddings=vectors[9:10])
+            assert first._num_rows == 9  # reused the row the second client freed
+            np.testing.assert_array_equal(second.get(ids=["a3"], include=["embeddings"])["embeddings"], vectors[9:10])
+            assert second.query(query_embeddings=vectors[9:10], n_results=1)["ids"] == [["a3"]]
+            assert sorted(second.get(include=[])["ids"]) == ["a1", "a2", "a3"] + [f"b{i}" for i in range(6)]
+    
+    def test_numpy_backend_imports_chroma(self):
+        """Test that the NumPy backend imports a Chroma collection and searches it exactly."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            corpus = Path(temp_dir) / "corpus"
+            generate_corpus(str(corpus), num_files=3, paragraphs_per_file=10, formats=("txt",))
+            chunks = DocumentProcessor(chunk_size=100, chunk_overlap=0).process_folder(str(corpus))
+            persist_directory = str(Path(temp_dir) / "db")
+            
+            chroma_store = VectorStore(persist_directory=persist_directory, distance_space="cosine")
+            chroma_store.add_documents(chunks[1:])
+            chroma_store.close()
+            
+            vector_store = VectorStore(persist_directory=persist_directory, backend="numpy")
+            assert vector_store.get_index_params() == {"space": "cosine", "exact": True}
+            assert vector_store.get_collection_stats()["backend"] == "numpy"
+            assert vector_store.collection.count() == len(chunks) - 1
+            
+            vector_store.add_documents(chunks[:1])
+            vector_store.delete_by_source(chunks[-1].source)
+            queries = generate_queries(5, seed=3)
+            batch = vector_store.similarity_search_batch(queries, k=4)
+            single = [vector_store.similarity_search(query, k=4) for query in queries]
+            assert [[r["content"] for r in results] for results in batch] == [[r["content"] for r in results] for results in single]
+            
+            result = evaluate(vector_store, queries, [1, 4])
+            assert result["quality"] == {"recall@1": 1.0, "recall@4": 1.0, "mrr@4": 1.0}
+            numpy_ids = sorted(vector_store.collection.get(include=[])["ids"])
+            vector_store.close()
+            
+            # Switching back copies the collection the side files describe
+            chroma_store = VectorStore(persist_directory=persist_directory)
+            assert sorted(chroma_store.collection.get(include=[])["ids"]) == numpy_ids
+            assert sum(s["chunk_count"] for s in chroma_store.list_sources()) == len(numpy_ids)
+            assert chroma_store.distance_space == "cosine"
+            chroma_store.close()
 
 class TestDocumentChatbot:
     """Test the main chatbot functionality."""
@@ -121,6 +929,26 @@ class TestDocumentChatbot:
         stats = self.chatbot.get_stats()
         assert stats["vector_store"]["total_documents"] > 0
     
+    def test_failed_ingest_saves_indexes(self):
+        """Test that chunks written before an ingest failure are reflected in the saved side files."""
+        self.chatbot.config["performance"]["ingest_flush_size"] = 1
+        process_files = self.chatbot.document_processor.iter_processed_files
+        
+        def fail_after_first_file(file_paths, num_workers=None):
+            yield from process_files(list(file_paths)[:1], num_workers=num_workers)
+            raise RuntimeError("disk full")
+        
+        self.chatbot.document_processor.iter_processed_files = fail_after_first_file
+        result = self.chatbot.ingest_documents(str(self.test_folder))
+        
+        assert result["success"] is False
+        count = self.chatbot.vector_store.collection.count()
+        assert count > 0
+        catalog = SourceCatalog.for_persist_directory(self.chatbot.vector_store.persist_directory)
+        assert sum(s["chunk_count"] for s in catalog.list_sources()) == count
+        lexical_index = BM25Index(str(Path(self.chatbot.vector_store.persist_directory) / "bm25_index.npz"))
+        assert len(lexical_index) == count
+    
     def test_question_answering(self):
         """Test question answering functionality."""
         # First ingest documents
@@ -134,6 +962,18 @@ class TestDocumentChatbot:
         assert isinstance(result["confidence"], float)
         assert result["confidence"] >= 0.0
         assert result["total_time"] > 0
+        assert {"retrieval", "query_embedding", "vector_query", "ask"} <= set(result["timings"])
+    
+    def test_batched_question_timings(self):
+        """Test that stages run on the query batcher's thread appear in the request timings."""
+        self.chatbot.ingest_documents(str(self.test_folder))
+        self.chatbot.vector_store.enable_query_batching(max_wait_ms=1)
+        try:
+            result = self.chatbot.ask_question("What is machine learning?")
+            assert {"retrieval", "query_embedding", "vector_query"} <= set(result["timings"])
+            assert self.chatbot.vector_store.query_batcher.get_stats()["queries"] == 1
+        finally:
+            self.chatbot.close()
     
     def test_answer_refusal(self):
         """Test that the system refuses to answer when no relevant information is found."""
@@ -146,6 +986,88 @@ class TestDocumentChatbot:
         # Should have low confidence or explicit refusal
         assert result["confidence"] < 0.5 or "don't know" in result["answer"].lower()
     
+    def test_streamed_answer(self):
+        """Test that streamed tokens add up to the answer and end with a done event."""
+        self.chatbot.ingest_documents(str(self.test_folder))
+        
+        events = list(self.chatbot.ask_question_stream("What is machine learning?"))
+        tokens = [e["text"] for e in events if e["type"] == "token"]
+        
+        assert events[-1]["type"] == "done"
+        assert [e["type"] for e in events].count("done") == 1
+        assert tokens
+        assert events[-1]["answer"].startswith("".join(tokens).strip())
+        assert events[-1]["time_to_first_token"] <= events[-1]["total_time"]
+    
+    def test_hybrid_identifier_answer(self):
+        """Test that an identifier matched only by BM25 is not refused for low vector similarity."""
+        (self.test_folder / "faults.txt").write_text(
+            "Controller fault table. When the uplink drops during a firmware update the controller "
+            "logs ERR-4012 and restarts the radio after thirty seconds. Check cabling, power supply "
+            "and the antenna connectors before calling support."
+        )
+        config = get_config()
+        config["vector_store"]["persist_directory"] = str(Path(self.temp_dir) / "hybrid_chroma")
+        config["vector_store"]["distance_space"] = "cosine"
+        config["retrieval"]["mode"] = "hybrid"
+        chatbot = DocumentChatbot(config=config)
+        try:
+            chatbot.ingest_documents(str(self.test_folder))
+            
+            result = chatbot.ask_question("Explain ERR-4012")
+            assert result["confidence"] >= config["retrieval"]["confidence_threshold"]
+            assert "ERR-4012" in result["answer"]
+            assert chatbot.ask_question("Explain weather today")["confidence"] == 0.0
+        finally:
+            chatbot.close()
+    
+    def test_list_sources(self):
+        """Test that every ingested file is listed with its counts."""
+        folder = Path(self.temp_dir) / "catalog_docs"
+        folder.mkdir()
+        (folder / "guide.md").write_text("# Guide\n\nSupervised learning uses labelled examples to train models.")
+        (folder / "notes.txt").write_text("Unsupervised learning finds structure in unlabelled data sets.")
+        self.chatbot.ingest_documents(str(folder))
+        
+        sources = self.chatbot.list_sources()
+        assert [s["file_name"] for s in sources] == ["guide.md", "notes.txt"]
+        assert sum(s["chunk_count"] for s in sources) == self.chatbot.get_stats()["vector_store"]["total_documents"]
+        assert all(s["page_count"] == 1 for s in sources)
+        assert self.chatbot.get_available_sources() == ["guide.md", "notes.txt"]
+        
+        self.chatbot.reset_knowledge_base()
+        assert self.chatbot.list_sources() == []
+    
+    def test_ask_batch(self):
+        """Test batched answering keeps input order and matches single questions."""
+        self.chatbot.ingest_documents(str(self.test_folder))
+        
+        lines = [
+            '{"id": "a", "question": "What is machine learning?"}',
+            '',
+            '"How are learning algorithms categorized?"',
+            '{"id": "c", "question": "What is the weather like today?", "k": 2}'
+        ]
+        questions = list(parse_question_lines(lines))
+        assert [q["id"] for q in questions] == ["a", 3, "c"]
+        
+        results = list(self.chatbot.ask_batch(questions, batch_size=2, num_workers=2))
+        
+        assert [r["id"] for r in results] == ["a", 3, "c"]
+        assert all(set(r["timings"]) == {"retrieval_time", "generation_time", "total_time"} for r in results)
+        single = self.chatbot.ask_question("How are learning algorithms categorized?")
+        assert results[1]["answer"] == single["answer"]
+        
+        # num_workers=0 generates on the consuming thread, as the API server does
+        threads_before = threading.active_count()
+        inline = self.chatbot.ask_batch(questions, batch_size=2, num_workers=0)
+        assert next(inline)["id"] == "a"
+        assert threading.active_count() == threads_before
+        assert [r["id"] for r in inline] == [3, "c"]
+        
+        with pytest.raises(ValueError):
+            list(parse_question_lines(['{"id": 1}']))
+    
     def test_reset_knowledge_base(self):
         """Test resetting the knowledge base."""
         # First ingest documents